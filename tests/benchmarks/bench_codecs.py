@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 10:12:03
+
+Micro benchmarks for the protocol codecs, no device required
+
+    pip3 install pytest-benchmark
+    python3 -m pytest tests/benchmarks/bench_codecs.py --benchmark-json=bench-codecs.json
+"""
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from tidevice import bplist, plistlib2
+from tidevice._instruments import (AUXMessageBuffer, DTXMessageHeader,
+                                   DTXPayload, unpack_aux_message)
+from tidevice._proto import AFC, AFCPacket, AFCStatus
+from tidevice._safe_socket import PlistSocket, PlistSocketProxy
+from tidevice._sync import FHeader, Sync
+
+
+@pytest.mark.benchmark(group="plistlib2")
+def test_plist_binary_loads(benchmark, objc_payload):
+    _, data = objc_payload
+    benchmark(plistlib2.loads, data)
+
+
+@pytest.mark.benchmark(group="plistlib2")
+def test_plist_binary_dumps(benchmark, objc_payload):
+    _, data = objc_payload
+    archive = plistlib2.loads(data)
+    benchmark(plistlib2.dumps, archive, fmt=plistlib2.FMT_BINARY)
+
+
+@pytest.mark.benchmark(group="bplist")
+def test_objc_decode(benchmark, objc_payload):
+    value, data = objc_payload
+    assert benchmark(bplist.objc_decode, data) == value
+
+
+@pytest.mark.benchmark(group="bplist")
+def test_objc_encode(benchmark, objc_payload):
+    value, _ = objc_payload
+    benchmark(bplist.objc_encode, value)
+
+
+@pytest.mark.benchmark(group="struct2")
+def test_struct2_parse(benchmark):
+    data = bytes(DTXMessageHeader.build(message_id=2, payload_length=0x1c2c, channel=1))
+    h = benchmark(DTXMessageHeader.parse, data)
+    assert h.payload_length == 0x1c2c
+
+
+@pytest.mark.benchmark(group="struct2")
+def test_struct2_build(benchmark):
+    benchmark(DTXMessageHeader.build, message_id=2, payload_length=0x1c2c, channel=1)
+
+
+@pytest.mark.benchmark(group="dtx")
+def test_dtx_payload_build(benchmark):
+    config = {"bm": 0, "cpuUsage": True, "sampleInterval": 1000000000, "ur": 1000}
+    benchmark(DTXPayload.build, "setConfig:", [config])
+
+
+@pytest.mark.benchmark(group="dtx")
+def test_dtx_payload_parse_call(benchmark, running_processes):
+    payload = DTXPayload.build("runningProcesses", [running_processes])
+    flags, (selector, args) = benchmark(DTXPayload.parse, payload)
+    assert selector == "runningProcesses"
+
+
+@pytest.mark.benchmark(group="dtx")
+def test_dtx_payload_parse_object(benchmark, sysmontap_sample):
+    payload = DTXPayload.build_other(0x03, sysmontap_sample)
+    flags, result = benchmark(DTXPayload.parse, payload)
+    assert flags == 0x03 and result == sysmontap_sample
+
+
+@pytest.mark.benchmark(group="dtx")
+def test_unpack_aux_message(benchmark):
+    aux = AUXMessageBuffer()
+    aux.append_u32(1)
+    aux.append_u64(1 << 40)
+    aux.append_obj("com.apple.instruments.server.services.sysmontap")
+    aux.append_obj({"bm": 0, "cpuUsage": True, "procAttrs": ["cpuUsage", "pid"]})
+    data = bytes(aux.get_bytes())
+    args = benchmark(unpack_aux_message, data)
+    assert args[0] == 1 and len(args) == 4
+
+
+@pytest.mark.benchmark(group="framing")
+def test_afc_fheader_roundtrip(benchmark):
+    def roundtrip():
+        buf = FHeader.build(length=FHeader.size + 8, this_len=FHeader.size + 8,
+                            tag=1, operation=AFC.OP_STATUS)
+        return FHeader.parse(bytes(buf))
+    assert benchmark(roundtrip).operation == AFC.OP_STATUS
+
+
+@pytest.mark.benchmark(group="framing")
+def test_afc_recv_framing(benchmark, sockpair):
+    a, b = sockpair
+    sync = Sync(PlistSocketProxy(PlistSocket(a)))
+    payload = b"x" * (16 << 10)
+    frame = bytes(FHeader.build(length=FHeader.size + len(payload),
+                                this_len=FHeader.size,
+                                tag=1,
+                                operation=AFC.OP_DATA)) + payload
+
+    def roundtrip():
+        b.sendall(frame)
+        return sync._recv()
+    assert benchmark(roundtrip).payload == payload
+
+
+@pytest.mark.benchmark(group="afc-stat")
+@pytest.mark.parametrize("raw", [False, True])
+def test_afc_parse_stat(benchmark, sockpair, raw: bool):
+    sync = Sync(PlistSocketProxy(PlistSocket(sockpair[0])))
+    payload = (b"st_size\x00" b"4096\x00" b"st_blocks\x00" b"8\x00" b"st_nlink\x00" b"1\x00"
+               b"st_ifmt\x00" b"S_IFREG\x00" b"st_mtime\x00" b"1591588092361862409\x00"
+               b"st_birthtime\x00" b"1591588092361695702\x00")
+    pkgs = [AFCPacket(AFCStatus.ST_SUCCESS, b"", bytearray(payload), i) for i in range(1000)]
+    parse = sync._parse_stat_raw if raw else sync._parse_stat
+
+    def parse_all():
+        return [parse("/var/mobile/Media/DCIM/100APPLE/IMG_0001.JPG", pkg) for pkg in pkgs]
+    assert benchmark(parse_all)[0].st_size == 4096
+
+
+@pytest.mark.benchmark(group="framing")
+def test_plistsocket_framing(benchmark, sockpair, running_processes):
+    a, b = sockpair
+    sender, receiver = PlistSocket(a), PlistSocket(b)
+    sender._first = receiver._first = False  # steady state: 4 bytes length header
+    apps = [{
+        "CFBundleIdentifier": "com.example.demo{}".format(p['pid']),
+        "CFBundleExecutable": p['name'],
+        "Path": p['realAppName'].rsplit("/", 1)[0],
+    } for p in running_processes[:20]]
+
+    def roundtrip():
+        sender.send_packet({"Status": "BrowsingApplications", "CurrentList": apps})
+        return receiver.recv_packet()
+    assert benchmark(roundtrip)['Status'] == "BrowsingApplications"
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 12:20:41
+
+End to end benchmarks against the device simulator (tidevice._simulator)
+
+    python3 -m pytest tests/benchmarks/bench_e2e.py --benchmark-json=bench-e2e.json
+
+    # replay a capture recorded from a real device, see tidevice/_dtxcapture.py
+    TIDEVICE_DTX_CAPTURE=sysmontap.dtxcap.gz python3 -m pytest tests/benchmarks/bench_e2e.py -k replay
+"""
+
+import itertools
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from tidevice import Device, Usbmux
+from tidevice._dtxcapture import DTXReplayServer, load_capture
+from tidevice._simulator import DeviceSimulator
+from tidevice._transfer import TransferEngine
+
+
+@pytest.fixture(scope="module")
+def sim():
+    with DeviceSimulator(sysmontap_interval=.01, opengl_interval=.01, process_count=300) as s:
+        os.makedirs(os.path.join(s.root, "many"))
+        for i in range(200):
+            with open(os.path.join(s.root, "many", f"{i}.txt"), "wb") as f:
+                f.write(b"x" * 100)
+        with open(os.path.join(s.root, "big.bin"), "wb") as f:
+            f.write(os.urandom(8 << 20))
+        yield s
+
+
+@pytest.fixture(scope="module")
+def d(sim) -> Device:
+    return Device(sim.udid, Usbmux(sim.address))
+
+
+@pytest.mark.benchmark(group="e2e-lockdown")
+def test_start_service(benchmark, d: Device):
+    def start_close():
+        d.start_service("com.apple.afc").close()
+    benchmark(start_close)
+
+
+@pytest.fixture(scope="module")
+def usb_sim(sim):
+    """ same files with 1ms latency per AFC response """
+    with DeviceSimulator(root=sim.root, link_latency=.001) as s:
+        yield s
+
+
+@pytest.mark.benchmark(group="e2e-afc-latency")
+@pytest.mark.parametrize("depth", [1, 32])
+def test_afc_listdir_info(benchmark, usb_sim, depth: int):
+    s = Device(usb_sim.udid, Usbmux(usb_sim.address)).sync
+    s.pipeline_depth = depth
+    assert len(benchmark(s.listdir_info, "/many")) == 200
+
+
+@pytest.mark.benchmark(group="e2e-afc-latency")
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_afc_pull_tree(benchmark, usb_sim, tmp_path, jobs: int):
+    d = Device(usb_sim.udid, Usbmux(usb_sim.address))
+    engine = TransferEngine(d.connect_sync, jobs=jobs, range_size=2 << 20)
+    stats = benchmark.pedantic(engine.pull, args=("/", tmp_path / "pull"), rounds=3)
+    assert stats.bytes == (8 << 20) + 200 * 100
+
+
+@pytest.mark.benchmark(group="e2e-afc-latency")
+@pytest.mark.parametrize("window", [1, 4])
+def test_afc_push(benchmark, usb_sim, window: int):
+    s = Device(usb_sim.udid, Usbmux(usb_sim.address)).sync
+    data = os.urandom(8 << 20)
+    benchmark.pedantic(s.push_content, args=("/push.bin", data), kwargs={"chunk_size": 256 * 1024, "window": window}, rounds=3)
+    assert s.stat("/push.bin").st_size == 8 << 20
+    s.remove("/push.bin")
+
+
+@pytest.mark.benchmark(group="e2e-afc")
+def test_afc_pull_content(benchmark, d: Device):
+    s = d.sync
+    assert len(benchmark(s.pull_content, "/big.bin")) == 8 << 20
+
+
+@pytest.mark.benchmark(group="e2e-dtx")
+def test_sysmontap_samples(benchmark, d: Device):
+    with d.connect_instruments() as ts:
+        it = ts.iter_cpu_memory()
+
+        def take10():
+            for _ in range(10):
+                next(it)
+        benchmark.pedantic(take10, rounds=5)
+
+
+@pytest.fixture(scope="module")
+def sysmontap_capture(d: Device, tmp_path_factory):
+    path = os.environ.get("TIDEVICE_DTX_CAPTURE")
+    if not path:
+        path = str(tmp_path_factory.mktemp("capture") / "sysmontap.dtxcap")
+        with d.connect_instruments() as ts:
+            ts.start_recording(path)
+            for _ in itertools.islice(ts.iter_cpu_memory(), 50):
+                pass
+    return load_capture(path)
+
+
+@pytest.mark.benchmark(group="e2e-dtx")
+def test_replay_sysmontap(benchmark, sysmontap_capture):
+    def replay():
+        ts = DTXReplayServer(sysmontap_capture, speed=0).connect()
+        return sum(1 for _ in ts.iter_cpu_memory())
+    assert benchmark.pedantic(replay, rounds=5) > 0
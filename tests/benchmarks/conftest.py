@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 10:12:03
+
+Payloads used by the codec benchmarks. They are synthetic approximations
+built by hand after the message shapes of sysmontap, runningProcesses and
+XCTestConfiguration, not captures from a device, so the numbers compare codec
+versions rather than predict the decode cost on a real iPhone. Replay a real
+capture with bench_e2e.py for that.
+"""
+
+import datetime
+import socket
+import uuid
+
+import pytest
+
+from tidevice import bplist
+from tidevice._proto import SYSMON_PROC_ATTRS
+
+
+PROCESS_COUNT = 300
+
+
+@pytest.fixture(scope="session")
+def sysmontap_sample() -> list:
+    """ one tick of com.apple.instruments.server.services.sysmontap """
+    processes = {}
+    for pid in range(PROCESS_COUNT):
+        processes[pid] = [
+            869646336 + pid,   # memVirtualSize
+            0.20891292720792148 * (pid % 7),  # cpuUsage
+            335770139 + pid,   # ctxSwitch
+            120505483 + pid,   # intWakeups
+            7913472 + pid,     # physFootprint
+            130760704 + pid,   # memResidentSize
+            54345728 + pid,    # memAnon
+            pid,
+        ]
+    assert len(processes[0]) == len(SYSMON_PROC_ATTRS)
+    system = {
+        'CPUCount': 6,
+        'EnabledCPUs': 6,
+        'EndMachAbsTime': 2158497307470,
+        'PerCPUUsage': [{
+            'CPU_NiceLoad': 0.0,
+            'CPU_SystemLoad': -1.0,
+            'CPU_TotalLoad': 13.0,
+            'CPU_UserLoad': -1.0
+        } for _ in range(6)],
+        'StartMachAbsTime': 2158473307786,
+        'SystemCPUUsage': {
+            'CPU_NiceLoad': 0.0,
+            'CPU_SystemLoad': -1.0,
+            'CPU_TotalLoad': 44.0,
+            'CPU_UserLoad': -1.0
+        },
+        'Type': 33,
+    }
+    procs = {
+        'EndMachAbsTime': 2158515468993,
+        'Processes': processes,
+        'StartMachAbsTime': 2158491468993,
+        'Type': 7,
+    }
+    return [system, procs]
+
+
+@pytest.fixture(scope="session")
+def running_processes() -> list:
+    """ reply of deviceinfo runningProcesses """
+    start = datetime.datetime(2020, 5, 25, 2, 22, 29, 603427)
+    return [{
+        'isApplication': pid % 10 == 0,
+        'name': 'proc{}'.format(pid),
+        'pid': pid,
+        'realAppName': '/private/var/containers/Bundle/Application/{}/Demo{}.app/Demo{}'.format(
+            uuid.UUID(int=pid), pid, pid),
+        'startDate': start + datetime.timedelta(seconds=pid),
+    } for pid in range(PROCESS_COUNT)]
+
+
+@pytest.fixture(scope="session")
+def xctest_configuration() -> bplist.XCTestConfiguration:
+    app_path = "/private/var/containers/Bundle/Application/0A608C62-FBE7-43C0-B083-78F27AC5FF8E/WebDriverAgentRunner-Runner.app"
+    return bplist.XCTestConfiguration({
+        "testBundleURL": bplist.NSURL(None, f"file://{app_path}/PlugIns/WebDriverAgentRunner.xctest"),
+        "sessionIdentifier": uuid.UUID("6a0e5b6c-0d4d-4bd9-a1f8-4a3f0f4f5a6b"),
+        "targetApplicationBundleID": "com.apple.Preferences",
+        "targetApplicationArguments": ["-AppleLanguages", "(en)"],
+        "targetApplicationEnvironment": {"MYPATH": "/tmp"},
+        "testsToRun": set(),
+        "testsMustRunOnMainThread": True,
+        "reportResultsToIDE": True,
+        "reportActivities": True,
+        "automationFrameworkPath": "/Developer/Library/PrivateFrameworks/XCTAutomationSupport.framework",
+    })
+
+
+@pytest.fixture(scope="session", params=["sysmontap", "runningProcesses", "XCTestConfiguration"])
+def objc_payload(request, sysmontap_sample, running_processes, xctest_configuration):
+    """ returns (python value, NSKeyedArchiver bytes) """
+    value = {
+        "sysmontap": sysmontap_sample,
+        "runningProcesses": running_processes,
+        "XCTestConfiguration": xctest_configuration,
+    }[request.param]
+    return value, bplist.objc_encode(value)
+
+
+@pytest.fixture
+def sockpair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
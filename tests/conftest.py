@@ -4,8 +4,12 @@
 """Created on Mon Jan 25 2021 10:42:05 by codeskyblue
 """
 
-import pytest
 import os
+import time
+
+import pytest
+
+from tidevice._simulator import DeviceSimulator
 
 
 curdir = os.path.dirname(os.path.abspath(__file__))
@@ -13,4 +17,31 @@ curdir = os.path.dirname(os.path.abspath(__file__))
 
 @pytest.fixture
 def wda_filepath():
-    return os.path.join(curdir, "testdata/WebDriverAgentRunner.ipa")
\ No newline at end of file
+    return os.path.join(curdir, "testdata/WebDriverAgentRunner.ipa")
+
+
+@pytest.fixture
+def sim():
+    """ a new simulated device for every test """
+    with DeviceSimulator() as s:
+        yield s
+
+
+@pytest.fixture(scope="module")
+def shared_sim():
+    """ a simulated device shared by the tests of a module, samples every 50ms """
+    with DeviceSimulator(sysmontap_interval=.05, opengl_interval=.05, network_interval=.05) as s:
+        yield s
+
+
+def _wait_for(func, timeout: float = 3.0):
+    deadline = time.time() + timeout
+    while not func():
+        assert time.time() < deadline, "timeout"
+        time.sleep(.01)
+
+
+@pytest.fixture
+def wait_for():
+    """ wait_for(func, timeout=3.0) waits until func() is true """
+    return _wait_for
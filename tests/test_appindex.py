@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 19:41:12
+"""
+
+from tidevice import Device, Usbmux
+from tidevice._appindex import APP_INDEX_ATTRS, exe_path_index
+
+
+def test_app_index(sim):
+    d = Device(sim.udid, Usbmux(sim.address))
+    index = d.app_index
+    info = index.get("com.example.demo")
+    assert info["CFBundleExecutable"] == "Demo"
+    assert set(info) <= set(APP_INDEX_ATTRS)
+    assert [i["CFBundleIdentifier"] for i in index.apps("User")] == ["com.example.demo"]
+    exe_path = info["Path"][len("/private"):] + "/Demo"
+    assert index.by_executable(exe_path) is info
+
+    assert index.refresh() == ([], [])
+    new_app = dict(sim.apps["com.example.demo"], CFBundleIdentifier="com.example.new", SequenceNumber=10)
+    sim.apps["com.example.new"] = new_app
+    sim.apps["com.example.demo"] = dict(sim.apps["com.example.demo"], CFBundleVersion="2", SequenceNumber=11)
+    del sim.apps["com.apple.Preferences"]
+    assert index.refresh() == (["com.example.demo", "com.example.new"], ["com.apple.Preferences"])
+    assert index.get("com.example.demo")["CFBundleVersion"] == "2"
+    assert index.get("com.apple.Preferences") is None
+    assert len(index.apps()) == 2
+
+
+def test_exe_path_index(sim):
+    d = Device(sim.udid, Usbmux(sim.address))
+    index = d.app_index.exe_index()
+    assert d.app_index.exe_index() is index
+    assert exe_path_index([{"CFBundleExecutable": "A", "Path": "/private/var/A.app"}]) == {
+        "/var/A.app/A": {"CFBundleExecutable": "A", "Path": "/private/var/A.app"}}
+    with d.connect_instruments() as ts:
+        pid = ts.app_launch("com.example.demo")
+        infos = {p['pid']: p for p in ts.app_process_list(index)}
+    assert infos[pid]['bundle_id'] == "com.example.demo"
+    assert infos[1]['bundle_id'] == ""
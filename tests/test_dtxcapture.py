@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 13:40:52
+"""
+
+import itertools
+
+from tidevice import Device, Usbmux
+from tidevice._dtxcapture import (DIRECTION_RECV, DIRECTION_SEND,
+                                  DTXReplayServer, load_capture)
+from tidevice._proto import LockdownService
+from tidevice._simulator import DeviceSimulator
+
+
+def test_record_and_replay(tmp_path):
+    capture = str(tmp_path / "sysmontap.dtxcap.gz")
+    with DeviceSimulator(sysmontap_interval=.02, process_count=10) as sim:
+        d = Device(sim.udid, Usbmux(sim.address))
+        with d.connect_instruments() as ts:
+            ts.start_recording(capture)
+            recorded = list(itertools.islice(ts.iter_cpu_memory(), 5))
+
+    records = load_capture(capture)
+    assert {r.direction for r in records} == {DIRECTION_SEND, DIRECTION_RECV}
+    assert records == sorted(records, key=lambda r: r.timestamp)
+
+    ts = DTXReplayServer(capture, speed=0).connect()
+    replayed = list(itertools.islice(ts.iter_cpu_memory(), 5))
+    assert replayed == recorded
+
+    # replay through the simulator, as fast as possible
+    with DeviceSimulator(dtx_captures={LockdownService.InstrumentsRemoteServerSecure: capture},
+                         replay_speed=0) as sim:
+        d = Device(sim.udid, Usbmux(sim.address))
+        with d.connect_instruments() as ts:
+            assert list(ts.iter_cpu_memory())[:5] == recorded
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Mon Oct 19 2026 10:58:12
+"""
+
+from tidevice import Usbmux
+from tidevice._exporter import Exporter, Registry
+from tidevice._perf import DataType
+from tidevice._simulator import DeviceSimulator
+
+
+def test_registry_render():
+    registry = Registry()
+    registry.set("tidevice_fps", 58.0, udid="A")
+    registry.set("tidevice_app_cpu_percent", 12.5, udid="A", bundle_id='com.example."demo"')
+    registry.inc("tidevice_network_receive_bytes_total", 100, udid="A")
+    registry.inc("tidevice_network_receive_bytes_total", 20, udid="A")
+    registry.set("tidevice_fps", 60.0, udid="B")
+    assert registry.render() == "\n".join([
+        '# HELP tidevice_app_cpu_percent cpu usage of app',
+        '# TYPE tidevice_app_cpu_percent gauge',
+        'tidevice_app_cpu_percent{bundle_id="com.example.\\"demo\\"",udid="A"} 12.5',
+        '# HELP tidevice_fps core animation frames per second',
+        '# TYPE tidevice_fps gauge',
+        'tidevice_fps{udid="A"} 58.0',
+        'tidevice_fps{udid="B"} 60.0',
+        '# HELP tidevice_network_receive_bytes_total bytes received by all connections',
+        '# TYPE tidevice_network_receive_bytes_total counter',
+        'tidevice_network_receive_bytes_total{udid="A"} 120.0',
+    ]) + "\n"
+
+    registry.remove(udid="A")
+    assert registry.render().splitlines()[-1] == 'tidevice_fps{udid="B"} 60.0'
+    assert registry.get("tidevice_fps", udid="A") is None
+
+
+def test_exporter_network():
+    exporter = Exporter(Usbmux("127.0.0.1:1"))
+    registry = exporter.registry
+
+    def update(serial: int, rx: int, tx: int):
+        exporter._on_sample("A", None, DataType.NETWORK, {"connection-update": {
+            "RxBytes": rx, "TxBytes": tx, "RxDups": 0, "TxRetx": 0, "ConnectionSerial": serial}})
+
+    exporter._on_sample("A", None, DataType.NETWORK, {"interface-detection": {"InterfaceIndex": 14, "Name": "en0"}})
+    update(1, 100, 10)
+    update(1, 300, 30)
+    update(2, 50, 5)
+    update(1, 300, 30)
+    assert registry.get("tidevice_network_receive_bytes_total", udid="A") == 350
+    assert registry.get("tidevice_network_transmit_bytes_total", udid="A") == 35
+
+    exporter._on_sample("A", None, DataType.NETWORK, {"connection-detected": {"SerialNumber": 1}})
+    update(1, 40, 4)  # new connection with the same serial
+    update(2, 20, 2)  # counter reset
+    assert registry.get("tidevice_network_receive_bytes_total", udid="A") == 390
+    assert set(exporter._connections) == {("A", 1), ("A", 2)}
+
+
+def test_exporter(wait_for):
+    with DeviceSimulator(sysmontap_interval=.05, opengl_interval=.05, network_interval=.05) as sim:
+        sim.launch_app("com.example.demo")
+        exporter = Exporter(Usbmux(sim.address), ["com.example.demo"], intervals={"devices": .1, "battery": .1})
+        registry = exporter.registry
+        exporter.start()
+        try:
+            wait_for(lambda: all(registry.get(name, udid=sim.udid) is not None for name in [
+                "tidevice_battery_level_percent", "tidevice_storage_free_bytes",
+                "tidevice_fps", "tidevice_network_receive_bytes_total"]))
+            wait_for(lambda: registry.get("tidevice_app_cpu_percent", udid=sim.udid, bundle_id="com.example.demo") is not None)
+            rx = registry.get("tidevice_network_receive_bytes_total", udid=sim.udid)
+            wait_for(lambda: registry.get("tidevice_network_receive_bytes_total", udid=sim.udid) > rx)
+        finally:
+            exporter.stop()
+
+    # counters add the delta of cumulative counts, not more than the simulator sent
+    assert 0 < registry.get("tidevice_network_receive_bytes_total", udid=sim.udid) <= sim.network_bytes["rx"]
+    assert 0 < registry.get("tidevice_network_transmit_bytes_total", udid=sim.udid) <= sim.network_bytes["tx"]
+    assert registry.get("tidevice_device_connected", udid=sim.udid, conn_type="usb") == 1
+    assert registry.get("tidevice_battery_level_percent", udid=sim.udid) == 87
+    assert registry.get("tidevice_app_memory_bytes", udid=sim.udid, bundle_id="com.example.demo") > 0
+    assert 'tidevice_gpu_utilization_percent{engine="tiler",udid="%s"}' % sim.udid in registry.render()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 20:05:33
+"""
+
+import asyncio
+import json
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from tidevice import Device, Usbmux
+from tidevice._clocksync import ClockSync, MachClock
+from tidevice._dispatch import Dispatcher, Overflow
+from tidevice._instruments import ServiceInstruments
+from tidevice._perf import DataType, Performance, RunningProcess
+from tidevice._perffarm import PerfFarm
+from tidevice._perfserver import PerfServer
+from tidevice._perfstats import PerfStats, QuantileSketch, ThresholdAlert
+from tidevice._perfstore import PerfStore, RingBuffer
+from tidevice._simulator import DeviceSimulator
+from tidevice.exceptions import MuxError
+
+
+def test_running_process_notification(sim, wait_for):
+    d = Device(sim.udid, Usbmux(sim.address))
+    rp = RunningProcess(d, "com.example.demo")
+    assert rp.get_pid() is None
+
+    pid = sim.launch_app("com.example.demo")
+    wait_for(lambda: rp.get_pid() == pid)  # no polling in 5s window
+    sim.kill_app("com.example.demo")
+    wait_for(lambda: rp.get_pid() is None)
+    pid = sim.launch_app("com.example.demo")
+    wait_for(lambda: rp.get_pid() == pid)
+    sim.launch_app("com.apple.Preferences")
+    assert rp.get_pid() == pid
+
+
+def test_running_process_launched_before(sim):
+    d = Device(sim.udid, Usbmux(sim.address))
+    pid = sim.launch_app("com.example.demo")
+    rp = RunningProcess(d, "com.example.demo")
+    assert rp.get_pid() == pid  # first call always polls
+
+
+def test_perf_store(tmp_path):
+    store = PerfStore(capacity=4, metrics=[DataType.CPU, DataType.FPS])
+    assert store.nbytes == 4 * 8 * (7 + 2)
+    for i in range(6):
+        store.append(DataType.CPU, {"timestamp": (100 + i) * 1000, "pid": 3, "value": i, "sys_value": None, "count": 2})
+    store.append(DataType.FPS, {"time": 100.5, "value": 60})
+    store.append(DataType.FPS, {"time": 100.2, "value": 59})  # clock sync moved back
+    store.append(DataType.NETWORK, {"timestamp": 100000})  # not recorded
+
+    assert len(store) == 6
+    assert store.query(DataType.FPS, start=100.4)["value"] == [60.0, 59.0]
+    assert store.query(DataType.CPU)["value"] == [2.0, 3.0, 4.0, 5.0]
+    assert store.query(DataType.CPU, start=103, end=105)["timestamp"] == [103.0, 104.0]
+    assert store.query(DataType.CPU, start=200)["value"] == []
+
+    assert store.export(str(tmp_path / "perf.csv")) == [str(tmp_path / "perf.cpu.csv"), str(tmp_path / "perf.fps.csv")]
+    lines = (tmp_path / "perf.cpu.csv").read_text().splitlines()
+    assert lines[0] == "timestamp,pid,value,sys_value,count,ctx_switches,wakeups"
+    assert lines[1] == "102.0,3.0,2.0,,2.0,,"
+
+    store.export(str(tmp_path / "perf.jsonl"))
+    rows = [json.loads(line) for line in (tmp_path / "perf.jsonl").read_text().splitlines()]
+    assert len(rows) == 6
+    assert rows[-1] == {"timestamp": 100.5, "value": 59.0, "type": "fps"}
+    assert rows[0]["sys_value"] is None
+
+
+def test_perf_store_network():
+    store = PerfStore(capacity=4, metrics=[DataType.NETWORK])
+    # same as iter_network_flow
+    store.append(DataType.NETWORK, {"interface-detection": {"InterfaceIndex": 14, "Name": "en0"}, "timestamp": 100000})
+    store.append(DataType.NETWORK, {"connection-update": {
+        "RxPackets": 3, "RxBytes": 1200, "TxPackets": 2, "TxBytes": 300, "RxDups": 0, "RxOOO": 0,
+        "TxRetx": 0, "MinRTT": 0.05, "AvgRTT": 0.07, "ConnectionSerial": 7, "Time": None}, "timestamp": 101000})
+    store.append(DataType.NETWORK, {"connection-update": {"RxBytes": 1500, "ConnectionSerial": 7}})  # no timestamp
+
+    assert store.query(DataType.NETWORK) == {
+        "timestamp": [101.0], "ConnectionSerial": [7.0], "RxBytes": [1200.0],
+        "TxBytes": [300.0], "RxPackets": [3.0], "TxPackets": [2.0]}
+
+    buf = RingBuffer(["timestamp", "value"], 2)
+    for values in ([float("nan"), 1], [None, 1], []):
+        with pytest.raises(ValueError):
+            buf.append(values)
+    assert len(buf) == 0
+
+
+def test_perf_stats():
+    sketch = QuantileSketch(0.01)
+    for i in range(1, 1001):
+        sketch.add(i)
+    assert sketch.quantile(.5) == pytest.approx(500, rel=.02)
+    assert sketch.quantile(.99) == pytest.approx(990, rel=.02)
+
+    alerts = []
+    stats = PerfStats(alerts=[ThresholdAlert(DataType.CPU, 50, count=2)],
+                      on_alert=lambda alert, _type, data: alerts.append(data["value"]))
+    for i, cpu in enumerate([10, 60, 90, 95, 20, 70, 80]):
+        stats.update(DataType.CPU, {"timestamp": i * 1000, "value": cpu})
+    for fps in [60, 60, 30, 20, 60, 0, 40, 60]:
+        stats.update(DataType.FPS, {"timestamp": 0, "value": fps})
+    for i in range(60):  # 2 MB per minute
+        stats.update(DataType.MEMORY, {"timestamp": i * 1000, "value": 100 + i / 30})
+
+    summary = stats.summary()
+    assert alerts == [90, 80]
+    assert summary["cpu"]["count"] == 7 and summary["cpu"]["max"] == 95 and summary["cpu"]["spikes"] == 2
+    assert summary["fps"]["janks"] == 3 and summary["fps"]["jank_events"] == 2
+    assert summary["fps"]["dropped_frames"] == 90
+    assert summary["memory"]["slope_mb_per_min"] == pytest.approx(2)
+    assert summary["memory"]["leaking"]
+    assert summary["alerts"] == {"cpu value > 50 for 2 samples": 2}
+
+
+@pytest.mark.parametrize("overflow,expect", [
+    (Overflow.DROP_OLD, [0, 3, 4]),
+    (Overflow.DROP_NEW, [0, 1, 2]),
+])
+def test_dispatcher_overflow(overflow, expect):
+    started, release = threading.Event(), threading.Event()
+    received = []
+
+    def slow(value):
+        started.set()
+        release.wait(3)
+        received.append(value)
+
+    dispatcher = Dispatcher(slow, maxsize=2, overflow=overflow)
+    dispatcher.put(0)
+    assert started.wait(3)  # 0 is taken by worker
+    results = [dispatcher.put(i) for i in range(1, 5)]
+    assert results == [True, True, False, False]
+    assert dispatcher.dropped == 2
+    release.set()
+    dispatcher.close(timeout=3)
+    assert received == expect
+    assert dispatcher.delivered == 3
+    assert not dispatcher.put(5)
+
+
+@pytest.mark.parametrize("overflow", list(Overflow))
+def test_dispatcher_close_stuck(overflow):
+    started, release = threading.Event(), threading.Event()
+    received = []
+
+    def stuck(value):
+        started.set()
+        release.wait(3)
+        received.append(value)
+
+    dispatcher = Dispatcher(stuck, maxsize=2, overflow=overflow)
+    dispatcher.put(0)
+    assert started.wait(3)
+    dispatcher.put(1)
+    dispatcher.put(2)  # queue is full
+    start = time.time()
+    dispatcher.close(timeout=.2)
+    assert time.time() - start < 1
+    assert not dispatcher.put(3)
+    release.set()
+    dispatcher._threads[0].join(3)
+    assert not dispatcher._threads[0].is_alive()
+    assert received == [0]  # queued items are dropped
+
+
+def test_perf_server():
+    from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+    from tornado.testing import bind_unused_port
+    from tornado.websocket import websocket_connect
+
+    async def main(perf: Performance, server: PerfServer):
+        sock, port = bind_unused_port()
+        sock.close()
+        server.listen(port, "127.0.0.1")
+        ws1 = await websocket_connect("ws://127.0.0.1:{}/ws".format(port))
+        ws2 = await websocket_connect("ws://127.0.0.1:{}/ws?types=cpu".format(port))
+        events = asyncio.Queue()
+        client = AsyncHTTPClient()
+        sse = client.fetch("http://127.0.0.1:{}/events".format(port),
+                           streaming_callback=events.put_nowait, request_timeout=10)
+        while server.clients < 3:
+            await asyncio.sleep(.01)
+
+        perf.start("com.example.demo", callback=server.publish)
+        message = json.loads(await asyncio.wait_for(ws1.read_message(), 3))
+        assert message["type"] == "fps"
+        chunk = (await asyncio.wait_for(events.get(), 3)).decode()
+        assert chunk.startswith("data: ") and json.loads(chunk[6:].split("\n")[0])["type"] == "fps"
+        resp = await client.fetch("http://127.0.0.1:{}/snapshot?seconds=60".format(port))
+        assert json.loads(resp.body)["fps"]
+        for path in ["/snapshot?types=foo", "/snapshot?seconds=abc", "/events?types=foo"]:
+            resp = await client.fetch("http://127.0.0.1:{}{}".format(port, path), raise_error=False)
+            assert resp.code == 400, path
+        with pytest.raises(HTTPClientError) as e:
+            await websocket_connect("ws://127.0.0.1:{}/ws?types=foo".format(port))
+        assert e.value.code == 400
+
+        ws1.close()
+        await asyncio.sleep(.2)
+        assert server.clients == 2  # ws2 gets no fps
+        ws2.close()
+        sse.cancel()
+
+    with DeviceSimulator(opengl_interval=.05) as sim:
+        d = Device(sim.udid, Usbmux(sim.address))
+        store = PerfStore(100, [DataType.FPS])
+        perf = Performance(d, [DataType.FPS], store=store)
+        try:
+            asyncio.run(main(perf, PerfServer(store)))
+        finally:
+            perf.stop()
+
+
+def test_clock_sync():
+    clock = ClockSync(scale=1e-6, bucket=10.0)
+    # host clock runs 100 ppm faster than device, delays are 5ms to 50ms, one sample per second
+    for i in range(400):
+        ticks = (100 + i) * 1000000
+        host = 1e9 + ticks * 1e-6 * (1 + 1e-4) + 0.005 + (i * 7 % 10) * 0.005
+        clock.add(ticks, host)
+    assert clock.drift == pytest.approx(1e-4, rel=.01)
+    assert clock.to_host(500 * 1000000) == pytest.approx(1e9 + 500.05 + 0.005, abs=.001)
+    clock.add(100, 2e9)  # device restarted
+    assert clock.drift == 0 and clock.to_host(100) == pytest.approx(2e9)
+
+
+def test_perf_device_time(sim, wait_for):
+    d = Device(sim.udid, Usbmux(sim.address))
+    with d.connect_instruments() as ins:
+        clock = MachClock()
+        clock.probe(ins)
+    assert clock.scale == pytest.approx(125 / 3 / 1e9)
+    assert clock.to_host(sim.mach_absolute_time()) == pytest.approx(time.time(), abs=.05)
+
+    sim.sysmontap_interval = .05
+    sim.launch_app("com.example.demo")
+    samples = []
+    perf = Performance(d, [DataType.CPU])
+    perf.start("com.example.demo", callback=lambda _type, data: samples.append(data))
+    try:
+        wait_for(lambda: len(samples) >= 3)
+    finally:
+        perf.stop()
+    assert samples[-1]["ctx_switches"] > 0 and samples[-1]["wakeups"] > 0
+    assert abs(samples[-1]["timestamp"] / 1000 - time.time()) < 1
+
+
+def test_perf_serve_cli(wait_for):
+    """ --serve without --save stops cleanly on Ctrl-C """
+    from tornado.testing import bind_unused_port
+    with DeviceSimulator(opengl_interval=.05) as sim:
+        sock, port = bind_unused_port()
+        sock.close()
+        p = subprocess.Popen([
+            sys.executable, "-m", "tidevice", "--socket", sim.address, "-u", sim.udid,
+            "perf", "-o", "fps", "--serve", "127.0.0.1:{}".format(port)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            def _listening():
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                    return True
+                except OSError:
+                    return False
+            wait_for(_listening, timeout=10)
+            p.send_signal(signal.SIGINT)
+            _, stderr = p.communicate(timeout=10)
+        finally:
+            p.kill()
+    assert b"Traceback" not in stderr, stderr.decode()
+    assert p.returncode == 0
+
+
+def test_perf_farm(wait_for):
+    samples = []
+    with DeviceSimulator(udid="00008030-000000000000000A", sysmontap_interval=.05, opengl_interval=.05) as sim1, \
+            DeviceSimulator(udid="00008030-000000000000000B", sysmontap_interval=.05, opengl_interval=.05) as sim2:
+        pid = sim1.launch_app("com.example.demo")
+        with PerfFarm(lambda *args: samples.append(args), pid_interval=60) as farm:
+            for sim in (sim1, sim2):
+                farm.add(Device(sim.udid, Usbmux(sim.address)), ["com.example.demo"])
+            wait_for(lambda: {s[0] for s in samples if s[2] == DataType.FPS} == {sim1.udid, sim2.udid})
+            wait_for(lambda: any(s[2] == DataType.CPU for s in samples))
+            pid2 = sim2.launch_app("com.example.demo")  # found by notification
+            wait_for(lambda: any(s[0] == sim2.udid and s[2] == DataType.MEMORY for s in samples))
+        assert farm.dropped == 0
+
+    cpu = [s for s in samples if s[2] == DataType.CPU]
+    assert {(udid, bundle_id, data["pid"]) for udid, bundle_id, _, data in cpu} == {
+        (sim1.udid, "com.example.demo", pid), (sim2.udid, "com.example.demo", pid2)}
+    assert all(s[1] is None and "timestamp" in s[3] for s in samples if s[2] in (DataType.FPS, DataType.GPU))
+
+
+def test_perf_farm_without_notification(monkeypatch, wait_for):
+    def subscribe(self, func):
+        raise MuxError("makeChannel error")
+
+    monkeypatch.setattr(ServiceInstruments, "subscribe_application_notification", subscribe)
+    samples = []
+    PerfFarm(lambda *args: samples.append(args)).stop()  # never started
+    with DeviceSimulator(sysmontap_interval=.05) as sim:
+        with PerfFarm(lambda *args: samples.append(args), perfs=[DataType.CPU], pid_interval=.1) as farm:
+            farm.add(Device(sim.udid, Usbmux(sim.address)), ["com.example.demo"])
+            wait_for(lambda: farm._samplers[sim.udid].connected)
+            pid = sim.launch_app("com.example.demo")  # found by polling
+            wait_for(lambda: any(s[3]["pid"] == pid for s in samples))
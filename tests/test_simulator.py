@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 11:48:10
+"""
+
+import pytest
+
+from tidevice import Device, Usbmux
+
+
+@pytest.fixture
+def d(shared_sim) -> Device:
+    return Device(shared_sim.udid, Usbmux(shared_sim.address))
+
+
+def test_usbmux(shared_sim):
+    um = Usbmux(shared_sim.address)
+    assert um.device_udid_list() == [shared_sim.udid]
+    assert um.read_system_BUID() == shared_sim.buid
+
+
+def test_lockdown(d: Device):
+    assert d.name == "Simulated iPhone"
+    assert d.product_version == "16.4"
+    assert d.get_value("ProductType") == "iPhone14,6"
+    assert d.storage_info().disk_size == 64000000000
+
+
+def test_afc(d: Device):
+    s = d.sync
+    s.mkdir("/tmp/a")
+    s.push_content("/tmp/a/hello.txt", b"hello" * 1000)
+    assert s.listdir("/tmp/a") == ["hello.txt"]
+    assert s.stat("/tmp/a/hello.txt").st_size == 5000
+    assert s.pull_content("/tmp/a/hello.txt") == b"hello" * 1000
+    assert s.rmtree("/tmp") == ["/tmp/a/hello.txt", "/tmp/a/", "/tmp/"]
+    assert not s.exists("/tmp")
+
+
+def test_house_arrest(d: Device):
+    s = d.app_sync("com.example.demo")
+    assert s.listdir("/") == ["Documents"]
+
+
+def test_installation(d: Device):
+    apps = list(d.installation.iter_installed(app_type="User", attrs=["CFBundleIdentifier"]))
+    assert apps == [{"CFBundleIdentifier": "com.example.demo"}]
+
+
+def test_instruments(shared_sim, d: Device):
+    with d.connect_instruments() as ts:
+        pid = ts.app_launch("com.example.demo")
+        assert ts.is_running_pid(pid)
+        infos = {p['pid']: p for p in ts.app_process_list(list(shared_sim.apps.values()))}
+        assert infos[pid]['bundle_id'] == "com.example.demo"
+
+    with d.connect_instruments() as ts:
+        sinfo, pinfo = next(ts.iter_cpu_memory())
+        assert sinfo['CPUCount'] == 6
+        assert pid in pinfo['Processes']
+
+    with d.connect_instruments() as ts:
+        data = next(ts.iter_opengl_data())
+        assert 'CoreAnimationFramesPerSecond' in data
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 14:15:36
+"""
+
+import io
+import os
+import tarfile
+import threading
+import zipfile
+
+import pytest
+
+from tidevice import Device, Usbmux
+from tidevice._proto import AFC, AFCStatus
+from tidevice._sync import Sync
+
+
+@pytest.fixture(scope="module")
+def sim(shared_sim):
+    """ shared_sim with files in /tree """
+    for d in ("a", "a/b"):
+        os.makedirs(os.path.join(shared_sim.root, "tree", d))
+    for i in range(50):
+        with open(os.path.join(shared_sim.root, "tree", "a", f"{i}.txt"), "w") as f:
+            f.write("x" * i)
+    open(os.path.join(shared_sim.root, "tree", "a", "b", "c.txt"), "w").close()
+    return shared_sim
+
+
+@pytest.fixture
+def sync(sim) -> Sync:
+    s = Device(sim.udid, Usbmux(sim.address)).sync
+    s.pipeline_depth = 8
+    return s
+
+
+def test_stat_many(sync: Sync):
+    paths = [f"/tree/a/{i}.txt" for i in range(50)]
+    infos = sync.stat_many(paths)
+    assert [i.st_size for i in infos] == list(range(50))
+    assert infos == [sync.stat(p) for p in paths]
+
+    infos = sync.stat_many(["/tree/a", "/not-exist"], with_error=True)
+    assert infos[0][0].is_dir() and infos[0][1] is None
+    assert infos[1] == (None, AFCStatus.ST_OBJECT_NOT_FOUND)
+
+
+def test_pipeline_abandoned(sync: Sync):
+    requests = ((AFC.OP_GET_FILE_INFO, f"/tree/a/{i}.txt".encode(), b'') for i in range(50))
+    it = sync._pipeline(requests)
+    assert next(it).status == AFCStatus.ST_SUCCESS
+    it.close()  # responses in flight are drained
+    assert sync.stat("/tree/a/3.txt").st_size == 3
+
+
+def test_listdir_info_walk(sync: Sync):
+    infos = sync.listdir_info("/tree/a")
+    assert len(infos) == 51
+    assert infos[0].st_name == "b"
+    assert list(sync.walk("/tree")) == [
+        ("/tree", ["a"], []),
+        ("/tree/a", ["b"], sorted(f"{i}.txt" for i in range(50))),
+        ("/tree/a/b", [], ["c.txt"]),
+    ]
+
+
+def test_rmtree(sync: Sync):
+    sync.mkdir("/rm/d")
+    for name in ("/rm/1", "/rm/d/2"):
+        sync.push_content(name, b"x")
+    assert sync.rmtree("/rm") == ["/rm/1", "/rm/d/2", "/rm/d/", "/rm/"]
+    assert not sync.exists("/rm")
+
+
+def test_mirror_pull(sim, sync: Sync, tmp_path):
+    result = sync.mirror("/tree", str(tmp_path))
+    assert len(result.copied) == 51
+    assert (tmp_path / "a" / "3.txt").read_text() == "xxx"
+
+    result = sync.mirror("/tree", str(tmp_path))
+    assert result.copied == [] and len(result.unchanged) == 51
+
+    sync.push_content("/tree/a/3.txt", b"yyy")  # same size, mtime changed
+    (tmp_path / "a" / "extra.txt").write_text("extra")
+    result = sync.mirror("/tree", str(tmp_path), delete=True, checksum=True)
+    assert result.copied == ["a/3.txt"] and result.deleted == ["a/extra.txt"]
+    assert (tmp_path / "a" / "3.txt").read_text() == "yyy"
+
+    sync.push_content("/tree/a/3.txt", b"yyy")
+    result = sync.mirror("/tree", str(tmp_path), checksum=True)
+    assert result.copied == [] and len(result.unchanged) == 51
+    sync.push_content("/tree/a/3.txt", b"xxx")
+
+
+def test_mirror_push(sim, sync: Sync, tmp_path):
+    (tmp_path / "d").mkdir()
+    (tmp_path / "d" / "1.txt").write_text("1")
+    (tmp_path / "2.txt").write_text("2")
+    result = sync.mirror(str(tmp_path), "/mirror", push=True)
+    assert sorted(result.copied) == ["2.txt", "d/1.txt"]
+    assert sync.pull_content("/mirror/d/1.txt") == b"1"
+    assert not sync.exists("/mirror/.tidevice-mirror.json")
+
+    (tmp_path / "2.txt").unlink()
+    (tmp_path / "d" / "1.txt").write_text("11")
+    result = sync.mirror(str(tmp_path), "/mirror", push=True, delete=True)
+    assert result.copied == ["d/1.txt"] and result.deleted == ["2.txt"]
+    assert sync.pull_content("/mirror/d/1.txt") == b"11"
+    sync.rmtree("/mirror")
+
+
+def test_push_stream(sync: Sync, tmp_path):
+    content = os.urandom((3 << 20) + 5)
+    path = tmp_path / "big.bin"
+    path.write_bytes(content)
+    os.utime(path, (1600000000, 1600000000))
+    sync.push(path, "/big.bin", chunk_size=256 * 1024, window=4)
+    assert sync.pull_content("/big.bin") == content
+    assert sync.stat("/big.bin").st_mtime.timestamp() == 1600000000
+
+    sync.push_content("/big.bin", b"small")
+    assert sync.pull_content("/big.bin") == b"small"
+    sync.remove("/big.bin")
+
+
+def test_touch(sync: Sync):
+    sync.push_content("/touch.txt", b"x")
+    sync.set_mtime("/touch.txt", 1600000000)
+    sync.touch("/touch.txt")
+    info = sync.stat("/touch.txt")
+    assert info.st_size == 1 and info.st_mtime.timestamp() > 1600000000
+    sync.remove("/touch.txt")
+
+
+def test_read_range_resume(sync: Sync, tmp_path):
+    content = os.urandom(100 * 1024)
+    sync.push_content("/resume.bin", content)
+    assert sync.read_range("/resume.bin", 1000, 10) == content[1000:1010]
+    assert b"".join(sync.iter_content("/resume.bin", offset=90 * 1024)) == content[90 * 1024:]
+
+    local = tmp_path / "resume.bin"
+    local.write_bytes(content[:70000])
+    sync.pull("/resume.bin", local, resume=True)
+    assert local.read_bytes() == content
+
+    local.write_bytes(b"x" * 100)  # not the head of device file
+    sync.pull("/resume.bin", local, resume=True)
+    assert local.read_bytes() == content
+    sync.remove("/resume.bin")
+
+
+@pytest.mark.parametrize("fmt", ["tar", "zip"])
+def test_export_archive(sync: Sync, fmt: str):
+    buf = io.BytesIO()
+    assert sync.export_archive("/tree", buf, format=fmt, compress=True) == 51
+    buf.seek(0)
+    if fmt == "tar":
+        with tarfile.open(fileobj=buf) as tf:
+            assert tf.extractfile("a/3.txt").read() == b"xxx"
+            assert tf.getmember("a/b").isdir()
+            assert len(tf.getmembers()) == 53
+    else:
+        with zipfile.ZipFile(buf) as zf:
+            assert zf.read("a/3.txt") == b"xxx"
+            assert len(zf.namelist()) == 53
+
+
+def test_cache(sync: Sync):
+    sync.enable_cache()
+    assert sync.stat("/tree/a/3.txt").st_size == 3
+    assert sync.stat("/tree/a/3.txt").st_size == 3
+    assert not sync.exists("/cache/d")
+    assert sync.cache_info()[:2] == (1, 2)
+
+    sync.mkdir("/cache/d")
+    assert sync.exists("/cache/d")
+    assert sync.listdir("/cache/d") == []
+    sync.push_content("/cache/d/1.txt", b"1")
+    assert sync.listdir("/cache/d") == ["1.txt"]
+    assert sync.stat("/cache/d/1.txt").st_size == 1
+    sync.push_content("/cache/d/1.txt", b"11")
+    assert sync.stat("/cache/d/1.txt").st_size == 2
+
+    sync.rename("/cache/d", "/cache/e")
+    assert not sync.exists("/cache/d/1.txt")
+    assert sync.listdir("/cache") == ["e"]
+    sync.rmtree("/cache")
+    assert not sync.exists("/cache/e")
+    assert not sync.exists("/cache")
+
+    hits = sync.cache_info().hits
+    assert sync.listdir_info("/tree/a") and sync.listdir_info("/tree/a")
+    assert sync.cache_info().hits == hits + 1 + 53  # 3.txt, then everything
+
+
+def test_find_du(sim, sync: Sync):
+    def connect():
+        return Device(sim.udid, Usbmux(sim.address)).connect_sync()
+
+    found = sorted(path for path, _ in sync.find("/tree", "4*.txt", connect=connect, jobs=3))
+    assert found == ["/tree/a/4.txt"] + [f"/tree/a/{i}.txt" for i in range(40, 50)]
+    found = [path for path, _ in sync.find("/tree", min_size=48)]
+    assert sorted(found) == ["/tree/a/48.txt", "/tree/a/49.txt"]
+
+    total = sum(range(50))
+    assert sync.du("/tree", depth=1, connect=connect) == [("/tree", total), ("/tree/a", total)]
+    assert sync.du("/tree/", depth=0) == [("/tree", total)]
+
+
+def test_stat_raw(sync: Sync):
+    raw = sync.stat_raw("/tree/a/3.txt")
+    info = sync.stat("/tree/a/3.txt")
+    assert raw.to_stat_result() == info
+    assert raw.st_mtime == info.st_mtime and raw.st_mtime_ns > 0
+    assert not hasattr(raw, "__dict__")
+    assert sync.stat_raw("/not-exist", with_error=True) == (None, AFCStatus.ST_OBJECT_NOT_FOUND)
+
+
+def test_shared_between_threads(sync: Sync):
+    errors = []
+
+    def worker(i: int):
+        try:
+            for _ in range(10):
+                assert sync.stat(f"/tree/a/{i}.txt").st_size == i
+                assert len(sync.stat_many([f"/tree/a/{j}.txt" for j in range(i, 50)])) == 50 - i
+                assert sync.read_range(f"/tree/a/{i}.txt", 0, 100) == b"x" * i
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i, )) for i in range(8)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert errors == []
+
+
+def test_afc_pool(sim):
+    d = Device(sim.udid, Usbmux(sim.address))
+    s = d.sync
+    assert d.sync is s
+    assert d.app_sync("com.example.demo") is d.app_sync("com.example.demo")
+    assert d.app_sync("com.example.demo") is not s
+    assert d.connect_sync() is not s
+    with d.sync as s2:  # callers closing the shared connection do not close it
+        s2.close()
+    assert d.sync is s and s.exists("/tree")
+    d.close()
+    assert s.closed
+    assert d.sync is not s and d.sync.exists("/tree")
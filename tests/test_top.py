@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Mon Oct 19 2026 13:41:30
+"""
+
+from tidevice import Device, Usbmux
+from tidevice._proto import SYSMON_PROC_ATTRS
+from tidevice._simulator import DeviceSimulator
+from tidevice._top import ProcessTable, iter_top
+
+
+def _attrs(pid: int, cpu: float, memory: int, ctx_switch: int, wakeups: int) -> list:
+    values = dict(pid=pid, cpuUsage=cpu, physFootprint=memory, ctxSwitch=ctx_switch, intWakeups=wakeups)
+    return [values.get(name, 0) for name in SYSMON_PROC_ATTRS]
+
+
+def test_process_table():
+    table = ProcessTable(capacity=2)
+    assert table.update({1: _attrs(1, 1.0, 100, 1000, 10), 2: _attrs(2, 5.0, 50, 0, 0)}, 10.0) == [1, 2]
+    assert table.row(table.top("cpu", 1)[0]) == {
+        "pid": 2, "cpu": 5.0, "memory": 50.0, "wakeups": None, "ctx_switches": None}
+
+    # pid 2 exited, its row is freed after pid 3 is added
+    assert table.update({1: _attrs(1, 2.0, 100, 1500, 30), 3: _attrs(3, 3.0, 300, 0, 0)}, 12.0) == [3]
+    assert len(table) == 2 and table.capacity == 4
+    rows = [table.row(row) for row in table.top("ctx_switches", 5)]
+    assert rows[0] == {"pid": 1, "cpu": 2.0, "memory": 100.0, "wakeups": 10.0, "ctx_switches": 250.0}
+    assert rows[1]["pid"] == 3 and rows[1]["ctx_switches"] is None
+    assert [table.pids[row] for row in table.top("memory", 1)] == [3]
+
+    table.update({1: _attrs(1, 0.0, 0, 0, 0), 3: _attrs(3, 0.0, 0, 0, 0), 4: _attrs(4, 0.0, 0, 0, 0)}, 13.0)
+    assert len(table) == 3 and table.capacity == 4  # row of pid 2 reused
+
+
+def test_iter_top():
+    with DeviceSimulator(sysmontap_interval=.05) as sim:
+        pid = sim.launch_app("com.example.demo")
+        d = Device(sim.udid, Usbmux(sim.address))
+        it = iter_top(d, limit=3, sort_by="memory")
+        snapshots = [next(it) for _ in range(3)]
+        it.close()
+
+    assert snapshots[-1]["cpu_count"] == 6
+    processes = snapshots[-1]["processes"]
+    assert len(processes) == 3
+    assert processes[0]["pid"] == pid and processes[0]["bundle_id"] == "com.example.demo"
+    assert processes[0]["ctx_switches"] > 0 and processes[0]["wakeups"] > 0
+    assert all(p["name"] != "?" for p in processes)
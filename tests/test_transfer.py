@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 15:48:02
+"""
+
+import os
+import shutil
+import threading
+
+import pytest
+
+from tidevice import Device, Usbmux
+from tidevice._crash import SEEN_NAME
+from tidevice._sync import Sync
+from tidevice._transfer import TransferEngine
+from tidevice.exceptions import MuxError
+
+
+def _make_tree(root: str) -> dict:
+    files = {
+        "a/1.txt": b"hello",
+        "a/b/2.txt": b"",
+        "big.bin": os.urandom(300 * 1024 + 7),
+    }
+    for name, content in files.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+    return files
+
+
+def _read_tree(root: str) -> dict:
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for fname in filenames:
+            path = os.path.join(dirpath, fname)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return files
+
+
+@pytest.fixture
+def d(shared_sim) -> Device:
+    return Device(shared_sim.udid, Usbmux(shared_sim.address))
+
+
+def test_pull_push(shared_sim, d: Device, tmp_path):
+    files = _make_tree(str(tmp_path / "src"))
+    engine = TransferEngine(d.connect_sync, jobs=3, range_size=64 * 1024, chunk_size=16 * 1024)
+
+    stats = engine.push(tmp_path / "src", "/tree")
+    assert stats.files == 3 and stats.bytes == sum(map(len, files.values()))
+    assert _read_tree(os.path.join(shared_sim.root, "tree")) == files
+
+    stats = engine.pull("/tree", tmp_path / "dst")
+    assert stats.files == 3 and stats.throughput > 0
+    assert _read_tree(str(tmp_path / "dst")) == files
+
+    engine.pull("/tree/big.bin", tmp_path)
+    assert (tmp_path / "big.bin").read_bytes() == files["big.bin"]
+
+
+def test_push_failed(shared_sim, d: Device, tmp_path, monkeypatch):
+    (tmp_path / "big.bin").write_bytes(os.urandom(300 * 1024))
+    write_many = Sync._file_write_many
+    calls = []
+
+    def fail_second_range(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise MuxError("write error")
+        return write_many(self, *args, **kwargs)
+
+    monkeypatch.setattr(Sync, "_file_write_many", fail_second_range)
+    engine = TransferEngine(d.connect_sync, jobs=1, range_size=64 * 1024)
+    with pytest.raises(MuxError):
+        engine.push(tmp_path / "big.bin", "/failed.bin")
+    assert not os.path.exists(os.path.join(shared_sim.root, "failed.bin"))
+
+
+def test_crashreport_pull(shared_sim, d: Device, tmp_path):
+    files = _make_tree(shared_sim.crash_root)
+    cm = d.get_crashmanager()
+    stats = cm.pull(str(tmp_path), remove=True, jobs=2)
+    assert stats.files == 3
+    assert _read_tree(str(tmp_path)) == files
+    assert os.listdir(shared_sim.crash_root) == []
+
+
+def test_pull_resume(shared_sim, d: Device, tmp_path):
+    files = _make_tree(os.path.join(shared_sim.root, "resume"))
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "1.txt").write_bytes(b"hel")
+    (tmp_path / "big.bin").write_bytes(files["big.bin"][:1000])
+    engine = TransferEngine(d.connect_sync, jobs=2, range_size=64 * 1024)
+    stats = engine.pull("/resume", tmp_path, resume=True)
+    assert stats.bytes == 2 + len(files["big.bin"]) - 1000
+    assert _read_tree(str(tmp_path)) == files
+
+    stats = engine.pull("/resume", tmp_path, resume=True)
+    assert stats.files == 1  # the empty file
+
+    engine.pull("/resume", tmp_path / "moved", remove=True)
+    assert _read_tree(str(tmp_path / "moved")) == files
+    assert not os.path.exists(os.path.join(shared_sim.root, "resume"))
+
+
+def test_crashreport_watch(shared_sim, d: Device, tmp_path):
+    files = _make_tree(shared_sim.crash_root)
+    spool = str(tmp_path / "spool")
+    cm = d.get_crashmanager()
+    try:
+        new = cm.poll(spool, jobs=2)
+        assert sorted(fpath for fpath, _ in new) == ["/a/1.txt", "/a/b/2.txt", "/big.bin"]
+        tree = _read_tree(spool)
+        assert tree.pop(SEEN_NAME) and tree == files
+        assert cm.poll(spool) == []
+
+        with open(os.path.join(shared_sim.crash_root, "a", "3.txt"), "wb") as f:
+            f.write(b"crash")
+        assert cm.poll(spool, jobs=1) == [("/a/3.txt", os.path.join(spool, "a", "3.txt"))]
+        assert d.get_crashmanager().poll(spool) == []  # seen files are persisted
+
+        # only the mtime of /a/b changes
+        with open(os.path.join(shared_sim.crash_root, "a", "b", "5.txt"), "wb") as f:
+            f.write(b"crash")
+        assert cm.poll(spool) == [("/a/b/5.txt", os.path.join(spool, "a", "b", "5.txt"))]
+        assert cm.poll(spool) == []
+
+        with open(os.path.join(shared_sim.crash_root, "4.txt"), "wb") as f:
+            f.write(b"crash")
+        stop = threading.Event()
+        found = []
+
+        def callback(fpath: str, lpath: str):
+            found.append(fpath)
+            stop.set()
+
+        cm.watch(spool, interval=.01, callback=callback, remove=True, stop=stop)
+        assert found == ["/4.txt"]
+        assert not os.path.exists(os.path.join(shared_sim.crash_root, "4.txt"))
+    finally:
+        shutil.rmtree(shared_sim.crash_root)
+        os.makedirs(shared_sim.crash_root)
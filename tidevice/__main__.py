@@ -4,6 +4,7 @@
 """
 
 import argparse
+import asyncio
 import base64
 import json
 import logging
@@ -29,6 +30,7 @@ from ._ipautil import IPAReader
 from ._perf import DataType
 from ._proto import LOG, MODELS, PROGRAM_NAME, ConnectionType
 from ._relay import relay
+from ._transfer import TransferEngine, format_size
 from ._usbmux import Usbmux
 from ._utils import is_atty
 from ._version import __version__
@@ -336,7 +338,7 @@ def cmd_applist(args: argparse.Namespace):
         "all": None,
     }[_type]
 
-    for info in d.installation.iter_installed(app_type=app_type):
+    for info in d.app_index.apps(app_type):
         # bundle_path = info['BundlePath']
         bundle_id = info['CFBundleIdentifier']
 
@@ -460,8 +462,16 @@ def cmd_crashreport(args: argparse.Namespace):
         sys.exit(1)
 
     remove: bool = not args.keep
-    cm.afc.pull("/", args.output_directory, remove=remove)
-    logger.info("Done")
+    if args.watch:
+        spool = os.path.join(args.output_directory, d.udid)
+        logger.info("Watch crash logs, save to %s", spool)
+        try:
+            cm.watch(spool, interval=args.interval, remove=remove, jobs=args.jobs)
+        except KeyboardInterrupt:
+            pass
+        return
+    stats = cm.pull(args.output_directory, remove=remove, jobs=args.jobs)
+    logger.info("Done %s", stats or "")
 
 def cmd_developer(args: argparse.Namespace):
     if args.download_all:
@@ -552,12 +562,23 @@ def cmd_unpair(args: argparse.Namespace):
     d.delete_pair_record()
 
 
+def _parse_size(size: str) -> int:
+    """ 100, 10K, 1.5M, 2G -> bytes """
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    size = size.strip().upper().rstrip("B")
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
 def cmd_fsync(args: argparse.Namespace):
     d = _udid2device(args.udid)
     if args.bundle_id:
-        sync = d.app_sync(args.bundle_id)
+        connect = lambda: d.connect_sync(args.bundle_id)
     else:
-        sync = d.sync
+        connect = d.connect_sync
+    # pull and push open connections of their own in TransferEngine
+    sync = connect() if args.command not in ('pull', 'push') else None
 
     arg0 = args.arguments[0]
     if args.command == 'ls':
@@ -588,11 +609,13 @@ def cmd_fsync(args: argparse.Namespace):
             arg1 = args.arguments[1]
         src = pathlib.Path(arg0)
         dst = pathlib.Path(arg1)
-        if dst.is_dir() and src.name and sync.stat(src).is_dir():
-            dst = dst.joinpath(src.name)
+        if dst.is_dir() and src.name:
+            with connect() as sync:
+                if sync.stat(src).is_dir():
+                    dst = dst.joinpath(src.name)
 
-        sync.pull(src, dst)
-        print("pulled", src, "->", dst)
+        stats = TransferEngine(connect, jobs=args.jobs).pull(src, dst, resume=args.resume)
+        print("pulled", src, "->", dst, stats)
     elif args.command == 'cat':
         for chunk in sync.iter_content(arg0):
             sys.stdout.write(chunk.decode('utf-8'))
@@ -600,11 +623,33 @@ def cmd_fsync(args: argparse.Namespace):
     elif args.command == 'push':
         local_path = args.arguments[0]
         device_path = args.arguments[1]
-        assert os.path.isfile(local_path)
-        with open(local_path, "rb") as f:
-            content = f.read()
-            sync.push_content(device_path, content)
-            print("pushed to", device_path)
+        assert os.path.exists(local_path)
+        stats = TransferEngine(connect, jobs=args.jobs).push(local_path, device_path)
+        print("pushed to", device_path, stats)
+    elif args.command == 'find':
+        # fsync find / "*.mov" --min-size 100M
+        pattern = args.arguments[1] if len(args.arguments) > 1 else "*"
+        for fpath, finfo in sync.find(arg0, pattern, min_size=_parse_size(args.min_size), connect=connect, jobs=args.jobs):
+            print("{}\t{}{}".format(finfo.st_size, fpath, "/" if finfo.is_dir() else ""), flush=True)
+    elif args.command == 'du':
+        usages = sync.du(arg0, depth=args.depth, connect=connect, jobs=args.jobs)
+        for dpath, size in sorted(usages, key=lambda x: x[1], reverse=True):
+            print("{}\t{}".format(format_size(size), dpath))
+    elif args.command == 'archive':
+        # fsync archive /DCIM DCIM.tar.gz, output "-" for stdout
+        output = args.arguments[1] if len(args.arguments) > 1 else pathlib.Path(arg0).name + ".tar"
+        fmt = "zip" if output.endswith(".zip") else "tar"
+        compress = output.endswith((".zip", ".tar.gz", ".tgz"))
+        if output == "-":
+            count = sync.export_archive(arg0, sys.stdout.buffer, format=fmt, compress=compress)
+        else:
+            with open(output, "wb") as f:
+                count = sync.export_archive(arg0, f, format=fmt, compress=compress)
+        print("archived", count, "files to", output, file=sys.stderr)
+    elif args.command == 'mirror':
+        src, dst = args.arguments[:2]
+        result = sync.mirror(src, dst, push=args.push, delete=args.delete, checksum=args.checksum)
+        print("mirror", src, "->", dst, result)
     elif args.command == 'rmtree':
         pprint(sync.rmtree(arg0))
     elif args.command == 'mkdir':
@@ -615,7 +660,7 @@ def cmd_fsync(args: argparse.Namespace):
 
 def cmd_ps(args: argparse.Namespace):
     d = _udid2device(args.udid)
-    app_infos = list(d.installation.iter_installed(app_type=None))
+    app_infos = d.app_index.exe_index()
     with d.connect_instruments() as ts:
         ps = list(ts.app_process_list(app_infos))
 
@@ -645,9 +690,37 @@ def cmd_ps(args: argparse.Namespace):
         print(fmt.format(*[p[key] for key in keys]), flush=True)
 
 
+def cmd_top(args: argparse.Namespace):
+    from ._top import iter_top
+    d = _udid2device(args.udid)
+
+    def _fmt(value, scale: float = 1.0):
+        return "-" if value is None else "{:.1f}".format(value / scale)
+
+    try:
+        for snapshot in iter_top(d, args.number, args.sort):
+            if args.json:
+                print(json.dumps(snapshot), flush=True)
+                continue
+            tabdata = [[
+                p['pid'], p['bundle_id'] or p['name'],
+                _fmt(p['cpu']), _fmt(p['memory'], 1024 * 1024),
+                _fmt(p['wakeups']), _fmt(p['ctx_switches'])
+            ] for p in snapshot['processes']]
+            if is_atty:
+                print("\033[H\033[J", end="")  # clear screen
+            print("CPU: {:.1f}%  CPUCount: {}".format(snapshot['cpu'], snapshot['cpu_count']))
+            print(tabulate(tabdata, headers=["PID", "NAME", "CPU%", "MEM(MB)", "WAKEUPS/s", "CTXSW/s"],
+                           tablefmt="plain", disable_numparse=True), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
 def cmd_perf(args: argparse.Namespace):
     #print("BundleID:", args.bundle_id)
     from ._perf import Performance
+    from ._perfstats import PerfStats
+    from ._perfstore import PerfStore
     d = _udid2device(args.udid)
     perfs = list(DataType)
     if args.perfs:
@@ -659,7 +732,17 @@ def cmd_perf(args: argparse.Namespace):
         print('\033[1;31m error: the following arguments are required: -B/--bundle_id \033[0m')
         exit(-1)
 
-    perf = Performance(d, perfs=perfs)
+    store = PerfStore(args.capacity, perfs) if args.save or args.serve else None
+    stats = PerfStats() if args.summary else None
+    perf = Performance(d, perfs=perfs, store=store, stats=stats, overflow=args.overflow)
+
+    async def _serve():
+        from ._perfserver import PerfServer, parse_address
+        server = PerfServer(store)
+        host, port = parse_address(args.serve)
+        server.listen(port, host)
+        perf.start(args.bundle_id, callback=server.publish)
+        await asyncio.Event().wait()
 
     def _cb(_type: DataType, data):
         if args.json and _type != DataType.SCREENSHOT:
@@ -667,6 +750,8 @@ def cmd_perf(args: argparse.Namespace):
         print(_type.value, data, flush=True) if len(perfs) != 1 else print(data,flush=True)
 
     try:
+        if args.serve:
+            asyncio.run(_serve())
         perf.start(args.bundle_id, callback=_cb)
         #print("Ctrl-C to finish")
         while True:
@@ -674,7 +759,35 @@ def cmd_perf(args: argparse.Namespace):
     except KeyboardInterrupt:
         pass
     finally:
-        perf.stop()
+        summary = perf.stop()
+        if summary is not None:
+            _print_json(summary)
+        if store is not None and args.save:
+            for path in store.export(args.save):
+                logger.info("Samples saved to %s", path)
+
+def cmd_exporter(args: argparse.Namespace):
+    from ._exporter import Exporter
+    from ._perfserver import parse_address
+    intervals = {}
+    for item in args.interval or []:
+        name, _, seconds = item.partition("=")
+        intervals[name] = float(seconds)
+    exporter = Exporter(um, args.bundle_ids or [], intervals)
+
+    async def _serve():
+        host, port = parse_address(args.listen)
+        exporter.listen(port, host)
+        await asyncio.Event().wait()
+
+    exporter.start()
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        exporter.stop()
+
 
 def cmd_set_assistive_touch(args: argparse.Namespace):
     d = _udid2device(args.udid)
@@ -835,6 +948,22 @@ _commands = [
                   help='show all process')
          ],
          help="show running processes"),
+    dict(action=cmd_top,
+         command="top",
+         flags=[
+             dict(args=['-n', '--number'],
+                  type=int,
+                  default=10,
+                  help='number of processes'),
+             dict(args=['-s', '--sort'],
+                  choices=['cpu', 'memory', 'wakeups', 'ctx_switches'],
+                  default='cpu',
+                  help='sort by'),
+             dict(args=['--json'],
+                  action='store_true',
+                  help='one json line per sample'),
+         ],
+         help="top processes by cpu, memory, wakeups or context switches"),
     dict(action=cmd_relay,
          command="relay",
          flags=[
@@ -908,10 +1037,35 @@ _commands = [
          command="fsync",
          flags=[
              dict(args=['-B', '--bundle_id'], help='app bundle id'),
+             dict(args=['-j', '--jobs'],
+                  type=int,
+                  default=4,
+                  help='number of connections used by pull and push, default 4'),
+             dict(args=['--resume'],
+                  action='store_true',
+                  help='pull continue from the end of existing local files, '
+                  'an interrupted file larger than 8MB is pulled again'),
+             dict(args=['--push'],
+                  action='store_true',
+                  help='mirror from local to device'),
+             dict(args=['--min-size'],
+                  default="0",
+                  help='find files not smaller than MIN_SIZE, eg: 100M'),
+             dict(args=['--depth'],
+                  type=int,
+                  default=1,
+                  help='du report directories not deeper than DEPTH, default 1'),
+             dict(args=['--delete'],
+                  action='store_true',
+                  help='mirror also delete files which not exist in source'),
+             dict(args=['--checksum'],
+                  action='store_true',
+                  help='mirror compare SHA1 of files with the same size'),
              dict(args=['command'],
                   choices=[
                       'ls', 'rm', 'cat', 'pull', 'push', 'stat', 'tree',
-                      'rmtree', 'mkdir', 'touch'
+                      'rmtree', 'mkdir', 'touch', 'mirror', 'archive',
+                      'find', 'du'
                   ]),
              dict(args=['arguments'], nargs='+', help='command arguments'),
          ],
@@ -928,6 +1082,17 @@ _commands = [
              dict(args=['-c', '--clear'],
                   action='store_true',
                   help='clear crash files'),
+             dict(args=['-j', '--jobs'],
+                  type=int,
+                  default=4,
+                  help='number of connections used to copy crash files, default 4'),
+             dict(args=['-w', '--watch'],
+                  action='store_true',
+                  help='keep copying new crash logs to OUTPUT_DIRECTORY/<udid>'),
+             dict(args=['--interval'],
+                  type=float,
+                  default=10.0,
+                  help='seconds between polls in watch mode, default 10'),
              dict(args=['output_directory'],
                   nargs="?",
                   help='The output dir to save crash logs synced from device'),
@@ -963,8 +1128,40 @@ _commands = [
             dict(args=['--json'],
                   action='store_true',
                   help='format output as json'),
+             dict(args=['--save'],
+                  help='save samples when finished, by extension: .csv, .jsonl or .parquet'),
+             dict(args=['--summary'],
+                  action='store_true',
+                  help='print p50/p90/p99, janks, cpu spikes and memory growth when finished'),
+             dict(args=['--capacity'],
+                  type=int,
+                  default=3600,
+                  help='max samples saved per metric, old samples are dropped, default 3600'),
+             dict(args=['--overflow'],
+                  choices=['drop_old', 'drop_new', 'block'],
+                  default='drop_old',
+                  help='when output is slower than sampling, default drop_old'),
+             dict(args=['--serve'],
+                  metavar='[HOST]:PORT',
+                  help='stream samples to websocket (/ws) and server-sent events (/events) clients, latest samples in /snapshot'),
          ],
          help="performance of app"),
+    dict(action=cmd_exporter,
+         command="exporter",
+         flags=[
+             dict(args=['-B', '--bundle_id'],
+                  dest='bundle_ids',
+                  action='append',
+                  help='app bundle id for cpu/memory metrics, support multi -B'),
+             dict(args=['--listen'],
+                  metavar='[HOST]:PORT',
+                  default=':9100',
+                  help='serve /metrics'),
+             dict(args=['--interval'],
+                  action='append',
+                  help='seconds between polls, format name=seconds, name is devices, battery or storage'),
+         ],
+         help="prometheus exporter of all devices"),
     dict(action=cmd_set_assistive_touch,
          command="set-assistive-touch",
          flags=[
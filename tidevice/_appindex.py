@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 19:26:40
+
+Cached index of installed applications
+
+Browse with all attributes returns hundreds of KB plist (Entitlements, usage
+descriptions...) for every app. AppIndex requests only the attributes listed
+in APP_INDEX_ATTRS, and refresh is incremental: a Browse with only
+CFBundleIdentifier, SequenceNumber and Path finds the installed, updated and
+removed apps, then only the changed apps are looked up with full attributes.
+
+Usage:
+    index = d.app_index
+    index.get("com.example.demo")["CFBundleExecutable"]
+    index.by_executable("/var/containers/Bundle/Application/.../Demo.app/Demo")
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ._installation import Installation
+from ._proto import PROGRAM_NAME
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+APP_INDEX_ATTRS = [
+    'ApplicationType',
+    'CFBundleDisplayName',
+    'CFBundleExecutable',
+    'CFBundleIdentifier',
+    'CFBundleName',
+    'CFBundleShortVersionString',
+    'CFBundleVersion',
+    'Path',
+    'SequenceNumber',
+]
+
+_VERSION_ATTRS = ['CFBundleIdentifier', 'SequenceNumber', 'Path']
+
+
+def _version(info: dict) -> tuple:
+    """ changed when app is installed again or updated """
+    return (info.get('SequenceNumber'), info.get('Path'))
+
+
+def exe_path_index(app_infos: Iterable[dict]) -> Dict[str, dict]:
+    """ returns {executable path: appinfo}, path without /private prefix as realAppName of processes """
+    index = {}
+    for info in app_infos:
+        # info may not contain key "Path"
+        # https://github.com/alibaba/taobao-iphone-device/issues/61
+        path = info.get('Path', "") + "/" + info.get('CFBundleExecutable', "")
+        if path.startswith("/private/"):
+            path = path[len("/private"):]
+        index.setdefault(path, info)
+    return index
+
+
+class AppIndex:
+    def __init__(self, connect: Callable[[], Installation], max_age: float = 10.0):
+        """
+        Args:
+            connect: returns a new Installation connection
+            max_age: seconds before cached apps are checked for changes again
+        """
+        self._connect = connect
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._apps: Dict[str, dict] = {}
+        self._versions: Dict[str, tuple] = {}
+        self._exe_index: Dict[str, dict] = {}
+        self._updated_at: Optional[float] = None
+
+    def refresh(self, force: bool = False) -> Tuple[List[str], List[str]]:
+        """ check installed apps for changes
+
+        Args:
+            force: fetch all apps again
+
+        Returns:
+            (changed bundle ids, removed bundle ids)
+        """
+        with self._lock:
+            with self._connect() as ins:
+                if force or self._updated_at is None:
+                    apps = {
+                        info['CFBundleIdentifier']: info
+                        for info in ins.iter_installed(app_type=None, attrs=APP_INDEX_ATTRS)
+                    }
+                    removed = [bundle_id for bundle_id in self._apps if bundle_id not in apps]
+                    changed = list(apps)
+                else:
+                    versions = {
+                        info['CFBundleIdentifier']: _version(info)
+                        for info in ins.iter_installed(app_type=None, attrs=_VERSION_ATTRS)
+                    }
+                    removed = [bundle_id for bundle_id in self._apps if bundle_id not in versions]
+                    changed = [
+                        bundle_id for bundle_id, version in versions.items()
+                        if self._versions.get(bundle_id) != version
+                    ]
+                    apps = dict(self._apps)
+                    for bundle_id in removed:
+                        del apps[bundle_id]
+                    if changed:
+                        apps.update(ins.lookup_apps(changed, APP_INDEX_ATTRS))
+            if changed or removed:
+                logger.debug("app index: %d changed, %d removed", len(changed), len(removed))
+                self._apps = apps
+                self._versions = {bundle_id: _version(info) for bundle_id, info in apps.items()}
+                self._exe_index = exe_path_index(apps.values())
+            self._updated_at = time.monotonic()
+            return changed, removed
+
+    def _ensure_fresh(self):
+        if self._updated_at is None or time.monotonic() - self._updated_at > self.max_age:
+            self.refresh()
+
+    def apps(self, app_type: Optional[str] = None) -> List[dict]:
+        """
+        Args:
+            app_type: User or System, None for all
+        """
+        self._ensure_fresh()
+        return [
+            info for info in self._apps.values()
+            if app_type is None or info.get('ApplicationType') == app_type
+        ]
+
+    def get(self, bundle_id: str) -> Optional[dict]:
+        self._ensure_fresh()
+        return self._apps.get(bundle_id)
+
+    def by_executable(self, exe_path: str) -> Optional[dict]:
+        """ app of executable path, eg: realAppName of a running process """
+        return self.exe_index().get(exe_path)
+
+    def exe_index(self) -> Dict[str, dict]:
+        """ {executable path: appinfo}, rebuilt only when apps changed, do not modify """
+        self._ensure_fresh()
+        return self._exe_index
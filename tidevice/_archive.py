@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 17:05:51
+
+Stream a device directory into a tar or zip archive without staging files on disk
+
+Files are read from AFC in the caller thread, the archive (and compression)
+is written in a worker thread, they are connected by a bounded queue of chunks.
+
+Usage:
+    with open("DCIM.tar.gz", "wb") as f:
+        d.sync.export_archive("/DCIM", f, format="tar", compress=True)
+"""
+
+import datetime
+import logging
+import queue
+import tarfile
+import threading
+import typing
+import zipfile
+from typing import Iterable, Optional
+
+from ._proto import PROGRAM_NAME
+from ._sync import Sync
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+ARCHIVE_FORMATS = ("tar", "zip")
+
+_STOP = object()
+
+
+class _ChunkReader:
+    """ file object for tarfile.addfile, read chunks of one file from queue """
+
+    def __init__(self, que: queue.Queue):
+        self._que = que
+        self._buf = bytearray()
+        self._eof = False
+
+    def read(self, size: int) -> bytes:
+        while len(self._buf) < size and not self._eof:
+            chunk = self._que.get()
+            if chunk is _STOP:
+                raise EOFError("archive aborted")
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buf.extend(chunk)
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        return data
+
+    def drain(self):
+        while not self._eof:
+            self.read(1 << 20)
+
+
+class ArchiveWriter:
+    """ write archive entries in a worker thread """
+
+    def __init__(self,
+                 fileobj: typing.BinaryIO,
+                 format: str = "tar",
+                 compress: bool = False,
+                 max_chunks: int = 16):
+        """
+        Args:
+            fileobj: writable, seek is not required
+            format: tar or zip
+            compress: gzip for tar, deflate for zip
+            max_chunks: max chunks buffered between reader and worker thread
+        """
+        if format not in ARCHIVE_FORMATS:
+            raise ValueError("unknown archive format: {}".format(format))
+        self._fileobj = fileobj
+        self._format = format
+        self._compress = compress
+        self._que = queue.Queue(max_chunks)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(name="archive-writer", target=self._run, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while True:
+            if self._error is not None:
+                raise self._error
+            try:
+                self._que.put(item, timeout=.1)
+                return
+            except queue.Full:
+                pass
+
+    def add_dir(self, name: str, mtime: datetime.datetime):
+        self._put(("dir", name, 0, mtime, None))
+
+    def add_link(self, name: str, target: str, mtime: datetime.datetime):
+        self._put(("link", name, 0, mtime, target))
+
+    def add_file(self, name: str, size: int, mtime: datetime.datetime, chunks: Iterable[bytes]):
+        """ chunks should contains size bytes, padded with zeros when less """
+        self._put(("file", name, size, mtime, None))
+        left = size
+        for chunk in chunks:
+            chunk = bytes(chunk[:left])
+            left -= len(chunk)
+            self._put(chunk)
+        if left > 0:
+            logger.warning("%s: file changed while archiving, padded with zeros", name)
+        while left > 0:
+            self._put(bytes(min(left, 1 << 20)))
+            left -= min(left, 1 << 20)
+        self._put(None)
+
+    def close(self, abort: bool = False):
+        """
+        Args:
+            abort: stop the worker thread and ignore its error
+        """
+        while self._thread.is_alive():
+            try:
+                self._que.put(_STOP, timeout=.1)
+                break
+            except queue.Full:
+                pass
+        self._thread.join()
+        if self._error is not None and not abort:
+            raise self._error
+
+    def _run(self):
+        try:
+            if self._format == "tar":
+                self._write_tar()
+            else:
+                self._write_zip()
+        except BaseException as e:
+            self._error = e
+
+    def _entries(self) -> Iterable[tuple]:
+        while True:
+            item = self._que.get()
+            if item is _STOP:
+                return
+            yield item
+
+    def _write_tar(self):
+        with tarfile.open(fileobj=self._fileobj, mode="w|gz" if self._compress else "w|") as tf:
+            for kind, name, size, mtime, target in self._entries():
+                info = tarfile.TarInfo(name)
+                info.mtime = int(mtime.timestamp())
+                if kind == "dir":
+                    info.type = tarfile.DIRTYPE
+                    info.mode = 0o755
+                    tf.addfile(info)
+                elif kind == "link":
+                    info.type = tarfile.SYMTYPE
+                    info.linkname = target
+                    tf.addfile(info)
+                else:
+                    info.size = size
+                    info.mode = 0o644
+                    reader = _ChunkReader(self._que)
+                    tf.addfile(info, reader)
+                    reader.drain()
+
+    def _write_zip(self):
+        compression = zipfile.ZIP_DEFLATED if self._compress else zipfile.ZIP_STORED
+        with zipfile.ZipFile(self._fileobj, "w", compression=compression) as zf:
+            for kind, name, size, mtime, target in self._entries():
+                date_time = max(mtime, datetime.datetime(1980, 1, 1)).timetuple()[:6]
+                if kind == "dir":
+                    zf.writestr(zipfile.ZipInfo(name + "/", date_time), b"")
+                elif kind == "link":
+                    logger.info("skip symlink %s -> %s, not supported by zip", name, target)
+                else:
+                    info = zipfile.ZipInfo(name, date_time)
+                    info.compress_type = compression
+                    info.file_size = size
+                    with zf.open(info, "w", force_zip64=size >= zipfile.ZIP64_LIMIT) as w:
+                        reader = _ChunkReader(self._que)
+                        for chunk in iter(lambda: reader.read(1 << 20), b""):
+                            w.write(chunk)
+
+
+def export_archive(sync: Sync,
+                   src: str,
+                   fileobj: typing.BinaryIO,
+                   format: str = "tar",
+                   compress: bool = False) -> int:
+    """ returns number of files archived """
+    src = src.rstrip("/") or "/"
+    writer = ArchiveWriter(fileobj, format=format, compress=compress)
+    count = 0
+    try:
+        dirs, files = sync.scan(src)
+        for dpath, info in zip(dirs, sync.stat_many(dirs)):
+            writer.add_dir(dpath[len(src):].lstrip("/"), info.st_mtime)
+        for fpath, info in files:
+            name = fpath[len(src):].lstrip("/")
+            if info.is_link():
+                writer.add_link(name, info.st_linktarget, info.st_mtime)
+                continue
+            writer.add_file(name, info.st_size, info.st_mtime, sync.iter_content(fpath, 0, info.st_size))
+            count += 1
+    except BaseException:
+        writer.close(abort=True)
+        raise
+    writer.close()
+    return count
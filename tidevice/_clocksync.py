@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Mon Oct 19 2026 11:40:26
+
+Map device clocks to host time.time()
+
+Samples are stamped by the device (sysmontap EndMachAbsTime, opengl
+XRVideoCardRunTimeStamp), the host time when a sample is received is later by
+a varying delay. ClockSync keeps the sample with the smallest delay of every
+bucket of device time, and fits host - device = offset + drift * device over
+these minimums (the lower envelope). The delay left is the smallest one, which
+is stable, so the intervals between mapped timestamps follow the device clock.
+
+MachClock is for mach_absolute_time: it asks the device clock with
+machTimeInfo and takes the middle of the round trip, better than the arrival
+time of samples.
+
+Usage:
+    clock = MachClock()
+    clock.probe(ins)
+    clock.to_host(sample['EndMachAbsTime'])  # seconds since epoch
+
+    clock = ClockSync(scale=1e-6)  # XRVideoCardRunTimeStamp is microseconds
+    clock.align(data['XRVideoCardRunTimeStamp'])
+"""
+
+import collections
+import threading
+import time
+from typing import Deque, Optional, Tuple
+
+
+class ClockSync:
+    def __init__(self, scale: float = 1.0, bucket: float = 10.0, buckets: int = 30):
+        """
+        Args:
+            scale: seconds of one device tick
+            bucket: seconds of device time, one point is kept per bucket
+            buckets: points used to fit, drift follows the last buckets * bucket seconds
+        """
+        self.scale = scale
+        self.bucket = bucket
+        self._points: Deque[Tuple[int, float, float]] = collections.deque(maxlen=buckets)  # (bucket, x, y)
+        self._lock = threading.Lock()
+        self._offset = 0.0
+        self._drift = 0.0
+
+    @property
+    def synced(self) -> bool:
+        return bool(self._points)
+
+    @property
+    def offset(self) -> float:
+        """ host time of device time 0 """
+        return self._offset
+
+    @property
+    def drift(self) -> float:
+        """ seconds host clock gains per second of device clock, eg: 1e-6 is 1 ppm """
+        return self._drift
+
+    def add(self, ticks: float, host_time: float):
+        """
+        Args:
+            ticks: device time
+            host_time: time.time() when it was known, not earlier than ticks
+        """
+        x = ticks * self.scale
+        y = host_time - x
+        key = int(x // self.bucket)
+        with self._lock:
+            if self._points and self._points[-1][0] == key:
+                if y >= self._points[-1][2]:
+                    return
+                self._points.pop()
+            elif self._points and key < self._points[-1][0]:
+                self._points.clear()  # device clock restarted
+            self._points.append((key, x, y))
+            self._fit()
+
+    def _fit(self):
+        n = len(self._points)
+        mx = sum(p[1] for p in self._points) / n
+        my = sum(p[2] for p in self._points) / n
+        sxx = sum((p[1] - mx) ** 2 for p in self._points)
+        sxy = sum((p[1] - mx) * (p[2] - my) for p in self._points)
+        self._drift = sxy / sxx if n > 1 and sxx > 0 else 0.0
+        self._offset = my - self._drift * mx
+
+    def to_host(self, ticks: float) -> float:
+        """ seconds since epoch """
+        x = ticks * self.scale
+        return x + self._offset + self._drift * x
+
+    def align(self, ticks: float, host_time: Optional[float] = None) -> float:
+        """ add a sample received at host_time (default now), returns its host time """
+        self.add(ticks, time.time() if host_time is None else host_time)
+        return self.to_host(ticks)
+
+
+class MachClock(ClockSync):
+    """ mach_absolute_time of device, synced by machTimeInfo """
+
+    def __init__(self, resync_interval: float = 60.0, **kwargs):
+        kwargs.setdefault("bucket", resync_interval)
+        super().__init__(scale=0.0, **kwargs)
+        self.resync_interval = resync_interval
+        self._next_probe = 0.0
+
+    @property
+    def due(self) -> bool:
+        """ True when probe should be called again """
+        return time.monotonic() >= self._next_probe
+
+    def probe(self, ins, count: int = 3):
+        """ the round trip with the smallest delay is used
+
+        Args:
+            ins (ServiceInstruments): instruments connection, not called from its receiving thread
+        """
+        self._next_probe = time.monotonic() + self.resync_interval  # also when failed
+        best = None
+        for _ in range(count):
+            start = time.time()
+            ticks, numer, denom = ins.mach_time_info()
+            end = time.time()
+            if best is None or end - start < best[0]:
+                best = (end - start, ticks, (start + end) / 2, numer, denom)
+        _, ticks, host_time, numer, denom = best
+        self.scale = numer / denom / 1e9
+        self.add(ticks, host_time)
+
+
+class RateCounter:
+    """ per second rates of cumulative counters, eg: ctxSwitch of every pid """
+
+    def __init__(self):
+        self._last = {}
+
+    def update(self, key, seconds: float, value: float) -> Optional[float]:
+        """
+        Args:
+            seconds: device time of value
+
+        Returns:
+            None for the first value of key or when counter is reset
+        """
+        last = self._last.get(key)
+        self._last[key] = (seconds, value)
+        if last is None or seconds <= last[0] or value < last[1]:
+            return None
+        return (value - last[1]) / (seconds - last[0])
+
+    def retain(self, keys):
+        """ forget keys not in keys, eg: exited pids """
+        self._last = {k: v for k, v in self._last.items() if k in keys}
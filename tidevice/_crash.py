@@ -4,20 +4,41 @@
 """Created on Thu Oct 19 2023 16:03:14 by codeskyblue
 """
 
-from genericpath import isdir
-from ._sync import Sync
+import collections
+import json
 import logging
-from ._proto import LOG
+import os
+import posixpath
+import threading
+import typing
+
+from ._proto import RawStatResult
 from ._safe_socket import PlistSocketProxy
+from ._sync import Sync
+from ._transfer import TransferEngine, TransferStats
 
 
 logger = logging.getLogger(__name__)
 
+SEEN_NAME = ".tidevice-crash-seen.json"
+SEEN_VERSION = 1
+
 # Ref: https://github.com/libimobiledevice/libimobiledevice/blob/master/tools/idevicecrashreport.c
 
 class CrashManager:
-    def __init__(self, copy_conn: PlistSocketProxy):
+    def __init__(self,
+                 copy_conn: PlistSocketProxy,
+                 connect: typing.Optional[typing.Callable[[], Sync]] = None,
+                 move: typing.Optional[typing.Callable[[], None]] = None):
+        """
+        Args:
+            copy_conn: connection of crashreportcopymobile
+            connect: returns a new crashreportcopymobile Sync, used by pull with jobs > 1
+            move: trigger crashreportmover, used by watch
+        """
         self._afc = Sync(copy_conn)
+        self._connect = connect
+        self._move = move
     
     @property
     def afc(self) -> Sync:
@@ -32,4 +53,135 @@ class CrashManager:
 
     def remove_all(self):
         self._afc.rmtree("/")
-        logger.info("Crash file purged from device")
\ No newline at end of file
+        logger.info("Crash file purged from device")
+
+    def pull(self, dst: str, remove: bool = True, jobs: int = 1) -> typing.Optional[TransferStats]:
+        """ copy all crash logs to dst
+
+        Args:
+            remove: remove crash logs from device after copied
+            jobs: number of connections used to copy files
+        """
+        if jobs > 1 and self._connect:
+            return TransferEngine(self._connect, jobs=jobs).pull("/", dst, remove=remove)
+        self._afc.pull("/", dst, remove=remove)
+
+    def poll(self, dst: str, remove: bool = False, jobs: int = 4, state_path: typing.Optional[str] = None) -> typing.List[typing.Tuple[str, str]]:
+        """ copy crash logs not seen before to dst
+
+        Seen files are recorded in state_path (default: dst/.tidevice-crash-seen.json)
+        with the mtime of every directory, only directories changed since last poll
+        are listed again. Subdirectories of an unchanged directory are still checked,
+        as a new file only changes the mtime of its own directory.
+
+        Returns:
+            [(device path, local path), ...] of new crash logs
+        """
+        state_path = state_path or os.path.join(dst, SEEN_NAME)
+        state = _load_state(state_path)
+        seen: typing.Dict[str, list] = state["seen"]
+        dir_mtimes: typing.Dict[str, int] = state["dirs"]
+        subdirs = collections.defaultdict(list)  # known subdirectories of unchanged directories
+        for dpath in dir_mtimes:
+            subdirs[posixpath.dirname(dpath)].append(dpath)
+
+        if self._move:
+            self._move()
+        entries: typing.List[typing.Tuple[str, RawStatResult]] = []
+        scanned = set()
+        mtimes: typing.Dict[str, int] = {}
+        pending = ["/"]
+        while pending:
+            fpaths = []
+            for dpath in pending:
+                fpaths.extend(posixpath.join(dpath, name) for name in self._afc.listdir(dpath) if name)
+                scanned.add(dpath)
+            pending = []
+            while fpaths:  # stat level by level, down through unchanged directories
+                level, fpaths = fpaths, []
+                for fpath, (info, _) in zip(level, self._afc._stat_many_raw(level, with_error=True)):
+                    if info is None:  # removed after listdir
+                        continue
+                    if not info.is_dir():
+                        entries.append((fpath, info))
+                        continue
+                    mtimes[fpath] = info.st_mtime_ns
+                    if dir_mtimes.get(fpath) != info.st_mtime_ns:
+                        pending.append(fpath)
+                    else:
+                        fpaths.extend(subdirs[fpath])
+
+        new_files = []
+        for fpath, info in entries:
+            if info.is_link() or seen.get(fpath) == [info.st_size, info.st_mtime_ns]:
+                continue
+            lpath = os.path.join(dst, *fpath.lstrip("/").split("/"))
+            new_files.append((fpath, lpath, info))
+
+        if new_files:
+            if jobs > 1 and self._connect:
+                TransferEngine(self._connect, jobs=jobs).pull_files(
+                    [(fpath, lpath, info.st_size) for fpath, lpath, info in new_files], remove=remove)
+            else:
+                for fpath, lpath, _ in new_files:
+                    os.makedirs(os.path.dirname(lpath), exist_ok=True)
+                    self._afc.pull(fpath, lpath, remove=remove)
+
+        # forget files which disappeared from the listed directories
+        present = {fpath for fpath, _ in entries}
+        for fpath in list(seen):
+            dpath = posixpath.dirname(fpath)
+            if fpath not in present and (dpath in scanned or dpath not in mtimes):
+                del seen[fpath]
+        state["dirs"] = mtimes
+        if not remove:
+            for fpath, _, info in new_files:
+                seen[fpath] = [info.st_size, info.st_mtime_ns]
+        _save_state(state_path, state)
+        return [(fpath, lpath) for fpath, lpath, _ in new_files]
+
+    def watch(self,
+              dst: str,
+              interval: float = 10.0,
+              callback: typing.Optional[typing.Callable[[str, str], None]] = None,
+              remove: bool = False,
+              jobs: int = 4,
+              stop: typing.Optional[threading.Event] = None):
+        """ poll crash logs until stop is set
+
+        Args:
+            dst: spool directory of this device
+            interval: seconds between polls
+            callback: called with (device path, local path) for every new crash log
+            remove: remove crash logs from device after copied
+            jobs: number of connections used to copy files
+            stop: set to stop watching, watch forever when None
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            for fpath, lpath in self.poll(dst, remove=remove, jobs=jobs):
+                logger.info("New crash log %s -> %s", fpath, lpath)
+                if callback:
+                    callback(fpath, lpath)
+            stop.wait(interval)
+
+
+def _load_state(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") == SEEN_VERSION:
+            return state
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        logger.warning("ignore invalid state %s: %s", path, e)
+    return {"version": SEEN_VERSION, "seen": {}, "dirs": {}}
+
+
+def _save_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
@@ -28,6 +28,7 @@ from PIL import Image
 from retry import retry
 
 from . import bplist, plistlib2
+from ._appindex import AppIndex
 from ._crash import CrashManager
 from ._imagemounter import ImageMounter, get_developer_image_path
 from ._installation import Installation
@@ -36,7 +37,7 @@ from ._instruments import (AUXMessageBuffer, DTXMessage, DTXPayload, DTXService,
 from ._ipautil import IPAReader
 from ._proto import *
 from ._safe_socket import *
-from ._sync import Sync
+from ._sync import AFCPool, Sync
 from ._types import DeviceInfo, XCTestResult
 from ._usbmux import Usbmux
 from ._utils import (ProgressReader, get_app_dir, semver_compare,
@@ -83,6 +84,8 @@ class BaseDevice():
         self._info: DeviceInfo = None
         self._lock = threading.Lock()
         self._pair_record = None
+        self._afc_pool = AFCPool(self.connect_sync)
+        self._app_index = AppIndex(lambda: self.installation)
 
     @property
     def debug(self) -> bool:
@@ -453,14 +456,18 @@ class BaseDevice():
         """
         https://github.com/libimobiledevice/libimobiledevice/blob/master/tools/idevicecrashreport.c
         """
-        # read "ping" message which indicates the crash logs have been moved to a safe harbor
-        move_conn = self.start_service(LockdownService.CRASH_REPORT_MOVER_SERVICE)
-        ack = b'ping\x00'
-        if ack != move_conn.psock.recvall(len(ack)):
-            raise ServiceError("ERROR: Crash logs could not be moved. Connection interrupted")
-
+        self._move_crash_reports()
         copy_conn = self.start_service(LockdownService.CRASH_REPORT_COPY_MOBILE_SERVICE)
-        return CrashManager(copy_conn)
+        return CrashManager(copy_conn,
+                            lambda: Sync(self.start_service(LockdownService.CRASH_REPORT_COPY_MOBILE_SERVICE)),
+                            move=self._move_crash_reports)
+
+    def _move_crash_reports(self):
+        # read "ping" message which indicates the crash logs have been moved to a safe harbor
+        with self.start_service(LockdownService.CRASH_REPORT_MOVER_SERVICE) as move_conn:
+            ack = b'ping\x00'
+            if ack != move_conn.psock.recvall(len(ack)):
+                raise ServiceError("ERROR: Crash logs could not be moved. Connection interrupted")
 
     def enable_ios16_developer_mode(self, reboot_ok: bool = False):
         """
@@ -586,6 +593,16 @@ class BaseDevice():
         return self.get_value("ProductType", no_session=True)
 
     def app_sync(self, bundle_id: str, command: str = "VendDocuments") -> Sync:
+        """ shared house_arrest connection, see connect_sync for a new one
+
+        close() of the returned connection is ignored, it is closed by BaseDevice.close
+        """
+        return self._afc_pool.get(bundle_id, command)
+
+    def connect_sync(self, bundle_id: Optional[str] = None, command: str = "VendDocuments") -> Sync:
+        """ new AFC connection, house_arrest when bundle_id is set """
+        if not bundle_id:
+            return Sync(self.start_service(LockdownService.AFC))
         # Change command(VendContainer -> VendDocuments)
         # According to https://github.com/GNOME/gvfs/commit/b8ad223b1e2fbe0aec24baeec224a76d91f4ca2f
         # Ref: https://github.com/libimobiledevice/libimobiledevice/issues/193
@@ -601,6 +618,11 @@ class BaseDevice():
         conn = self.start_service(Installation.SERVICE_NAME)
         return Installation(conn)
 
+    @property
+    def app_index(self) -> AppIndex:
+        """ cached installed applications, refreshed incrementally """
+        return self._app_index
+
     @property
     def imagemounter(self) -> ImageMounter:
         """
@@ -675,8 +697,15 @@ class BaseDevice():
 
     @property
     def sync(self) -> Sync:
-        conn = self.start_service(LockdownService.AFC)
-        return Sync(conn)
+        """ shared AFC connection, see connect_sync for a new one
+
+        close() of the returned connection is ignored, it is closed by BaseDevice.close
+        """
+        return self._afc_pool.get()
+
+    def close(self):
+        """ close shared connections of sync and app_sync, they are reopened when used again """
+        self._afc_pool.close()
 
     def app_stop(self, pid_or_name: Union[int, str]) -> int:
         """
@@ -688,8 +717,7 @@ class BaseDevice():
                 return pid_or_name
             elif isinstance(pid_or_name, str):
                 bundle_id = pid_or_name
-                app_infos = list(self.installation.iter_installed(app_type=None))
-                ps = ts.app_process_list(app_infos)
+                ps = ts.app_process_list(self.app_index.exe_index())
                 for p in ps:
                     if p['bundle_id'] == bundle_id:
                         ts.app_kill(p['pid'])
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 22:04:51
+
+Call a slow callback in other threads, so that the sampling thread never waits for it
+
+Items are queued in a bounded queue, when the queue is full the overflow
+policy decides which item is dropped (or blocks the producer). Dropped items
+are counted.
+
+Usage:
+    dispatcher = Dispatcher(upload, maxsize=1000, overflow=Overflow.DROP_OLD)
+    dispatcher.put(DataType.CPU, data)  # upload(DataType.CPU, data) in dispatcher thread
+    dispatcher.close()
+    print(dispatcher.dropped)
+"""
+
+import enum
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from ._proto import PROGRAM_NAME
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+_STOP = object()
+
+
+class Overflow(str, enum.Enum):
+    DROP_OLD = "drop_old"  # drop the oldest queued item, keep the latest samples
+    DROP_NEW = "drop_new"  # drop the item being put
+    BLOCK = "block"  # wait until there is room, the producer is slowed down
+
+
+class Dispatcher:
+    def __init__(self,
+                 callback: Callable,
+                 maxsize: int = 1024,
+                 overflow: Overflow = Overflow.DROP_OLD,
+                 workers: int = 1,
+                 name: str = "dispatcher"):
+        """
+        Args:
+            callback: called with the arguments of put
+            maxsize: max items queued
+            workers: number of threads calling callback, items are not in order when more than 1
+        """
+        assert maxsize > 0 and workers > 0
+        self._callback = callback
+        self.overflow = Overflow(overflow)
+        self.dropped = 0
+        self.delivered = 0
+        self._que = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._abort = False  # drop queued items, set when close timed out
+        self._threads: List[threading.Thread] = [
+            threading.Thread(name="{}-{}".format(name, i), target=self._run, daemon=True)
+            for i in range(workers)
+        ]
+        for th in self._threads:
+            th.start()
+
+    @property
+    def pending(self) -> int:
+        return self._que.qsize()
+
+    def put(self, *args) -> bool:
+        """ returns False when an item is dropped """
+        if self._closed:
+            return False
+        if self.overflow == Overflow.BLOCK:
+            self._que.put(args)
+            return True
+        with self._lock:
+            if self._closed:
+                return False
+            try:
+                self._que.put_nowait(args)
+                return True
+            except queue.Full:
+                pass
+            self.dropped += 1
+            if self.overflow == Overflow.DROP_NEW:
+                return False
+            try:
+                if self._que.get_nowait() is _STOP:  # keep the sentinel, drop the new item
+                    self._que.put_nowait(_STOP)
+                    return False
+            except queue.Empty:
+                pass
+            self._que.put_nowait(args)
+            return False
+
+    def _run(self):
+        while True:
+            args = self._que.get()
+            if args is _STOP or self._abort:
+                return
+            try:
+                self._callback(*args)
+            except Exception:
+                logger.exception("%s callback error", threading.current_thread().name)
+            with self._lock:
+                self.delivered += 1
+
+    def close(self, timeout: Optional[float] = None):
+        """ deliver queued items and stop threads
+
+        Args:
+            timeout: seconds to wait in total, queued items left are dropped.
+                When a callback is stuck its thread is left running, and exits after the callback returns
+        """
+        with self._lock:
+            self._closed = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            for _ in self._threads:
+                self._que.put(_STOP, timeout=_remaining(deadline))
+            for th in self._threads:
+                th.join(_remaining(deadline))
+        except queue.Full:
+            pass
+        if any(th.is_alive() for th in self._threads):
+            self._abort = True
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
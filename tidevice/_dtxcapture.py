@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 13:02:18
+
+Record DTX traffic to a capture file, and replay it without a device
+
+Capture file format (little endian, gzip compressed when filename ends with .gz)
+    magic: b"DTXCAP01"
+    records:
+        timestamp: f64  # seconds since recording started
+        direction: u8   # 0: host -> device, 1: device -> host
+        length: u32
+        frame: DTXMessageHeader + payload (one fragment)
+
+Usage:
+    with d.connect_instruments() as ts:
+        ts.start_recording("sysmontap.dtxcap.gz")
+        for data in ts.iter_cpu_memory():
+            ...
+
+    ts = DTXReplayServer("sysmontap.dtxcap.gz", speed=10).connect()
+    for data in ts.iter_cpu_memory():
+        ...
+"""
+
+import gzip
+import logging
+import queue
+import socket
+import struct
+import threading
+import time
+import typing
+from typing import Iterator, List, Optional, Union
+
+from ._proto import LOG
+
+logger = logging.getLogger(LOG.xcuitest)
+
+CAPTURE_MAGIC = b"DTXCAP01"
+DIRECTION_SEND = 0  # host -> device
+DIRECTION_RECV = 1  # device -> host
+
+_RECORD_HEADER = struct.Struct("<dBI")
+# magic, header_length, fragment_id, fragment_count, payload_length,
+# message_id, conversation_index, channel, expects_reply
+_DTX_HEADER = struct.Struct("<IIHHIIIII")
+
+
+class CaptureRecord(typing.NamedTuple):
+    timestamp: float
+    direction: int
+    data: bytes
+
+    @property
+    def message_key(self) -> tuple:
+        """ (message_id, conversation_index, channel, fragment_id) """
+        h = _DTX_HEADER.unpack_from(self.data)
+        return (h[5], h[6], h[7], h[2])
+
+
+def _open(path: str, mode: str) -> typing.BinaryIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+class DTXRecorder:
+    """ Write DTX frames with timestamps, thread safe """
+
+    def __init__(self, path_or_file: Union[str, typing.BinaryIO]):
+        if isinstance(path_or_file, str):
+            self._fp = _open(path_or_file, "wb")
+            self._owned = True
+        else:
+            self._fp = path_or_file
+            self._owned = False
+        self._fp.write(CAPTURE_MAGIC)
+        self._begin = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def write(self, direction: int, frame: Union[bytes, bytearray]):
+        header = _RECORD_HEADER.pack(time.monotonic() - self._begin, direction, len(frame))
+        with self._lock:
+            if self._closed:
+                return
+            self._fp.write(header)
+            self._fp.write(frame)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._owned:
+                self._fp.close()
+            else:
+                self._fp.flush()
+
+
+def iter_capture(path_or_file: Union[str, typing.BinaryIO]) -> Iterator[CaptureRecord]:
+    fp = _open(path_or_file, "rb") if isinstance(path_or_file, str) else path_or_file
+    try:
+        if fp.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError("not a dtx capture file")
+        while True:
+            header = fp.read(_RECORD_HEADER.size)
+            if not header:
+                break
+            if len(header) != _RECORD_HEADER.size:
+                raise ValueError("capture file truncated")
+            timestamp, direction, length = _RECORD_HEADER.unpack(header)
+            data = fp.read(length)
+            if len(data) != length:
+                raise ValueError("capture file truncated")
+            yield CaptureRecord(timestamp, direction, data)
+    finally:
+        if fp is not path_or_file:
+            fp.close()
+
+
+def load_capture(path_or_file: Union[str, typing.BinaryIO]) -> List[CaptureRecord]:
+    return list(iter_capture(path_or_file))
+
+
+class DTXReplayServer:
+    """ Play the device side of a capture back to a DTX client
+
+    Device frames are sent with the original intervals divided by speed,
+    the clock is re-anchored at every host frame of the capture, which is
+    waited for before continue. Host frames are matched by
+    (message_id, conversation_index, channel), frames not in the capture are ignored.
+    """
+
+    def __init__(self,
+                 capture: Union[str, List[CaptureRecord]],
+                 speed: float = 1.0,
+                 host_timeout: float = 10.0):
+        """
+        Args:
+            capture: capture file path or records
+            speed: 1.0 for original speed, 0 for as fast as possible
+            host_timeout: max seconds to wait for a host frame, then continue anyway
+        """
+        self._records = load_capture(capture) if isinstance(capture, str) else capture
+        self.speed = speed
+        self.host_timeout = host_timeout
+
+    def _read_frames(self, conn: socket.socket, que: queue.Queue):
+        try:
+            while True:
+                header = self._recvall(conn, _DTX_HEADER.size)
+                h = _DTX_HEADER.unpack(header)
+                self._recvall(conn, h[4])
+                que.put((h[5], h[6], h[7], h[2]))
+        except OSError:
+            pass
+        finally:
+            que.put(None)
+
+    @staticmethod
+    def _recvall(conn: socket.socket, size: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = conn.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionResetError("connection closed")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _wait_host_frame(self, que: queue.Queue, key: tuple) -> bool:
+        """ returns False when connection closed """
+        deadline = time.monotonic() + self.host_timeout
+        while True:
+            try:
+                received = que.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                logger.warning("replay: host frame %s not received, continue", key)
+                return True
+            if received is None:
+                return False
+            if received == key:
+                return True
+            logger.debug("replay: ignore host frame %s, expect %s", received, key)
+
+    def serve(self, conn: socket.socket):
+        """ blocking until capture finished or connection closed """
+        que = queue.Queue()
+        threading.Thread(name="dtx-replay-reader", target=self._read_frames, args=(conn, que), daemon=True).start()
+        anchor_ts = self._records[0].timestamp if self._records else 0.0
+        anchor_clock = time.monotonic()
+        try:
+            for record in self._records:
+                if record.direction == DIRECTION_SEND:
+                    if not self._wait_host_frame(que, record.message_key):
+                        return
+                    anchor_ts, anchor_clock = record.timestamp, time.monotonic()
+                    continue
+                if self.speed > 0:
+                    delay = anchor_clock + (record.timestamp - anchor_ts) / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                conn.sendall(record.data)
+        except OSError:
+            pass
+        finally:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def connect(self):
+        """ returns ServiceInstruments connected to this replay server """
+        from ._instruments import ServiceInstruments
+        from ._safe_socket import PlistSocket
+        client, server = socket.socketpair()
+        threading.Thread(name="dtx-replay", target=self.serve, args=(server, ), daemon=True).start()
+        return ServiceInstruments(PlistSocket(client))
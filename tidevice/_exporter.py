@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Mon Oct 19 2026 10:27:05
+
+Prometheus exporter of devices connected to usbmuxd
+
+Metrics are collected in background, a scrape of /metrics only renders the
+latest values and never waits for a device.
+
+- device list, battery and storage are polled by a scheduler, each with its own interval
+- cpu, memory, fps, gpu and network are streamed by PerfFarm
+
+Series of a device are removed when it is detached, except
+tidevice_device_connected which becomes 0.
+
+Usage:
+    exporter = Exporter(Usbmux(), ["com.example.demo"], intervals={"battery": 30})
+    exporter.start()
+
+    async def main():
+        exporter.listen(9100)
+        await asyncio.Event().wait()
+"""
+
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tornado import web
+
+from ._device import Device
+from ._perf import DataType
+from ._perffarm import PerfFarm
+from ._proto import PROGRAM_NAME
+from ._types import DeviceInfo
+from ._usbmux import Usbmux
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+# seconds between polls, perf metrics are streamed
+DEFAULT_INTERVALS = {
+    "devices": 5.0,
+    "battery": 60.0,
+    "storage": 300.0,
+}
+
+# name: (type, help)
+METRICS: Dict[str, Tuple[str, str]] = {
+    "tidevice_device_connected": ("gauge", "1 when device is attached to usbmuxd"),
+    "tidevice_battery_level_percent": ("gauge", "battery level"),
+    "tidevice_battery_charging": ("gauge", "1 when battery is charging"),
+    "tidevice_storage_size_bytes": ("gauge", "data partition size"),
+    "tidevice_storage_used_bytes": ("gauge", "data partition used"),
+    "tidevice_storage_free_bytes": ("gauge", "data partition available"),
+    "tidevice_app_cpu_percent": ("gauge", "cpu usage of app"),
+    "tidevice_app_memory_bytes": ("gauge", "physical memory of app"),
+    "tidevice_fps": ("gauge", "core animation frames per second"),
+    "tidevice_gpu_utilization_percent": ("gauge", "gpu utilization by engine"),
+    "tidevice_network_receive_bytes_total": ("counter", "bytes received by all connections"),
+    "tidevice_network_transmit_bytes_total": ("counter", "bytes sent by all connections"),
+    "tidevice_collect_errors_total": ("counter", "failed polls by collector"),
+}
+
+# seconds a connection is kept without update, ntstat does not report closed connections
+CONNECTION_TTL = 300.0
+
+LabelsType = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Registry:
+    """ latest value of every series, rendered in prometheus text format """
+
+    def __init__(self, metrics: Dict[str, Tuple[str, str]] = METRICS):
+        self._metrics = metrics
+        self._series: Dict[str, Dict[LabelsType, float]] = {name: {} for name in metrics}
+        self._lock = threading.Lock()
+
+    def set(self, name: str, value: float, **labels: str):
+        with self._lock:
+            self._series[name][tuple(sorted(labels.items()))] = value
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + value
+
+    def get(self, name: str, **labels: str) -> Optional[float]:
+        with self._lock:
+            return self._series[name].get(tuple(sorted(labels.items())))
+
+    def remove(self, **labels: str):
+        """ remove series having all labels """
+        match = set(labels.items())
+        with self._lock:
+            for series in self._series.values():
+                for key in [key for key in series if match.issubset(key)]:
+                    del series[key]
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (_type, _help) in self._metrics.items():
+                series = self._series[name]
+                if not series:
+                    continue
+                lines.append("# HELP {} {}".format(name, _help))
+                lines.append("# TYPE {} {}".format(name, _type))
+                for key, value in sorted(series.items()):
+                    labels = ",".join('{}="{}"'.format(k, _escape(str(v))) for k, v in key)
+                    lines.append("{}{{{}}} {}".format(name, labels, _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(web.RequestHandler):
+    def initialize(self, registry: Registry):
+        self.registry = registry
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(self.registry.render())
+
+
+class Exporter:
+    def __init__(self,
+                 usbmux: Usbmux,
+                 bundle_ids: List[str] = [],
+                 intervals: Dict[str, float] = {},
+                 workers: int = 4,
+                 pid_interval: float = 30.0):
+        """
+        Args:
+            bundle_ids: apps of every device, for cpu and memory
+            intervals: seconds between polls, keys in DEFAULT_INTERVALS
+            workers: threads to poll devices
+            pid_interval: seconds between pid polls of PerfFarm
+        """
+        unknown = set(intervals) - set(DEFAULT_INTERVALS)
+        if unknown:
+            raise ValueError("unknown intervals: {}".format(", ".join(sorted(unknown))))
+        self.registry = Registry()
+        self.intervals = dict(DEFAULT_INTERVALS, **intervals)
+        self._usbmux = usbmux
+        self._bundle_ids = list(bundle_ids)
+        self._farm = PerfFarm(self._on_sample, pid_interval=pid_interval)
+        self._devices: Dict[str, DeviceInfo] = {}
+        self._next_run: Dict[Tuple[str, Optional[str]], float] = {}
+        self._busy = set()
+        self._connections: Dict[Tuple[str, int], Tuple[int, int, float]] = {}  # (udid, serial): (rx, tx, updated)
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._pool = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="exporter")
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._farm.start()
+        self._thread = threading.Thread(name="exporter-scheduler", target=self._schedule, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._pool.shutdown(wait=True)
+        if self._thread:
+            self._thread.join()
+        self._farm.stop()
+
+    def make_app(self) -> web.Application:
+        return web.Application([
+            (r"/metrics", _MetricsHandler, dict(registry=self.registry)),
+        ])
+
+    def listen(self, port: int, address: str = ""):
+        """ should be called in the running io loop """
+        self.make_app().listen(port, address)
+        logger.info("Exporter listening on %s:%d", address or "0.0.0.0", port)
+
+    def _tasks(self) -> List[Tuple[str, Optional[str]]]:
+        with self._lock:
+            udids = list(self._devices)
+        return [("devices", None)] + [(name, udid) for udid in udids for name in ("battery", "storage")]
+
+    def _schedule(self):
+        while True:
+            now = time.monotonic()
+            for task in self._tasks():
+                with self._lock:
+                    if task in self._busy or now < self._next_run.get(task, 0):
+                        continue
+                    self._busy.add(task)
+                try:
+                    self._pool.submit(self._run, *task)
+                except RuntimeError:  # pool shutdown
+                    return
+            if self._stop_event.wait(.1):
+                return
+
+    def _run(self, name: str, udid: Optional[str]):
+        try:
+            getattr(self, "_collect_" + name)(udid)
+        except Exception as e:
+            logger.warning("exporter: %s %s %s", name, udid or "", e)
+            self.registry.inc("tidevice_collect_errors_total", collector=name, udid=udid or "")
+        finally:
+            with self._lock:
+                self._busy.discard((name, udid))
+                self._next_run[(name, udid)] = time.monotonic() + self.intervals[name]
+
+    def _collect_devices(self, _udid: None):
+        infos = {info.udid: info for info in self._usbmux.device_list()}
+        with self._lock:
+            old, self._devices = self._devices, infos
+        for udid in set(old) - set(infos):
+            logger.info("exporter: %s detached", udid)
+            self._farm.remove(udid)
+            self.registry.remove(udid=udid)
+            self._forget_connections(lambda key: key[0] == udid)
+            self.registry.set("tidevice_device_connected", 0, udid=udid, conn_type=old[udid].conn_type.value)
+            with self._lock:
+                for name in ("battery", "storage"):
+                    self._next_run.pop((name, udid), None)
+        for udid, info in infos.items():
+            if udid not in old:
+                logger.info("exporter: %s attached", udid)
+                self.registry.remove(udid=udid)
+                self._farm.add(Device(udid, self._usbmux), self._bundle_ids)
+            self.registry.set("tidevice_device_connected", 1, udid=udid, conn_type=info.conn_type.value)
+
+    def _collect_battery(self, udid: str):
+        info = Device(udid, self._usbmux).battery_info()
+        self.registry.set("tidevice_battery_level_percent", info.level, udid=udid)
+        self.registry.set("tidevice_battery_charging", 1 if info.is_charging else 0, udid=udid)
+
+    def _collect_storage(self, udid: str):
+        info = Device(udid, self._usbmux).storage_info()
+        self.registry.set("tidevice_storage_size_bytes", info.used + info.free, udid=udid)
+        self.registry.set("tidevice_storage_used_bytes", info.used, udid=udid)
+        self.registry.set("tidevice_storage_free_bytes", info.free, udid=udid)
+
+    def _on_sample(self, udid: str, bundle_id: Optional[str], _type: DataType, data: dict):
+        """ PerfFarm sink """
+        registry = self.registry
+        if _type == DataType.CPU:
+            registry.set("tidevice_app_cpu_percent", data["value"], udid=udid, bundle_id=bundle_id)
+        elif _type == DataType.MEMORY:
+            registry.set("tidevice_app_memory_bytes", data["value"] * 1024 * 1024, udid=udid, bundle_id=bundle_id)
+        elif _type == DataType.FPS:
+            registry.set("tidevice_fps", data["value"], udid=udid)
+        elif _type == DataType.GPU:
+            for engine in ("device", "renderer", "tiler"):
+                registry.set("tidevice_gpu_utilization_percent", data[engine], udid=udid, engine=engine)
+        elif _type == DataType.NETWORK:
+            self._on_network(udid, data)
+
+    def _on_network(self, udid: str, data: dict):
+        """ RxBytes and TxBytes are cumulative per connection, counters increase by the delta """
+        detected = data.get("connection-detected")
+        if detected:  # serial reused by a new connection
+            self._forget_connections(lambda key: key == (udid, detected.get("SerialNumber")))
+            return
+        update = data.get("connection-update")
+        if not update:
+            return
+        rx, tx = update.get("RxBytes") or 0, update.get("TxBytes") or 0
+        key = (udid, update.get("ConnectionSerial"))
+        now = time.monotonic()
+        with self._lock:
+            last_rx, last_tx, _ = self._connections.get(key, (0, 0, now))
+            self._connections[key] = (rx, tx, now)
+        self.registry.inc("tidevice_network_receive_bytes_total", max(rx - last_rx, 0), udid=udid)
+        self.registry.inc("tidevice_network_transmit_bytes_total", max(tx - last_tx, 0), udid=udid)
+        if now >= self._next_prune:
+            self._next_prune = now + CONNECTION_TTL
+            self._forget_connections(lambda key: now - self._connections[key][2] > CONNECTION_TTL)
+
+    def _forget_connections(self, match: Callable[[Tuple[str, int]], bool]):
+        with self._lock:
+            for key in [key for key in self._connections if match(key)]:
+                del self._connections[key]
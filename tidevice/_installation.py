@@ -19,7 +19,7 @@
 #  - Complete
 
 import logging
-from typing import Optional
+from typing import Dict, List, Optional
 from ._safe_socket import PlistSocketProxy
 from .exceptions import ServiceError
 
@@ -168,6 +168,23 @@ class Installation(PlistSocketProxy):
         assert ret['Status'] == 'Complete'
         return ret['LookupResult'].get(bundle_id)
 
+    def lookup_apps(self, bundle_ids: List[str], attrs: Optional[list] = None) -> Dict[str, dict]:
+        """
+        Returns:
+            {bundle_id: appinfo}, not installed apps are missing
+        """
+        options = {"BundleIDs": bundle_ids}
+        if attrs:
+            options['ReturnAttributes'] = attrs
+        self.psock.send_packet({
+            "Command": "Lookup",
+            "ClientOptions": options,
+        })
+        ret = self.psock.recv_packet()
+        if 'Error' in ret:
+            raise ServiceError(ret['Error'])
+        return ret['LookupResult']
+
     def iter_installed(self, app_type: Optional[str] = "User", attrs: Optional[list]=None):
         """
         Args:
@@ -31,6 +31,8 @@ from retry import retry
 
 from . import bplist
 from . import struct2 as ct
+from ._appindex import exe_path_index
+from ._dtxcapture import DIRECTION_RECV, DIRECTION_SEND, DTXRecorder
 from ._proto import LOG, InstrumentsService
 from ._safe_socket import PlistSocketProxy
 from .exceptions import MuxError, ServiceError
@@ -310,8 +312,10 @@ class DTXService(PlistSocketProxy):
 
         self._reply_queues = defaultdict(queue.Queue)
         self._handlers = {}
+        self._channel_handlers = {}  # map channel code (sent by server) to callback
         self._quitted = threading.Event()
         self._stop_event = threading.Event()
+        self._recorder: Optional[DTXRecorder] = None
 
         #self.recv_dtx_message()  # ignore _notifyOfPublishedCapabilities
         capabilities = {
@@ -324,6 +328,21 @@ class DTXService(PlistSocketProxy):
         self._drain_background()  # 开启接收线程
         weakref.finalize(self, self._stop_event.set)
 
+    def start_recording(self, path_or_file: Union[str, typing.BinaryIO]) -> DTXRecorder:
+        """ record raw DTX frames of both directions, replay with _dtxcapture.DTXReplayServer
+
+        Args:
+            path_or_file: capture filename (gzip compressed if ends with .gz) or binary file object
+        """
+        self.stop_recording()
+        self._recorder = DTXRecorder(path_or_file)
+        return self._recorder
+
+    def stop_recording(self):
+        recorder, self._recorder = self._recorder, None
+        if recorder:
+            recorder.close()
+
     def _next_message_id(self) -> int:
         self._last_message_id += 1
         return self._last_message_id
@@ -375,6 +394,17 @@ class DTXService(PlistSocketProxy):
         """
         self._handlers[identifier] = func
 
+    def register_channel_callback(self, channel_id: int, func: typing.Callable[[Optional[DTXMessage]], None]):
+        """ call func(m) for every message server sent on channel, before the event handlers
+
+        Several services can stream on one connection this way. func is called
+        in the receiving thread, func(None) is called when connection closed.
+
+        Args:
+            channel_id: channel of server messages, (1<<32) - code for a channel made by make_channel
+        """
+        self._channel_handlers[channel_id] = func
+
     def call_message(
         self,
         channel: Union[int, str],
@@ -427,6 +457,8 @@ class DTXService(PlistSocketProxy):
         data.extend(payload)
         logger.debug("SEND DTXMessage: channel:%d expect_reply:%d data_length:%d, data...", channel, int(expects_reply), len(data))
         self.psock.sendall(data)
+        if self._recorder:
+            self._recorder.write(DIRECTION_SEND, data)
         return _message_id
 
     def recv_part_dtx_message(self) -> typing.Optional[int]:
@@ -452,10 +484,14 @@ class DTXService(PlistSocketProxy):
             # but the 0th payload is empty
             self._dtx_message_pool[h.message_id] = (h, bytearray())
             if h.fragment_count > 1:
+                if self._recorder:
+                    self._recorder.write(DIRECTION_RECV, data)
                 return None
         _, payload = self._dtx_message_pool[h.message_id]
         rawdata = self.psock.recvall(h.payload_length)
         payload.extend(rawdata)
+        if self._recorder:
+            self._recorder.write(DIRECTION_RECV, data + rawdata)
         
         if h.fragment_id == h.fragment_count - 1:
             return h.message_id
@@ -630,6 +666,8 @@ class DTXService(PlistSocketProxy):
             self._quitted.set()
             for q in self._reply_queues.values():
                 q.put(None)  # None means closed
+            for func in list(self._channel_handlers.values()):
+                func(None)
             self._call_handlers(Event.NOTIFICATION, None)
             self._call_handlers(Event.OTHER, None)
             self._call_handlers(Event.FINISHED, None)
@@ -650,6 +688,12 @@ class DTXService(PlistSocketProxy):
             self._reply_queues[mheader.message_id].put(dtxm)
         elif mheader.conversation_index == 0:
             # handle request
+            func = self._channel_handlers.get(mheader.channel)
+            if func:
+                func(dtxm)
+                if mheader.expects_reply:
+                    self._reply_null(dtxm)
+                return
             if mheader.expects_reply == 0:  # notification from server
                 if self._call_handlers(Event.NOTIFICATION, dtxm):
                     return
@@ -672,6 +716,7 @@ class DTXService(PlistSocketProxy):
     def close(self):
         """ stop background """
         self._stop_event.set()
+        self.stop_recording()
         self.psock.close()
 
     def wait(self):
@@ -748,10 +793,11 @@ class ServiceInstruments(DTXService):
         retobj = self.call_message(identifier, "runningProcesses")
         return retobj
 
-    def app_process_list(self, app_infos: List[dict]) -> Iterator[dict]:
+    def app_process_list(self, app_infos: Union[List[dict], typing.Mapping[str, dict]]) -> Iterator[dict]:
         """
         Args:
-            app_infos: value from self.instrumentation.app_list()
+            app_infos: list of installed apps, or {executable path: appinfo} from exe_path_index
+            (eg: d.app_index.exe_index()), which saves building the index every call
         
         Returns:
             yield of
@@ -765,22 +811,14 @@ class ServiceInstruments(DTXService):
                 'display_name': "xxxxx",
             }
         """
-        def exefile2appinfo(exe_abspath: str, app_infos: List[dict]):
-            for info in app_infos:
-                # info may not contain key "Path"
-                # https://github.com/alibaba/taobao-iphone-device/issues/61
-                path = info.get('Path', "") + "/" + info['CFBundleExecutable']
-                if path.startswith("/private"):
-                    path = path[len("/private"):]
-                if exe_abspath == path:
-                    return info
-            return {}
+        if not isinstance(app_infos, typing.Mapping):
+            app_infos = exe_path_index(app_infos)
 
         processes = self.app_running_processes()
         for p in processes:
-            app_exepath = p['realAppName']
-            info = exefile2appinfo(app_exepath, app_infos)
-            p.update(info)
+            info = app_infos.get(p['realAppName'])
+            if info:
+                p.update(info)
             p['bundle_id'] = p.get("CFBundleIdentifier", "")
             p['display_name'] = p.get('CFBundleDisplayName', '')
             yield p
@@ -874,6 +912,15 @@ class ServiceInstruments(DTXService):
         channel = self.make_channel(InstrumentsService.GraphicsOpengl)
         return self.call_message(channel,"stopSampling")
 
+    def start_opengl_sampling(self, func: typing.Callable[[Optional[dict]], None]):
+        """ call func(data) for every opengl sample in the receiving thread, data same as iter_opengl_data
+
+        func(None) is called when connection closed
+        """
+        channel = self.make_channel(InstrumentsService.GraphicsOpengl)
+        self.register_channel_callback((1<<32) - channel, lambda m: func(m.result if m else None))
+        self.call_message(channel, "startSamplingAtTimeInterval:", [0], expects_reply=False)
+
     def iter_application_notification(self) -> Iterator[dict]:
         """ 监听应用通知
         Iterator data
@@ -905,6 +952,29 @@ class ServiceInstruments(DTXService):
         except GeneratorExit:
             self.close()
 
+    def subscribe_application_notification(self, func: typing.Callable[[Optional[dict]], None]):
+        """ call func(info) for every applicationStateNotification, without a thread
+
+        func is called in the receiving thread, info is the same as iter_application_notification,
+        func(None) is called when connection closed. Replaces other Event.NOTIFICATION handler
+        """
+        channel_id = self.make_channel(InstrumentsService.MobileNotifications)
+        notification_channel_id = (1<<32) - channel_id
+
+        def handler(m: Optional[DTXMessage]) -> bool:
+            if m is None:
+                func(None)
+                return False
+            if m.flags == 0x02 and m.channel_id == notification_channel_id:
+                identifier, args = m.result
+                if identifier == 'applicationStateNotification:' and args:
+                    func(args[0])
+                return True
+            return False
+
+        self.register_callback(Event.NOTIFICATION, handler)
+        self.call_message(channel_id, 'setApplicationStateNotificationsEnabled:', [True], expects_reply=False)
+
     def iter_cpu_memory(self) -> Iterator[dict]:
         """
         Close connection after iterator stop
@@ -947,6 +1017,25 @@ class ServiceInstruments(DTXService):
                             }
             }]
         """
+        que = queue.Queue()
+        self.start_cpu_memory_sampling(que.put)
+        try:
+            for result in iter(que.get, None):
+                yield result
+        except GeneratorExit:
+            self.close() # 停止connection，防止消息不停的发过来，暂时不会别的方法
+            # print("Stop channel")
+            ## The following code is not working
+            # self.call_message(channel_id, "stopSampling")
+            # aux = AUXMessageBuffer()
+            # aux.append_obj(channel_id)
+            # self.send_dtx_message(channel_id, DTXPayload.build('_channelCanceled:', aux))
+
+    def start_cpu_memory_sampling(self, func: typing.Callable[[Optional[list]], None]):
+        """ call func(data) for every sysmontap sample in the receiving thread, data same as iter_cpu_memory
+
+        func(None) is called when connection closed
+        """
         config = {
             "bm": 0,
             "cpuUsage": True,
@@ -963,29 +1052,18 @@ class ServiceInstruments(DTXService):
         }
 
         channel_id = self.make_channel(InstrumentsService.Sysmontap)
+
+        def handler(m: Optional[DTXMessage]):
+            if m is None:
+                func(None)
+            elif m.flags == 0x01:
+                func(m.result)
+
+        # subscribe before start, the first sample may arrive right after the reply
+        self.register_channel_callback((1<<32) - channel_id, handler)
         self.call_message(channel_id, "setConfig:", [config])
         self.call_message(channel_id, "start", [])
 
-        # channel = self.make_channel(
-        #     "com.apple.instruments.server.services.processcontrol")
-        # aux = AUXMessageBuffer()
-        # aux.append_obj(1)  # TODO: pid
-        # payload = DTXPayload.build("startObservingPid:", aux)
-        # self.send_dtx_message(channel, payload)
-        notification_channel_id = (1<<32) - channel_id
-        try:
-            for m in self.iter_message(Event.NOTIFICATION):
-                if m.flags == 0x01 and m.channel_id == notification_channel_id:
-                    yield m.result
-        except GeneratorExit:
-            self.close() # 停止connection，防止消息不停的发过来，暂时不会别的方法
-            # print("Stop channel")
-            ## The following code is not working
-            # self.call_message(channel_id, "stopSampling")
-            # aux = AUXMessageBuffer()
-            # aux.append_obj(channel_id)
-            # self.send_dtx_message(channel_id, DTXPayload.build('_channelCanceled:', aux))
-
     def stop_iter_cpu_memory(self):
         channel_id = self.make_channel(InstrumentsService.Sysmontap)
         return self.call_message(channel_id,"stop")
@@ -1081,6 +1159,25 @@ class ServiceInstruments(DTXService):
         self.call_message(channel_id, "replayLastRecordedSession")
         self.call_message(channel_id, "startMonitoring")
 
+        for data in it:
+            if data.channel_id != noti_chan:
+                continue
+            yield self._parse_network_message(data.result)
+
+    def start_network_monitoring(self, func: typing.Callable[[Optional[dict]], None]):
+        """ call func(data) for every system network message in the receiving thread, data same as iter_network
+
+        func(None) is called when connection closed
+        """
+        channel_id = self.make_channel(InstrumentsService.Networking)
+        self.register_channel_callback(
+            (1<<32) - channel_id,
+            lambda m: func(self._parse_network_message(m.result) if m else None))
+        self.call_message(channel_id, "replayLastRecordedSession")
+        self.call_message(channel_id, "startMonitoring")
+
+    @staticmethod
+    def _parse_network_message(result: tuple) -> dict:
         headers = {
             0: ['InterfaceIndex', "Name"],# 网关类型 en0:14 en2:12  anpi0:10
             1: ['Local', 'Remote', 'InterfaceIndex', 'Pid', 'RecvBufferSize', 'RecvBufferUsed', 'SerialNumber', 'Protocol'],
@@ -1092,31 +1189,28 @@ class ServiceInstruments(DTXService):
             1: "connection-detected",
             2: "connection-update",
         }
-        for data in it:
-            if data.channel_id != noti_chan:
-                continue
-            (_type, values) = data.result
-            
-            if _type == 1:
-                if  len(values[0]) == 16:
-                    values[0] = SockAddr4.from_buffer_copy(values[0])
-                    values[1] = SockAddr4.from_buffer_copy(values[1])
-                    values[-1] = 'tcp4' if values[-1] == 1 else 'udp4'
-                elif len(values[0]) == 28:
-                    values[0] = SockAddr6.from_buffer_copy(values[0])
-                    values[1] = SockAddr6.from_buffer_copy(values[1])
-                    values[-1] = 'tcp6' if values[-1] == 1 else 'udp6'
-
-            for idx,v in enumerate(values):
-                if isinstance(v, int) or isinstance(v, float):
-                    pass
-                elif isinstance(v, bplist.NSNull):
-                    values[idx] = None
-                else:
-                    values[idx] = str(v)
-            yield {
-                msg_type[_type]: dict(zip(headers[_type], values))
-            }
+        (_type, values) = result
+
+        if _type == 1:
+            if  len(values[0]) == 16:
+                values[0] = SockAddr4.from_buffer_copy(values[0])
+                values[1] = SockAddr4.from_buffer_copy(values[1])
+                values[-1] = 'tcp4' if values[-1] == 1 else 'udp4'
+            elif len(values[0]) == 28:
+                values[0] = SockAddr6.from_buffer_copy(values[0])
+                values[1] = SockAddr6.from_buffer_copy(values[1])
+                values[-1] = 'tcp6' if values[-1] == 1 else 'udp6'
+
+        for idx,v in enumerate(values):
+            if isinstance(v, int) or isinstance(v, float):
+                pass
+            elif isinstance(v, bplist.NSNull):
+                values[idx] = None
+            else:
+                values[idx] = str(v)
+        return {
+            msg_type[_type]: dict(zip(headers[_type], values))
+        }
 
     def is_running_pid(self, pid: int) -> bool:
         aux = AUXMessageBuffer()
@@ -1127,6 +1221,11 @@ class ServiceInstruments(DTXService):
         aux = AUXMessageBuffer()
         aux.append_obj(pid)
         return self.call_message(self._SERVICE_DEVICEINFO, 'execnameForPid:', aux)
+
+    def mach_time_info(self) -> Tuple[int, int, int]:
+        """ returns (mach_absolute_time, numer, denom), nanoseconds = ticks * numer / denom """
+        ticks, numer, denom = self.call_message(self._SERVICE_DEVICEINFO, 'machTimeInfo')[:3]
+        return ticks, numer, denom
     
     def hardware_information(self) -> dict:
         """
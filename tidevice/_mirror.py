@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 16:20:37
+
+Incremental copy of a directory between host and device, like rsync
+
+A manifest (json) in the local directory records size and mtime of every file
+on both sides after it was copied, files which are unchanged on both sides
+are skipped next time. With checksum enabled, files with the same size but a
+different mtime are compared by SHA1 (AFC.OP_GET_FILE_HASH_RANGE) before copied.
+
+Manifest format:
+    {"version": 1, "files": {"a/1.txt": {"size": 5, "mtime": 1697600000.123, "local_mtime": 1697600000.123, "sha1": "..."}}}
+
+Usage:
+    sync.mirror("/Documents", "./Documents", delete=True)  # device -> host
+    sync.mirror("./fixtures", "/Documents", push=True)  # host -> device
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import posixpath
+import typing
+from typing import Dict, List, Optional
+
+from ._proto import PROGRAM_NAME, StatResult
+from ._sync import Sync
+from ._utils import pathjoin
+from .exceptions import MuxError
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+MANIFEST_NAME = ".tidevice-mirror.json"
+MANIFEST_VERSION = 1
+
+
+class MirrorResult(typing.NamedTuple):
+    copied: List[str]
+    deleted: List[str]
+    unchanged: List[str]
+
+    def __str__(self):
+        return "{} copied, {} deleted, {} unchanged".format(
+            len(self.copied), len(self.deleted), len(self.unchanged))
+
+
+def _load_manifest(path: str) -> Dict[str, dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        logger.warning("ignore invalid manifest %s: %s", path, e)
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def _save_manifest(path: str, files: Dict[str, dict]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _local_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Mirror:
+    def __init__(self,
+                 sync: Sync,
+                 delete: bool = False,
+                 checksum: bool = False,
+                 manifest: Optional[str] = None):
+        """
+        Args:
+            delete: delete files in destination which not exist in source
+            checksum: compare SHA1 when size is same but mtime changed
+            manifest: manifest path, default .tidevice-mirror.json in the local directory
+        """
+        self._sync = sync
+        self.delete = delete
+        self.checksum = checksum
+        self._manifest = manifest
+
+    def _device_sha1(self, fpath: str, size: int) -> Optional[str]:
+        """ returns None when device not support hash """
+        if not self.checksum:
+            return None
+        try:
+            return self._sync.file_hash(fpath, 0, size).hex()
+        except MuxError as e:
+            logger.warning("checksum disabled: %s", e)
+            self.checksum = False
+            return None
+
+    def _local_files(self, top: str, manifest_path: str) -> Dict[str, str]:
+        """ returns {relpath: local path} """
+        files = {}
+        for root, _, filenames in os.walk(top):
+            for fname in filenames:
+                lpath = os.path.join(root, fname)
+                if os.path.abspath(lpath) in (manifest_path, manifest_path + ".tmp"):
+                    continue
+                files[pathlib.Path(lpath).relative_to(top).as_posix()] = lpath
+        return files
+
+    def _record(self, info: StatResult, lpath: str, sha1: Optional[str] = None) -> dict:
+        record = {
+            "size": info.st_size,
+            "mtime": info.st_mtime.timestamp(),
+            "local_mtime": os.stat(lpath).st_mtime,
+        }
+        if sha1 or self.checksum:
+            record["sha1"] = sha1 or _local_sha1(lpath)
+        return record
+
+    def _unchanged(self, entry: Optional[dict], info: Optional[StatResult], lpath: str) -> bool:
+        """ both sides unchanged since last copied """
+        if not entry or not info or not os.path.isfile(lpath):
+            return False
+        st = os.stat(lpath)
+        return entry["size"] == info.st_size == st.st_size \
+            and entry["mtime"] == info.st_mtime.timestamp() \
+            and entry["local_mtime"] == st.st_mtime
+
+    def _same_content(self, entry: Optional[dict], fpath: str, info: Optional[StatResult], lpath: str) -> Optional[str]:
+        """ returns sha1 when device file and local file have the same content """
+        if not self.checksum or not info or not os.path.isfile(lpath) \
+                or os.path.getsize(lpath) != info.st_size:
+            return None
+        sha1 = self._device_sha1(fpath, info.st_size)
+        if sha1 is None:
+            return None
+        if entry and entry.get("sha1") == sha1 and entry["local_mtime"] == os.stat(lpath).st_mtime:
+            return sha1
+        return sha1 if sha1 == _local_sha1(lpath) else None
+
+    def pull(self, src: str, dst: str) -> MirrorResult:
+        """ make local directory dst same as device directory src """
+        if not self._sync.stat(src).is_dir():
+            raise MuxError("mirror {}: not a directory".format(src))
+        os.makedirs(dst, exist_ok=True)
+        manifest_path = os.path.abspath(self._manifest or os.path.join(dst, MANIFEST_NAME))
+        manifest = _load_manifest(manifest_path)
+        result = MirrorResult([], [], [])
+
+        dirs, files = self._sync.scan(src)
+        remote = {posixpath.relpath(fpath, src): (fpath, info) for fpath, info in files}
+        try:
+            for rel, (fpath, info) in remote.items():
+                lpath = os.path.join(dst, *rel.split("/"))
+                entry = manifest.get(rel)
+                if self._unchanged(entry, info, lpath):
+                    result.unchanged.append(rel)
+                    continue
+                sha1 = self._same_content(entry, fpath, info, lpath)
+                if sha1:
+                    manifest[rel] = self._record(info, lpath, sha1)
+                    result.unchanged.append(rel)
+                    continue
+                os.makedirs(os.path.dirname(lpath), exist_ok=True)
+                logger.info("mirror %s -> %s", fpath, lpath)
+                with open(lpath, "wb") as f:
+                    for chunk in self._sync.iter_content(fpath):
+                        f.write(chunk)
+                mtime = info.st_mtime.timestamp()
+                os.utime(lpath, (mtime, mtime))
+                manifest[rel] = self._record(info, lpath)
+                result.copied.append(rel)
+
+            if self.delete:
+                for rel, lpath in self._local_files(dst, manifest_path).items():
+                    if rel not in remote:
+                        os.remove(lpath)
+                        result.deleted.append(rel)
+                rdirs = {posixpath.relpath(dpath, src) for dpath in dirs}
+                for root, _, _ in sorted(os.walk(dst), reverse=True):
+                    rel = pathlib.Path(root).relative_to(dst).as_posix()
+                    if rel != "." and rel not in rdirs and not os.listdir(root):
+                        os.rmdir(root)
+        finally:
+            _save_manifest(manifest_path, {k: v for k, v in manifest.items() if k in remote})
+        return result
+
+    def push(self, src: str, dst: str) -> MirrorResult:
+        """ make device directory dst same as local directory src """
+        if not os.path.isdir(src):
+            raise MuxError("mirror {}: not a directory".format(src))
+        manifest_path = os.path.abspath(self._manifest or os.path.join(src, MANIFEST_NAME))
+        manifest = _load_manifest(manifest_path)
+        result = MirrorResult([], [], [])
+
+        self._sync.mkdir(dst)
+        dirs, files = self._sync.scan(dst)
+        remote = {posixpath.relpath(fpath, dst): info for fpath, info in files}
+        rdirs = {posixpath.relpath(dpath, dst) for dpath in dirs}
+        local = self._local_files(src, manifest_path)
+        try:
+            for rel, lpath in sorted(local.items()):
+                fpath = pathjoin(dst, rel)
+                entry, info = manifest.get(rel), remote.get(rel)
+                if self._unchanged(entry, info, lpath):
+                    result.unchanged.append(rel)
+                    continue
+                sha1 = self._same_content(entry, fpath, info, lpath)
+                if sha1:
+                    manifest[rel] = self._record(info, lpath, sha1)
+                    result.unchanged.append(rel)
+                    continue
+                parent = posixpath.dirname(rel)
+                if parent and parent not in rdirs:
+                    self._sync.mkdir(pathjoin(dst, parent))
+                    rdirs.add(parent)
+                logger.info("mirror %s -> %s", lpath, fpath)
+                self._sync.push(lpath, fpath)
+                manifest[rel] = self._record(self._sync.stat(fpath), lpath)
+                result.copied.append(rel)
+
+            if self.delete:
+                for rel in remote:
+                    if rel not in local:
+                        self._sync.remove(pathjoin(dst, rel))
+                        result.deleted.append(rel)
+                ldirs = {pathlib.Path(root).relative_to(src).as_posix() for root, _, _ in os.walk(src)}
+                for rel in sorted(rdirs - ldirs, reverse=True):
+                    self._sync.rmdir(pathjoin(dst, rel))
+        finally:
+            _save_manifest(manifest_path, {k: v for k, v in manifest.items() if k in local})
+        return result
@@ -7,16 +7,23 @@
 import base64
 import enum
 import io
+import logging
 import threading
 import time
 import typing
 import uuid
 from collections import defaultdict, namedtuple
-from typing import Any, Iterator, Optional, Tuple, Union
+from typing import Any, Iterator, List, Optional, Tuple, Union
 import weakref
 
+from ._clocksync import ClockSync, MachClock, RateCounter
 from ._device import BaseDevice
+from ._dispatch import Dispatcher, Overflow
+from ._instruments import ServiceInstruments
 from ._proto import *
+from .exceptions import MuxError
+
+logger = logging.getLogger(PROGRAM_NAME)
 
 
 class DataType(str, enum.Enum):
@@ -31,17 +38,41 @@ class DataType(str, enum.Enum):
 CallbackType = typing.Callable[[DataType, dict], None]
 
 class RunningProcess:
-    """ acturally there is a better way to monitor process pid """
+    """ pid of app, updated by application state notifications, polling is the fallback """
     PID_UPDATE_DURATION = 5.0
+    # check pid by polling even when notifications are received, in case one is lost
+    PID_VERIFY_DURATION = 30.0
 
     def __init__(self, d: BaseDevice, bundle_id: str):
         self._ins = d.connect_instruments()
         self._bundle_id = bundle_id
-        self._app_infos = list(d.installation.iter_installed(app_type=None))
+        self._app_index = d.app_index
         self._next_update_time = 0.0
         self._last_pid = None
         self._lock = threading.Lock()
+        self._subscribed = False
         weakref.finalize(self, self._ins.close)
+        try:
+            self._ins.subscribe_application_notification(self._on_app_state)
+            self._subscribed = True
+        except MuxError as e:
+            logger.warning("application notification not available, polling pid: %s", e)
+
+    def _on_app_state(self, info: Optional[dict]):
+        with self._lock:
+            if info is None:  # connection closed
+                self._subscribed = False
+                self._next_update_time = 0.0
+                return
+            if info.get('displayID') != self._bundle_id:
+                return
+            if info.get('state') == 1:  # Terminated
+                if info.get('pid') == self._last_pid:
+                    self._last_pid = None
+            else:
+                self._last_pid = info.get('pid')
+            if self._next_update_time:  # keep the first poll, app may run before subscribed
+                self._next_update_time = time.time() + self.PID_VERIFY_DURATION
 
     @property
     def bundle_id(self) -> str:
@@ -53,17 +84,20 @@ class RunningProcess:
             if time.time() < self._next_update_time:
                 return self._last_pid
 
+            duration = self.PID_VERIFY_DURATION if self._subscribed else self.PID_UPDATE_DURATION
             if self._last_pid and self._ins.is_running_pid(self._last_pid):
-                self._next_update_time = time.time() + self.PID_UPDATE_DURATION
+                self._next_update_time = time.time() + duration
                 return self._last_pid
 
-            for pinfo in self._ins.app_process_list(self._app_infos):
+            self._last_pid = None
+            for pinfo in self._ins.app_process_list(self._app_index.exe_index()):
                 if pinfo['bundle_id'] == self._bundle_id:
                     self._last_pid = pinfo['pid']
-                    self._next_update_time = time.time(
-                    ) + self.PID_UPDATE_DURATION
-                    # print(self._bundle_id, "pid:", self._last_pid)
-                    return self._last_pid
+                    break
+            if self._last_pid or self._subscribed:
+                # not running is also known from notifications
+                self._next_update_time = time.time() + duration
+            return self._last_pid
 
 
 class WaitGroup(object):
@@ -102,22 +136,39 @@ def gen_stimestamp(seconds: Optional[float] = None) -> str:
     return int(seconds * 1000)
 
 
+def _opengl_time(data: dict, clock: Optional[ClockSync]) -> float:
+    """ host time of device timestamp, time of receiving when clock is None """
+    ticks = data.get('XRVideoCardRunTimeStamp')  # microseconds
+    if clock is None or not isinstance(ticks, int):
+        return time.time()
+    return clock.align(ticks)
+
+
+def _fps_sample(data: dict, clock: Optional[ClockSync] = None) -> Tuple[DataType, dict]:
+    fps = data['CoreAnimationFramesPerSecond'] # fps from GPU
+    return DataType.FPS, {"fps": fps, "time": _opengl_time(data, clock), "value": fps}
+
+
+def _gpu_sample(data: dict, clock: Optional[ClockSync] = None) -> Tuple[DataType, dict]:
+    device_utilization = data['Device Utilization %']  # Device Utilization
+    tiler_utilization = data['Tiler Utilization %'] # Tiler Utilization
+    renderer_utilization = data['Renderer Utilization %'] # Renderer Utilization
+    return DataType.GPU, {"device": device_utilization, "renderer": renderer_utilization,
+                        "tiler": tiler_utilization, "time": _opengl_time(data, clock), "value": device_utilization}
+
+
 def iter_fps(d: BaseDevice) -> Iterator[Any]:
+    clock = ClockSync(scale=1e-6)
     with d.connect_instruments() as ts:
         for data in ts.iter_opengl_data():
-            fps = data['CoreAnimationFramesPerSecond'] # fps from GPU
-            # print("FPS:", fps)
-            yield DataType.FPS, {"fps": fps, "time": time.time(), "value": fps}
+            yield _fps_sample(data, clock)
 
 
 def iter_gpu(d: BaseDevice) -> Iterator[Any]:
+    clock = ClockSync(scale=1e-6)
     with d.connect_instruments() as ts:
         for data in ts.iter_opengl_data():
-            device_utilization = data['Device Utilization %']  # Device Utilization
-            tiler_utilization = data['Tiler Utilization %'] # Tiler Utilization
-            renderer_utilization = data['Renderer Utilization %'] # Renderer Utilization
-            yield DataType.GPU, {"device": device_utilization, "renderer": renderer_utilization,
-                                "tiler": tiler_utilization, "time": time.time(), "value": device_utilization}
+            yield _gpu_sample(data, clock)
 
 
 def iter_screenshot(d: BaseDevice) -> Iterator[Tuple[DataType, dict]]:
@@ -154,93 +205,142 @@ def _iter_complex_cpu_memory(d: BaseDevice,
         'mem_rss': 130760704,
         'pid': 1344}
     """
+    clock = MachClock()
     with d.connect_instruments() as ts:
         for info in ts.iter_cpu_memory():
-            pid = rp.get_pid()
-
-            if info is None or len(info) != 2:
-                continue
-            sinfo, pinfolist = info
-            if 'CPUCount' not in sinfo:
-                sinfo, pinfolist = pinfolist, sinfo
-
-            if 'CPUCount' not in sinfo:
-                continue
-
-            cpu_count = sinfo['CPUCount']
-
-            sys_cpu_usage = sinfo['SystemCPUUsage']
-            cpu_total_load = sys_cpu_usage['CPU_TotalLoad']
-            cpu_user = sys_cpu_usage['CPU_UserLoad']
-            cpu_sys = sys_cpu_usage['CPU_SystemLoad']
-
-            if 'Processes' not in pinfolist:
-                continue
-
-            # 这里的total_cpu_usage加起来的累计值大概在0.5~5.0之间
-            total_cpu_usage = 0.0
-            for attrs in pinfolist['Processes'].values():
-                pinfo = ProcAttrs(*attrs)
-                if isinstance(pinfo.cpuUsage, float):  # maybe NSNull
-                    total_cpu_usage += pinfo.cpuUsage
-
-            cpu_usage = 0.0
-            attrs = pinfolist['Processes'].get(pid)
-            if attrs is None:  # process is not running
-                # continue
-                # print('process not launched')
-                pass
-            else:
-                assert len(attrs) == len(SYSMON_PROC_ATTRS)
-                # print(ProcAttrs, attrs)
-                pinfo = ProcAttrs(*attrs)
-                cpu_usage = pinfo.cpuUsage
-            # next_list_process_time = time.time() + next_timeout
-            # cpu_usage, rss, mem_anon, pid = pinfo
-
-            # 很诡异的计算方法，不过也就这种方法计算出来的CPU看起来正常一点
-            # 计算后的cpuUsage范围 [0, 100]
-            # cpu_total_load /= cpu_count
-            # cpu_usage *= cpu_total_load
-            # if total_cpu_usage > 0:
-            #     cpu_usage /= total_cpu_usage
-
-            # print("cpuUsage: {}, total: {}".format(cpu_usage, total_cpu_usage))
-            # print("memory: {} MB".format(pinfo.physFootprint / 1024 / 1024))
-            yield dict(
-                type="process",
-                pid=pid,
-                phys_memory=pinfo.physFootprint,  # 物理内存
-                phys_memory_string="{:.1f} MiB".format(pinfo.physFootprint / 1024 /
-                                                    1024),
-                vss=pinfo.memVirtualSize,
-                rss=pinfo.memResidentSize,
-                anon=pinfo.memAnon,  # 匿名内存? 这个是啥
-                cpu_count=cpu_count,
-                cpu_usage=cpu_usage,  # 理论上最高 100.0 (这里是除以过cpuCount的)
-                sys_cpu_usage=cpu_total_load,
-                attr_cpuUsage=pinfo.cpuUsage,
-                attr_cpuTotal=cpu_total_load,
-                attr_ctxSwitch=pinfo.ctxSwitch,
-                attr_intWakeups=pinfo.intWakeups,
-                attr_systemInfo=sys_cpu_usage)
+            if clock.due:
+                _probe_clock(clock, ts)
+            minfo = _parse_cpu_memory(info, rp.get_pid(), clock)
+            if minfo is not None:
+                yield minfo
+
+
+def _probe_clock(clock: MachClock, ins: ServiceInstruments):
+    """ samples are stamped with host time until probe succeed """
+    try:
+        clock.probe(ins)
+    except Exception as e:
+        logger.warning("machTimeInfo failed, use host time: %s", e)
+
+
+def _parse_cpu_memory(info: list, pid: Optional[int], clock: Optional[MachClock] = None) -> Optional[dict]:
+    """ returns None when info is not a complete sample
+
+    Args:
+        clock: sample time is EndMachAbsTime when clock is synced, else time of receiving
+    """
+    if info is None or len(info) != 2:
+        return None
+    sinfo, pinfolist = info
+    if 'CPUCount' not in sinfo:
+        sinfo, pinfolist = pinfolist, sinfo
+
+    if 'CPUCount' not in sinfo:
+        return None
+
+    cpu_count = sinfo['CPUCount']
+
+    sys_cpu_usage = sinfo['SystemCPUUsage']
+    cpu_total_load = sys_cpu_usage['CPU_TotalLoad']
+    cpu_user = sys_cpu_usage['CPU_UserLoad']
+    cpu_sys = sys_cpu_usage['CPU_SystemLoad']
+
+    if 'Processes' not in pinfolist:
+        return None
+
+    # 这里的total_cpu_usage加起来的累计值大概在0.5~5.0之间
+    total_cpu_usage = 0.0
+    for attrs in pinfolist['Processes'].values():
+        pinfo = ProcAttrs(*attrs)
+        if isinstance(pinfo.cpuUsage, float):  # maybe NSNull
+            total_cpu_usage += pinfo.cpuUsage
+
+    cpu_usage = 0.0
+    attrs = pinfolist['Processes'].get(pid)
+    if attrs is None:  # process is not running
+        # continue
+        # print('process not launched')
+        pass
+    else:
+        assert len(attrs) == len(SYSMON_PROC_ATTRS)
+        # print(ProcAttrs, attrs)
+        pinfo = ProcAttrs(*attrs)
+        cpu_usage = pinfo.cpuUsage
+    # next_list_process_time = time.time() + next_timeout
+    # cpu_usage, rss, mem_anon, pid = pinfo
+
+    # 很诡异的计算方法，不过也就这种方法计算出来的CPU看起来正常一点
+    # 计算后的cpuUsage范围 [0, 100]
+    # cpu_total_load /= cpu_count
+    # cpu_usage *= cpu_total_load
+    # if total_cpu_usage > 0:
+    #     cpu_usage /= total_cpu_usage
+
+    # print("cpuUsage: {}, total: {}".format(cpu_usage, total_cpu_usage))
+    # print("memory: {} MB".format(pinfo.physFootprint / 1024 / 1024))
+    return dict(
+        type="process",
+        pid=pid,
+        phys_memory=pinfo.physFootprint,  # 物理内存
+        phys_memory_string="{:.1f} MiB".format(pinfo.physFootprint / 1024 /
+                                            1024),
+        vss=pinfo.memVirtualSize,
+        rss=pinfo.memResidentSize,
+        anon=pinfo.memAnon,  # 匿名内存? 这个是啥
+        cpu_count=cpu_count,
+        cpu_usage=cpu_usage,  # 理论上最高 100.0 (这里是除以过cpuCount的)
+        sys_cpu_usage=cpu_total_load,
+        attr_cpuUsage=pinfo.cpuUsage,
+        attr_cpuTotal=cpu_total_load,
+        attr_ctxSwitch=pinfo.ctxSwitch,
+        attr_intWakeups=pinfo.intWakeups,
+        attr_systemInfo=sys_cpu_usage,
+        time=_sysmontap_time(pinfolist, clock),
+        device_time=_sysmontap_device_time(pinfolist, clock))
+
+
+def _sysmontap_device_time(pinfolist: dict, clock: Optional[MachClock]) -> Optional[float]:
+    """ seconds of device mach time """
+    ticks = pinfolist.get('EndMachAbsTime')
+    if clock is None or not clock.synced or not isinstance(ticks, int):
+        return None
+    return ticks * clock.scale
+
+
+def _sysmontap_time(pinfolist: dict, clock: Optional[MachClock]) -> float:
+    if _sysmontap_device_time(pinfolist, clock) is None:
+        return time.time()
+    return clock.to_host(pinfolist['EndMachAbsTime'])
+
+
+def _cpu_memory_samples(minfo: dict, rates: Optional[RateCounter] = None) -> List[Tuple[DataType, dict]]:
+    """
+    Args:
+        rates: per second context switches and wakeups of pid, by device time
+    """
+    cpu = {
+        "timestamp": gen_stimestamp(minfo['time']),
+        "pid": minfo['pid'],
+        "value": minfo['cpu_usage'],  # max 100.0?, maybe not
+        "sys_value": minfo['sys_cpu_usage'],
+        "count": minfo['cpu_count']
+    }
+    if rates is not None and minfo['pid'] and minfo['device_time'] is not None:
+        pid, seconds = minfo['pid'], minfo['device_time']
+        cpu["ctx_switches"] = rates.update((pid, "ctxSwitch"), seconds, minfo['attr_ctxSwitch'])
+        cpu["wakeups"] = rates.update((pid, "intWakeups"), seconds, minfo['attr_intWakeups'])
+    return [(DataType.CPU, cpu), (DataType.MEMORY, {
+        "pid": minfo['pid'],
+        "timestamp": gen_stimestamp(minfo['time']),
+        "value": minfo['phys_memory'] / 1024 / 1024,  # MB
+        "rss_value": minfo['rss'] / 1024 / 1024,      # MB
+    })]
 
 
 def iter_cpu_memory(d: BaseDevice, rp: RunningProcess) -> Iterator[Any]:
+    rates = RateCounter()
     for minfo in _iter_complex_cpu_memory(d, rp):  # d.iter_cpu_mem(bundle_id):
-        yield DataType.CPU, {
-            "timestamp": gen_stimestamp(),
-            "pid": minfo['pid'],
-            "value": minfo['cpu_usage'],  # max 100.0?, maybe not
-            "sys_value": minfo['sys_cpu_usage'],
-            "count": minfo['cpu_count']
-        }
-        yield DataType.MEMORY, {
-            "pid": minfo['pid'],
-            "timestamp": gen_stimestamp(),
-            "value": minfo['phys_memory'] / 1024 / 1024,  # MB
-            "rss_value": minfo['rss'] / 1024 / 1024,      # MB
-        }
+        yield from _cpu_memory_samples(minfo, rates)
 
 
 def set_interval(it: Iterator[Any], interval: float):
@@ -292,14 +392,34 @@ def append_data(wg: WaitGroup, stop_event: threading.Event,
 class Performance():
     # PROMPT_TITLE = "tidevice performance"
 
-    def __init__(self, d: BaseDevice, perfs: typing.List[DataType] = []):
+    def __init__(self,
+                 d: BaseDevice,
+                 perfs: typing.List[DataType] = [],
+                 store=None,
+                 stats=None,
+                 queue_size: int = 1024,
+                 overflow: Overflow = Overflow.DROP_OLD,
+                 workers: int = 1):
+        """
+        Args:
+            store (PerfStore): record samples when set
+            stats (PerfStats): streaming statistics when set, summary returned by stop()
+            queue_size: samples waiting for callback, callback is called in other threads
+            overflow: which sample is dropped when queue is full
+            workers: threads calling callback, samples are not in order when more than 1
+        """
         self._d = d
         self._bundle_id = None
         self._stop_event = threading.Event()
         self._wg = WaitGroup()
         self._started = False
-        self._result = defaultdict(list)
         self._perfs = perfs
+        self.store = store
+        self.stats = stats
+        self._queue_size = queue_size
+        self._overflow = overflow
+        self._workers = workers
+        self._dispatcher: Optional[Dispatcher] = None
 
         # the callback function accepts all the data
         self._callback = None
@@ -308,9 +428,23 @@ class Performance():
         if not callback:
             # 默认不输出屏幕的截图（暂时没想好怎么处理）
             callback = lambda _type, data: print(_type.value, data, flush=True) if _type != DataType.SCREENSHOT and _type in self._perfs else None
+        # sampling threads never wait for callback
+        self._dispatcher = Dispatcher(callback, self._queue_size, self._overflow, self._workers, name="perf-callback")
+        callback = self._dispatcher.put
+        if self.store is not None or self.stats is not None:
+            callback = self._recording(callback)
         self._rp = RunningProcess(self._d, bundle_id)
         self._thread_start(callback)
 
+    def _recording(self, callback: CallbackType) -> CallbackType:
+        def _cb(_type: DataType, data: dict):
+            if self.store is not None:
+                self.store.append(_type, data)
+            if self.stats is not None:
+                self.stats.update(_type, data)
+            callback(_type, data)
+        return _cb
+
     def _thread_start(self, callback: CallbackType):
         iters = []
         if DataType.CPU in self._perfs or DataType.MEMORY in self._perfs:
@@ -331,7 +465,13 @@ class Performance():
                                    callback,self._perfs),
                              daemon=True).start()
 
-    def stop(self): # -> PerfReport:
+    @property
+    def dropped(self) -> int:
+        """ samples dropped because callback is slower than sampling """
+        return self._dispatcher.dropped if self._dispatcher else 0
+
+    def stop(self) -> typing.Optional[dict]:
+        """ returns stats summary when stats is set """
         self._stop_event.set()
         with self._d.connect_instruments() as ts:
             print('Stop Sampling...')
@@ -340,7 +480,13 @@ class Performance():
             if DataType.CPU in self._perfs or DataType.MEMORY in self._perfs: ts.stop_iter_cpu_memory()
                 
             
+        if self._dispatcher:
+            self._dispatcher.close(timeout=5.0)
+            if self.dropped:
+                logger.warning("%d samples dropped, callback is slower than sampling", self.dropped)
         print("\nFinished!")
+        if self.stats is not None:
+            return self.stats.summary()
 
         # memory and fps will take at least 1 second to catch _stop_event
         # to make function run faster, we not using self._wg.wait(..) here
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 21:36:17
+
+Collect perf samples of many devices in one process
+
+Performance uses one instruments connection and one thread per metric. PerfFarm
+uses one instruments connection per device: sysmontap, opengl, networking and
+application state notifications are streamed on it together, and samples are parsed in the
+receiving thread of the connection. Connecting, pid polling and reconnecting
+run on a shared thread pool, all samples go to one sink called from a single
+dispatcher thread.
+
+cpu and memory are sampled once per device for all bundle ids. fps, gpu and
+network are device wide, their bundle_id is None.
+
+Usage:
+    def sink(udid: str, bundle_id: Optional[str], _type: DataType, data: dict):
+        print(udid, bundle_id, _type.value, data)
+
+    with PerfFarm(sink) as farm:
+        for d in devices:
+            farm.add(d, ["com.example.demo"])
+        time.sleep(60)
+"""
+
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from ._device import BaseDevice
+from ._dispatch import Dispatcher, Overflow
+from ._instruments import ServiceInstruments
+from ._clocksync import ClockSync, MachClock, RateCounter
+from ._perf import (DataType, RunningProcess, _cpu_memory_samples, _fps_sample, _gpu_sample, _parse_cpu_memory,
+                    _probe_clock, gen_stimestamp)
+from ._proto import PROGRAM_NAME
+from .exceptions import MuxError
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+SinkType = Callable[[str, Optional[str], DataType, dict], None]
+
+FARM_PERFS = (DataType.CPU, DataType.MEMORY, DataType.FPS, DataType.GPU, DataType.NETWORK)
+
+
+class _DeviceSampler:
+    """ samples of one device on one instruments connection """
+
+    def __init__(self, farm: "PerfFarm", d: BaseDevice, bundle_ids: List[str]):
+        self._farm = farm
+        self._d = d
+        self.udid = d.udid
+        self._pids: Dict[str, Optional[int]] = {bundle_id: None for bundle_id in bundle_ids}
+        self._ins: Optional[ServiceInstruments] = None
+        self._clock = MachClock()
+        self._gl_clock = ClockSync(scale=1e-6)
+        self._rates = RateCounter()
+        self._subscribed = False
+        self.connected = False
+        self.busy = False  # a task is scheduled in thread pool
+        self.next_poll = 0.0
+
+    def connect(self):
+        perfs = self._farm.perfs
+        ins = self._ins = self._d.connect_instruments()
+        # callbacks of a closed connection are ignored
+        try:
+            ins.subscribe_application_notification(lambda info: self._on_app_state(ins, info))
+            self._subscribed = True
+        except MuxError as e:
+            self._subscribed = False
+            logger.warning("perf farm: %s application notification not available, polling pid: %s", self.udid, e)
+        self._gl_clock = ClockSync(scale=1e-6)  # opengl timestamps restart with sampling
+        _probe_clock(self._clock, ins)
+        self.poll_pids()
+        if DataType.CPU in perfs or DataType.MEMORY in perfs:
+            ins.start_cpu_memory_sampling(lambda result: self._on_cpu_memory(ins, result))
+        if DataType.FPS in perfs or DataType.GPU in perfs:
+            ins.start_opengl_sampling(lambda data: self._on_opengl(ins, data))
+        if DataType.NETWORK in perfs:
+            ins.start_network_monitoring(lambda data: self._on_network(ins, data))
+        self.connected = True
+        logger.info("perf farm: %s connected", self.udid)
+
+    def close(self):
+        self.connected = False
+        ins, self._ins = self._ins, None
+        if ins is not None:
+            ins.close()
+
+    def poll_pids(self):
+        """ fallback of application state notifications """
+        if self._clock.due:
+            _probe_clock(self._clock, self._ins)
+        pids = dict.fromkeys(self._pids)
+        for p in self._ins.app_process_list(self._d.app_index.exe_index()):
+            if p['bundle_id'] in pids:
+                pids[p['bundle_id']] = p['pid']
+        self._pids = pids
+        interval = self._farm.pid_interval
+        if not self._subscribed:
+            interval = min(interval, RunningProcess.PID_UPDATE_DURATION)
+        self.next_poll = time.monotonic() + interval
+
+    def _disconnected(self, ins: ServiceInstruments):
+        if ins is self._ins and self.connected:
+            logger.warning("perf farm: %s disconnected", self.udid)
+            self.connected = False
+            self.next_poll = 0.0  # reconnect
+
+    def _on_app_state(self, ins: ServiceInstruments, info: Optional[dict]):
+        if info is None:
+            self._disconnected(ins)
+            return
+        bundle_id = info.get('displayID')
+        if bundle_id not in self._pids:
+            return
+        if info.get('state') == 1:  # Terminated
+            if self._pids[bundle_id] == info.get('pid'):
+                self._pids[bundle_id] = None
+        else:
+            self._pids[bundle_id] = info.get('pid')
+
+    def _on_cpu_memory(self, ins: ServiceInstruments, result: Optional[list]):
+        if result is None:
+            self._disconnected(ins)
+            return
+        for bundle_id, pid in list(self._pids.items()):
+            if not pid:
+                continue
+            minfo = _parse_cpu_memory(result, pid, self._clock)
+            if minfo is None:
+                return
+            for _type, data in _cpu_memory_samples(minfo, self._rates):
+                self._farm._emit(self.udid, bundle_id, _type, data)
+
+    def _on_opengl(self, ins: ServiceInstruments, data: Optional[dict]):
+        if data is None:
+            self._disconnected(ins)
+            return
+        self._farm._emit(self.udid, None, *_fps_sample(data, self._gl_clock))
+        self._farm._emit(self.udid, None, *_gpu_sample(data, self._gl_clock))
+
+    def _on_network(self, ins: ServiceInstruments, data: Optional[dict]):
+        if data is None:
+            self._disconnected(ins)
+            return
+        data['timestamp'] = gen_stimestamp()
+        self._farm._emit(self.udid, None, DataType.NETWORK, data)
+
+
+class PerfFarm:
+    def __init__(self,
+                 sink: SinkType,
+                 perfs: List[DataType] = FARM_PERFS,
+                 workers: int = 4,
+                 pid_interval: float = 30.0,
+                 max_pending: int = 10000):
+        """
+        Args:
+            sink: called with (udid, bundle_id, type, data) in the dispatcher thread
+            perfs: any of cpu, memory, fps, gpu, network
+            workers: threads to connect devices and poll pids
+            pid_interval: seconds between pid polls, pids are updated by notifications in between
+            max_pending: samples waiting for sink, new samples are dropped when full
+        """
+        self._max_pending = max_pending
+        self._sink = sink
+        self.perfs = [p for p in perfs if p in FARM_PERFS]
+        self.pid_interval = pid_interval
+        self._dispatcher: Optional[Dispatcher] = None
+        self._samplers: Dict[str, _DeviceSampler] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._pool = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="perf-farm")
+        self._threads: List[threading.Thread] = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def add(self, d: BaseDevice, bundle_ids: List[str]):
+        """ start sampling device, samples of apps in bundle_ids """
+        with self._lock:
+            if d.udid in self._samplers:
+                raise MuxError("device already added", d.udid)
+            self._samplers[d.udid] = _DeviceSampler(self, d, bundle_ids)
+
+    def remove(self, udid: str):
+        with self._lock:
+            sampler = self._samplers.pop(udid, None)
+        if sampler:
+            sampler.close()
+
+    @property
+    def dropped(self) -> int:
+        return self._dispatcher.dropped if self._dispatcher else 0
+
+    def start(self):
+        self._dispatcher = Dispatcher(self._sink, self._max_pending, Overflow.DROP_NEW, name="perf-farm-dispatcher")
+        self._threads = [
+            threading.Thread(name="perf-farm-scheduler", target=self._schedule, daemon=True),
+        ]
+        for th in self._threads:
+            th.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            samplers, self._samplers = list(self._samplers.values()), {}
+        for sampler in samplers:
+            sampler.close()
+        for th in self._threads:
+            th.join()
+        if self._dispatcher:
+            self._dispatcher.close()
+
+    def _emit(self, udid: str, bundle_id: Optional[str], _type: DataType, data: dict):
+        if _type not in self.perfs:
+            return
+        if "time" in data:
+            data["timestamp"] = gen_stimestamp(data.pop("time"))
+        if self._dispatcher:
+            self._dispatcher.put(udid, bundle_id, _type, data)
+
+    def _run(self, sampler: _DeviceSampler):
+        try:
+            if not sampler.connected:
+                sampler.close()
+                sampler.connect()
+            elif time.monotonic() >= sampler.next_poll:
+                sampler.poll_pids()
+        except Exception as e:
+            logger.warning("perf farm: %s %s", sampler.udid, e)
+            sampler.close()
+            sampler.next_poll = time.monotonic() + 1.0  # retry connect later
+        finally:
+            sampler.busy = False
+
+    def _schedule(self):
+        while not self._stop_event.wait(.1):
+            now = time.monotonic()
+            with self._lock:
+                samplers = list(self._samplers.values())
+            for sampler in samplers:
+                if sampler.busy or now < sampler.next_poll:
+                    continue
+                sampler.busy = True
+                try:
+                    self._pool.submit(self._run, sampler)
+                except RuntimeError:  # pool shutdown
+                    return
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Mon Oct 19 2026 09:12:40
+
+Stream samples of one Performance session to many clients
+
+    /ws         WebSocket, one json message per sample
+    /events     Server-Sent Events, one json per "data:" line
+    /snapshot   latest samples in PerfStore, ?seconds=60
+
+Clients share the same instruments connection, the server only fans samples
+out. Every message is the sample dict with "type" added, filter with
+?types=cpu,fps. A slow client whose writes are not flushed loses samples
+instead of slowing down the others.
+
+Usage:
+    store = PerfStore(3600)
+    perf = Performance(d, [DataType.CPU, DataType.FPS], store=store)
+    server = PerfServer(store)
+
+    async def main():
+        server.listen(8100)
+        perf.start("com.example.demo", callback=server.publish)
+        await asyncio.Event().wait()
+"""
+
+import json
+import logging
+import math
+import time
+from typing import Optional, Set, Tuple
+
+from tornado import web, websocket
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from tornado.locks import Event
+
+from ._perf import DataType
+from ._perfstore import PerfStore
+from ._proto import PROGRAM_NAME
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """ ":8100" listens on all interfaces, "127.0.0.1:8100" on localhost only """
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+def _parse_types(value: Optional[str]) -> Optional[Set[DataType]]:
+    """ raise HTTPError(400) for unknown types """
+    if not value:
+        return None
+    try:
+        return {DataType(name) for name in value.split(",")}
+    except ValueError as e:
+        raise web.HTTPError(400, "invalid types: %s", e)
+
+
+class _Client:
+    """ mixin of WebSocket and SSE handlers """
+
+    server: "PerfServer"
+    types: Optional[Set[DataType]] = None
+    _pending = 0
+
+    def prepare(self):
+        # before websocket handshake, so that a bad query gets 400
+        self.types = _parse_types(self.get_argument("types", None))
+
+    def _subscribe(self):
+        self.server._clients.add(self)
+
+    def _unsubscribe(self):
+        self.server._clients.discard(self)
+
+    def _sent(self, future):
+        self._pending -= 1
+        if future.exception() is not None:  # client is gone
+            self._unsubscribe()
+
+    def send(self, _type: DataType, message: str):
+        if self.types is not None and _type not in self.types:
+            return
+        if self._pending >= self.server.max_pending:
+            self.server.dropped += 1
+            return
+        try:
+            future = self._write(message)
+        except (websocket.WebSocketClosedError, StreamClosedError):
+            self._unsubscribe()
+            return
+        self._pending += 1
+        future.add_done_callback(self._sent)
+
+
+class _WebSocketHandler(_Client, websocket.WebSocketHandler):
+    def initialize(self, server: "PerfServer"):
+        self.server = server
+
+    def check_origin(self, origin: str) -> bool:
+        return True  # dashboards are served from other hosts
+
+    def open(self):
+        self._subscribe()
+
+    def on_close(self):
+        self._unsubscribe()
+
+    def _write(self, message: str):
+        return self.write_message(message)
+
+
+class _EventSourceHandler(_Client, web.RequestHandler):
+    def initialize(self, server: "PerfServer"):
+        self.server = server
+        self._closed = Event()
+
+    async def get(self):
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("Access-Control-Allow-Origin", "*")
+        self._subscribe()
+        try:
+            await self.flush()
+            await self._closed.wait()
+        finally:
+            self._unsubscribe()
+
+    def on_connection_close(self):
+        self._closed.set()
+
+    def _write(self, message: str):
+        self.write("data: " + message + "\n\n")
+        return self.flush()
+
+
+class _SnapshotHandler(web.RequestHandler):
+    def initialize(self, server: "PerfServer"):
+        self.server = server
+
+    def get(self):
+        try:
+            seconds = float(self.get_argument("seconds", self.server.window))
+        except ValueError:
+            raise web.HTTPError(400, "seconds should be a number")
+        types = _parse_types(self.get_argument("types", None))
+        self.set_header("Access-Control-Allow-Origin", "*")
+        self.write(self.server.snapshot(seconds, types))
+
+
+class PerfServer:
+    def __init__(self, store: PerfStore, max_pending: int = 100, window: float = 60.0):
+        """
+        Args:
+            store: samples for /snapshot, should be the store passed to Performance
+            max_pending: unflushed messages per client, later samples are dropped for that client
+            window: default seconds of /snapshot
+        """
+        self.store = store
+        self.max_pending = max_pending
+        self.window = window
+        self.dropped = 0
+        self._clients: Set[_Client] = set()
+        self._io_loop: Optional[IOLoop] = None
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def make_app(self) -> web.Application:
+        kwargs = dict(server=self)
+        return web.Application([
+            (r"/ws", _WebSocketHandler, kwargs),
+            (r"/events", _EventSourceHandler, kwargs),
+            (r"/snapshot", _SnapshotHandler, kwargs),
+        ])
+
+    def listen(self, port: int, address: str = ""):
+        """ should be called in the running io loop """
+        self._io_loop = IOLoop.current()
+        self.make_app().listen(port, address)
+        logger.info("Perf server listening on %s:%d", address or "0.0.0.0", port)
+
+    def publish(self, _type: DataType, data: dict):
+        """ Performance callback, can be called from any thread """
+        if _type == DataType.SCREENSHOT or self._io_loop is None:
+            return
+        message = json.dumps(dict(data, type=_type.value))
+        self._io_loop.add_callback(self._broadcast, _type, message)
+
+    def _broadcast(self, _type: DataType, message: str):
+        for client in list(self._clients):
+            client.send(_type, message)
+
+    def snapshot(self, seconds: float, types: Optional[Set[DataType]] = None) -> dict:
+        """ samples of the last seconds, {type: [row]}, nan is null """
+        start = time.time() - seconds
+        result = {}
+        for _type in self.store.metrics:
+            if types is not None and _type not in types:
+                continue
+            result[_type.value] = [
+                {k: None if math.isnan(v) else v for k, v in row.items()}
+                for row in self.store.rows(_type, start)
+            ]
+        return result
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 20:58:44
+
+Streaming statistics of Performance samples, raw samples are not kept
+
+- QuantileSketch: quantiles with relative error (log buckets, like DDSketch)
+- JankDetector: FPS samples below jank_fps, estimated dropped frames
+- LeakDetector: memory growth slope, linear regression with exponential decay
+- ThresholdAlert: callback when a value stays above (or below) a threshold
+
+Usage:
+    stats = PerfStats(alerts=[ThresholdAlert(DataType.CPU, 80, count=3)], on_alert=print)
+    perf = Performance(d, [DataType.CPU, DataType.MEMORY, DataType.FPS], stats=stats)
+    perf.start("com.example.demo")
+    ...
+    print(stats.summary())  # also returned by perf.stop()
+"""
+
+import math
+import threading
+from typing import Callable, Dict, List, Optional
+
+from ._perf import DataType
+
+
+class QuantileSketch:
+    """ values are counted in buckets of [gamma^(i-1), gamma^i), memory is O(log(max/min)) """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zeros = 0
+        self.count = 0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value: float):
+        if value > 0:
+            key = self._key(value)
+            self._buckets[key] = self._buckets.get(key, 0) + 1
+        elif value < 0:
+            key = self._key(-value)
+            self._negative[key] = self._negative.get(key, 0) + 1
+        else:
+            self._zeros += 1
+        self.count += 1
+
+    def _value(self, key: int) -> float:
+        """ middle of the bucket, error is less than relative_accuracy """
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """ q in [0, 1], returns None when empty """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self._zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self._buckets))
+
+
+class Summary:
+    """ count, min, max, mean and quantiles of one value """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self._sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value: float):
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.mean += (value - self.mean) / self.count
+        self._sketch.add(value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self._sketch.quantile(q)
+
+    def to_dict(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "p50": self.quantile(.5),
+            "p90": self.quantile(.9),
+            "p99": self.quantile(.99),
+        }
+
+
+class JankDetector:
+    def __init__(self, jank_fps: float = 45.0, target_fps: float = 60.0):
+        """
+        Args:
+            jank_fps: a sample (CoreAnimationFramesPerSecond, about one per second) below it is a jank
+            target_fps: expected fps, used to estimate dropped frames
+        """
+        self.jank_fps = jank_fps
+        self.target_fps = target_fps
+        self.samples = 0
+        self.janks = 0
+        self.dropped_frames = 0.0
+        self._in_jank = False
+        self.jank_events = 0  # consecutive jank samples count once
+
+    def add(self, fps: float):
+        self.samples += 1
+        # fps is 0 when screen is not changing, it is not a jank
+        is_jank = 0 < fps < self.jank_fps
+        if is_jank:
+            self.janks += 1
+            self.dropped_frames += self.target_fps - fps
+            if not self._in_jank:
+                self.jank_events += 1
+        self._in_jank = is_jank
+
+    def to_dict(self) -> dict:
+        return {
+            "janks": self.janks,
+            "jank_events": self.jank_events,
+            "jank_ratio": self.janks / self.samples if self.samples else 0.0,
+            "dropped_frames": round(self.dropped_frames, 1),
+        }
+
+
+class LeakDetector:
+    """ slope of memory over time, by linear regression of exponential decayed samples """
+
+    def __init__(self, half_life: float = 300.0, min_samples: int = 10, threshold: float = 1.0):
+        """
+        Args:
+            half_life: seconds, weight of a sample halves after that, so the regression follows recent samples
+            min_samples: no slope before that
+            threshold: slope in MB per minute reported as leaking
+        """
+        self.half_life = half_life
+        self.min_samples = min_samples
+        self.threshold = threshold
+        self.samples = 0
+        self._t0: Optional[float] = None
+        self._last_t = 0.0
+        self._sw = self._sx = self._sy = self._sxx = self._sxy = 0.0
+
+    def add(self, t: float, value: float):
+        """
+        Args:
+            t: seconds
+            value: memory in MB
+        """
+        if self._t0 is None:
+            self._t0 = t
+        x = t - self._t0
+        decay = 0.5 ** (max(0.0, x - self._last_t) / self.half_life)
+        self._last_t = x
+        self._sw = self._sw * decay + 1
+        self._sx = self._sx * decay + x
+        self._sy = self._sy * decay + value
+        self._sxx = self._sxx * decay + x * x
+        self._sxy = self._sxy * decay + x * value
+        self.samples += 1
+
+    @property
+    def slope(self) -> Optional[float]:
+        """ MB per minute, None when not enough samples """
+        if self.samples < self.min_samples:
+            return None
+        var = self._sw * self._sxx - self._sx * self._sx
+        if var <= 1e-9:
+            return None
+        return (self._sw * self._sxy - self._sx * self._sy) / var * 60
+
+    @property
+    def leaking(self) -> bool:
+        slope = self.slope
+        return slope is not None and slope > self.threshold
+
+    def to_dict(self) -> dict:
+        return {"slope_mb_per_min": self.slope, "leaking": self.leaking}
+
+
+class ThresholdAlert:
+    def __init__(self, _type: DataType, threshold: float, field: str = "value", count: int = 1, below: bool = False):
+        """
+        Args:
+            threshold: alert when value > threshold (value < threshold when below)
+            count: consecutive samples required
+        """
+        self.type = _type
+        self.threshold = threshold
+        self.field = field
+        self.count = count
+        self.below = below
+        self._hits = 0
+        self.fired = 0
+
+    def check(self, value: float) -> bool:
+        """ returns True when alert fired, fired again after value returns to normal """
+        hit = value < self.threshold if self.below else value > self.threshold
+        self._hits = self._hits + 1 if hit else 0
+        if self._hits == self.count:
+            self.fired += 1
+            return True
+        return False
+
+    def __str__(self):
+        return "{} {} {} {} for {} samples".format(
+            self.type.value, self.field, "<" if self.below else ">", self.threshold, self.count)
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value):
+        return float(value)
+    return None
+
+
+class PerfStats:
+    def __init__(self,
+                 alerts: List[ThresholdAlert] = [],
+                 on_alert: Optional[Callable[[ThresholdAlert, DataType, dict], None]] = None,
+                 cpu_spike: float = 80.0,
+                 jank: Optional[JankDetector] = None,
+                 leak: Optional[LeakDetector] = None):
+        """
+        Args:
+            alerts: threshold alerts checked for every sample
+            on_alert: called with (alert, type, data) in the sampling thread
+            cpu_spike: cpu samples above it are counted as spikes
+        """
+        self.alerts = list(alerts)
+        self.on_alert = on_alert
+        self.cpu_spike = cpu_spike
+        self.cpu_spikes = 0
+        self.jank = jank or JankDetector()
+        self.leak = leak or LeakDetector()
+        self._summaries: Dict[DataType, Summary] = {}
+        self._lock = threading.Lock()
+
+    def update(self, _type: DataType, data: dict):
+        """ same arguments as Performance callback """
+        value = _number(data.get("value"))
+        if value is None:
+            return
+        fired = []
+        with self._lock:
+            if _type not in self._summaries:
+                self._summaries[_type] = Summary()
+            self._summaries[_type].add(value)
+            if _type == DataType.FPS:
+                self.jank.add(value)
+            elif _type == DataType.CPU and value > self.cpu_spike:
+                self.cpu_spikes += 1
+            elif _type == DataType.MEMORY:
+                ts = _number(data.get("timestamp"))
+                if ts is not None:
+                    self.leak.add(ts / 1000.0, value)
+            for alert in self.alerts:
+                if alert.type != _type:
+                    continue
+                avalue = value if alert.field == "value" else _number(data.get(alert.field))
+                if avalue is not None and alert.check(avalue):
+                    fired.append(alert)
+        for alert in fired:
+            if self.on_alert:
+                self.on_alert(alert, _type, data)
+
+    def summary(self) -> dict:
+        with self._lock:
+            result = {_type.value: s.to_dict() for _type, s in self._summaries.items()}
+            if DataType.FPS in self._summaries:
+                result[DataType.FPS.value].update(self.jank.to_dict())
+            if DataType.CPU in self._summaries:
+                result[DataType.CPU.value]["spikes"] = self.cpu_spikes
+            if DataType.MEMORY in self._summaries:
+                result[DataType.MEMORY.value].update(self.leak.to_dict())
+            if self.alerts:
+                result["alerts"] = {str(alert): alert.fired for alert in self.alerts}
+            return result
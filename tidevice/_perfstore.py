@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 20:31:08
+
+Fixed memory time series of Performance samples
+
+Every metric is a ring buffer of float64 columns (array.array), the oldest
+samples are overwritten when full. Memory is capacity * columns * 8 bytes,
+eg: one sample per second for 10 hours is about 1.4 MB per metric.
+
+Usage:
+    store = PerfStore(capacity=36000)
+    perf = Performance(d, [DataType.CPU, DataType.MEMORY], store=store)
+    ...
+    store.query(DataType.CPU, start=time.time() - 60)  # last minute
+    store.export("perf.csv")  # perf.cpu.csv, perf.memory.csv
+"""
+
+import array
+import csv
+import json
+import math
+import os
+import threading
+import typing
+from typing import Dict, Iterator, List, Optional
+
+from ._perf import DataType
+
+# timestamp is seconds since epoch, the rest comes from the sample dict with the same key,
+# network from its connection-update, cumulative bytes and packets of the connection
+METRIC_FIELDS: Dict[DataType, List[str]] = {
+    DataType.CPU: ["timestamp", "pid", "value", "sys_value", "count", "ctx_switches", "wakeups"],
+    DataType.MEMORY: ["timestamp", "pid", "value", "rss_value"],
+    DataType.FPS: ["timestamp", "value"],
+    DataType.GPU: ["timestamp", "device", "renderer", "tiler"],
+    DataType.NETWORK: ["timestamp", "ConnectionSerial", "RxBytes", "TxBytes", "RxPackets", "TxPackets"],
+}
+
+
+class RingBuffer:
+    """ columns of float, the first column is timestamp
+
+    Timestamps are kept in order for query: a timestamp earlier than the last
+    appended one is raised to it, eg: when clock sync moves the mapping back.
+    A sample without timestamp (nan) is rejected with ValueError.
+    """
+
+    def __init__(self, fields: List[str], capacity: int):
+        assert capacity > 0, "capacity should be greater than 0"
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._columns = [array.array("d", bytes(8 * capacity)) for _ in fields]
+        self._next = 0  # physical index of the next sample
+        self._size = 0
+        self._last_ts = -math.inf
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.itemsize * len(col) for col in self._columns)
+
+    def append(self, values: typing.Sequence[float]):
+        values = list(values)
+        if not values or math.isnan(_to_float(values[0])):
+            raise ValueError("sample without timestamp: {!r}".format(values))
+        with self._lock:
+            if values[0] < self._last_ts:
+                values[0] = self._last_ts
+            else:
+                self._last_ts = values[0]
+            for col, value in zip(self._columns, values):
+                col[self._next] = value
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _physical(self, index: int) -> int:
+        """ index 0 is the oldest sample """
+        return (self._next - self._size + index) % self.capacity
+
+    def _bisect(self, ts: float) -> int:
+        """ first index with timestamp >= ts """
+        times = self._columns[0]
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if times[self._physical(mid)] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, List[float]]:
+        """ samples with start <= timestamp < end, returns {field: [values]} """
+        with self._lock:
+            lo = 0 if start is None else self._bisect(start)
+            hi = self._size if end is None else self._bisect(end)
+            indexes = [self._physical(i) for i in range(lo, hi)]
+            return {name: [col[i] for i in indexes] for name, col in zip(self.fields, self._columns)}
+
+
+def _to_float(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return math.nan  # missing or NSNull
+
+
+def _timestamp(data: dict) -> float:
+    """ Performance samples have timestamp in milliseconds """
+    if "time" in data:
+        return float(data["time"])
+    ts = data.get("timestamp")
+    return ts / 1000.0 if isinstance(ts, (int, float)) else math.nan
+
+
+class PerfStore:
+    def __init__(self, capacity: int = 3600, metrics: Optional[typing.Iterable[DataType]] = None):
+        """
+        Args:
+            capacity: max samples kept per metric
+            metrics: default all metrics in METRIC_FIELDS
+        """
+        metrics = list(metrics) if metrics is not None else list(METRIC_FIELDS)
+        self._buffers = {
+            metric: RingBuffer(METRIC_FIELDS[metric], capacity)
+            for metric in metrics if metric in METRIC_FIELDS
+        }
+
+    @property
+    def metrics(self) -> List[DataType]:
+        return list(self._buffers)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+    def __len__(self) -> int:
+        return sum(len(buf) for buf in self._buffers.values())
+
+    def append(self, _type: DataType, data: dict):
+        """ same arguments as Performance callback, other metrics and samples without timestamp are ignored """
+        buf = self._buffers.get(_type)
+        if buf is None:
+            return
+        ts = _timestamp(data)
+        if _type == DataType.NETWORK:
+            data = data.get("connection-update")
+            if data is None:  # interface-detection, connection-detected
+                return
+        if math.isnan(ts):
+            return
+        buf.append([ts] + [_to_float(data.get(name)) for name in buf.fields[1:]])
+
+    def query(self, _type: DataType, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, List[float]]:
+        """
+        Args:
+            start, end: seconds since epoch, start <= timestamp < end
+
+        Returns:
+            {field: [values]}, missing values are nan
+        """
+        return self._buffers[_type].query(start, end)
+
+    def rows(self, _type: DataType, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[dict]:
+        columns = self.query(_type, start, end)
+        fields = list(columns)
+        for values in zip(*columns.values()):
+            yield dict(zip(fields, values))
+
+    def to_csv(self, fileobj: typing.TextIO, _type: DataType):
+        writer = csv.writer(fileobj)
+        writer.writerow(self._buffers[_type].fields)
+        for row in self.rows(_type):
+            writer.writerow(["" if math.isnan(v) else repr(v) for v in row.values()])
+
+    def to_jsonl(self, fileobj: typing.TextIO, metrics: Optional[typing.Iterable[DataType]] = None):
+        """ one json object per line with type, nan is written as null """
+        for _type in (metrics or self.metrics):
+            for row in self.rows(_type):
+                row = {k: None if math.isnan(v) else v for k, v in row.items()}
+                row["type"] = _type.value
+                fileobj.write(json.dumps(row) + "\n")
+
+    def to_parquet(self, path: str, _type: DataType):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("parquet export required lib, fix with: pip3 install pyarrow")
+        table = pyarrow.table(self.query(_type))
+        pyarrow.parquet.write_table(table, path)
+
+    def export(self, path: str) -> List[str]:
+        """ export by extension of path, returns files written
+
+        .jsonl: all metrics in one file
+        .csv, .parquet: one file per metric, eg: perf.cpu.csv
+        """
+        root, ext = os.path.splitext(path)
+        if ext == ".jsonl":
+            with open(path, "w", encoding="utf-8") as f:
+                self.to_jsonl(f)
+            return [path]
+        if ext not in (".csv", ".parquet"):
+            raise ValueError("unknown export format: {}".format(path))
+        paths = []
+        for _type in self.metrics:
+            if not len(self._buffers[_type]):
+                continue
+            mpath = "{}.{}{}".format(root, _type.value, ext)
+            if ext == ".csv":
+                with open(mpath, "w", encoding="utf-8", newline="") as f:
+                    self.to_csv(f, _type)
+            else:
+                self.to_parquet(mpath, _type)
+            paths.append(mpath)
+        return paths
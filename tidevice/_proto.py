@@ -5,7 +5,7 @@
 __all__ = [
     'Color', 'AFC_MAGIC', 'AFCMode', 'AFC', 'AFCStatus', 'AFCPacket', 'LOCKDOWN_PORT', 'PROGRAM_NAME',
     'SYSMON_PROC_ATTRS', 'SYSMON_SYS_ATTRS', 'MODELS', 'LockdownService',
-    "UsbmuxReplyCode", "InstrumentsService", "LOG", "StatResult", "UsbmuxMessageType", "ConnectionType"
+    "UsbmuxReplyCode", "InstrumentsService", "LOG", "StatResult", "RawStatResult", "UsbmuxMessageType", "ConnectionType"
 ]
 
 from dataclasses import dataclass
@@ -48,8 +48,8 @@ class Color(enum.Enum):
 SYSMON_PROC_ATTRS = [
     "memVirtualSize",  # vss
     "cpuUsage",
-    "ctxSwitch",  # the number of context switches by process each second
-    "intWakeups",  # the number of threads wakeups by process each second
+    "ctxSwitch",  # cumulative number of context switches by process, per second rate is computed from deltas
+    "intWakeups",  # cumulative number of thread wakeups by process, per second rate is computed from deltas
     "physFootprint",  # real memory (物理内存)
     "memResidentSize",  # rss
     "memAnon",  # anonymous memory
@@ -155,6 +155,7 @@ class AFCPacket(typing.NamedTuple):
     status: AFCStatus
     data: bytes # contains fd when open file, other time always empty
     payload: bytes
+    tag: int = 0 # same as the tag of request
 
 
 # See also: https://www.theiphonewiki.com/wiki/Models
@@ -359,6 +360,45 @@ class StatResult:
         return self.st_ifmt == "S_IFLNK"
 
 
+class RawStatResult:
+    """ compact StatResult, st_mtime and st_ctime are converted from nanoseconds when accessed """
+    __slots__ = ("st_name", "st_ifmt", "st_size", "st_blocks", "st_nlink",
+                 "st_mtime_ns", "st_birthtime_ns", "st_linktarget")
+
+    def __init__(self, st_name: str, st_ifmt: str, st_size: int, st_blocks: int, st_nlink: int,
+                 st_mtime_ns: int, st_birthtime_ns: int, st_linktarget: str = None):
+        self.st_name = st_name
+        self.st_ifmt = st_ifmt
+        self.st_size = st_size
+        self.st_blocks = st_blocks
+        self.st_nlink = st_nlink
+        self.st_mtime_ns = st_mtime_ns
+        self.st_birthtime_ns = st_birthtime_ns
+        self.st_linktarget = st_linktarget
+
+    @property
+    def st_mtime(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.st_mtime_ns / 1e9)
+
+    @property
+    def st_ctime(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.st_birthtime_ns / 1e9)
+
+    def is_dir(self) -> bool:
+        return self.st_ifmt == "S_IFDIR"
+
+    def is_link(self) -> bool:
+        return self.st_ifmt == "S_IFLNK"
+
+    def to_stat_result(self) -> StatResult:
+        return StatResult(self.st_name, self.st_ifmt, self.st_size, self.st_blocks, self.st_nlink,
+                          self.st_ctime, self.st_mtime, self.st_linktarget)
+
+    def __repr__(self):
+        return "RawStatResult(st_name={!r}, st_ifmt={!r}, st_size={})".format(
+            self.st_name, self.st_ifmt, self.st_size)
+
+
 
 class UsbmuxMessageType(enum.IntEnum):
     RESULT = 1
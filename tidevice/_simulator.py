@@ -0,0 +1,1264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 11:05:27
+
+A fake iPhone which speaks the usbmuxd protocol, used to run the whole
+stack (Usbmux -> lockdown -> services) offline in tests and benchmarks.
+
+Implemented:
+- usbmuxd: ListDevices, Listen, Connect, ReadPairRecord, ReadBUID
+- lockdownd: QueryType, GetValue, SetValue, StartSession(SSL), StopSession, StartService
+- com.apple.afc: backed by a local directory
+- com.apple.mobile.house_arrest: AFC on the app container directory
+- com.apple.crashreportmover, com.apple.crashreportcopymobile: AFC on crash_root
+- com.apple.mobile.installation_proxy: Browse, Lookup
+- instruments (DTX): deviceinfo, processcontrol, applictionListing,
+    sysmontap, graphics.opengl, networking, mobilenotifications
+- DTX services (instruments, testmanagerd): replay of recorded captures, see _dtxcapture.py
+
+Usage:
+    with DeviceSimulator(sysmontap_interval=.1) as sim:
+        d = Device(sim.udid, Usbmux(sim.address))
+        print(d.sync.listdir("/"))
+
+    # or as a standalone process
+    python3 -m tidevice._simulator --root /tmp/iphone
+"""
+
+import argparse
+import datetime
+import errno
+import hashlib
+import itertools
+import logging
+import os
+import plistlib
+import posixpath
+import queue
+import random
+import shutil
+import socket
+import ssl
+import stat
+import struct
+import tempfile
+import threading
+import time
+import typing
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from . import bplist
+from ._instruments import DTXMessageHeader, DTXPayload, DTXPayloadHeader
+from ._proto import (AFC, LOCKDOWN_PORT, SYSMON_PROC_ATTRS, AFCMode,
+                     AFCStatus, InstrumentsService, LockdownService,
+                     UsbmuxMessageType, UsbmuxReplyCode)
+from ._dtxcapture import DTXReplayServer, load_capture
+from ._sync import FHeader
+
+logger = logging.getLogger(__name__)
+
+_USBMUX_HEADER = struct.Struct("IIII")
+_PLIST_HEADER = struct.Struct(">I")
+
+# instruments services which only use SSL for the handshake
+_SSL_DIAL_ONLY_SERVICES = (
+    LockdownService.InstrumentsRemoteServer,
+    LockdownService.InstrumentsRemoteServerSecure,
+    LockdownService.TestmanagerdLockdown,
+    LockdownService.TestmanagerdLockdownSecure,
+)
+
+# mach_absolute_time on arm64 runs at 24MHz, timebase 125/3
+_MACH_TIMEBASE = (125, 3)
+
+
+class _ConnectionClosed(Exception):
+    pass
+
+
+def _recvall(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise _ConnectionClosed()
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv_plist(sock: socket.socket) -> dict:
+    (length, ) = _PLIST_HEADER.unpack(_recvall(sock, 4))
+    return plistlib.loads(_recvall(sock, length))
+
+
+def _send_plist(sock: socket.socket, payload: dict):
+    data = plistlib.dumps(payload)
+    sock.sendall(_PLIST_HEADER.pack(len(data)) + data)
+
+
+def _make_pair_record(udid: str, buid: str) -> dict:
+    """ pair record with a self signed certificate, empty certificate when pyOpenSSL not installed """
+    record = {
+        'HostID': str(uuid.uuid5(uuid.NAMESPACE_DNS, udid)).upper(),
+        'SystemBUID': buid,
+        'EscrowBag': b'',
+        'WiFiMACAddress': '00:00:00:00:00:00',
+    }
+    try:
+        from OpenSSL.crypto import FILETYPE_PEM, TYPE_RSA, PKey, dump_certificate, dump_privatekey
+        from ._ca import make_cert, make_req
+    except ImportError:
+        logger.info("pyOpenSSL not installed, simulator run without SSL")
+        cert_pem = key_pem = b''
+    else:
+        key = PKey()
+        key.generate_key(TYPE_RSA, 2048)
+        cert_pem = dump_certificate(FILETYPE_PEM, make_cert(make_req(key), key))
+        key_pem = dump_privatekey(FILETYPE_PEM, key)
+    record.update({
+        'HostCertificate': cert_pem,
+        'HostPrivateKey': key_pem,
+        'RootCertificate': cert_pem,
+        'DeviceCertificate': cert_pem,
+    })
+    return record
+
+
+class DeviceSimulator:
+    """ Simulated usbmuxd with a single device attached """
+
+    def __init__(self,
+                 address: Optional[str] = None,
+                 root: Optional[str] = None,
+                 udid: str = "00008030-0000000000000001",
+                 device_id: int = 1,
+                 product_version: str = "16.4",
+                 apps: Optional[List[dict]] = None,
+                 process_count: int = 100,
+                 sysmontap_interval: float = 1.0,
+                 opengl_interval: float = 1.0,
+                 network_interval: float = 1.0,
+                 use_ssl: bool = True,
+                 seed: int = 0,
+                 dtx_captures: Optional[Dict[str, typing.Union[str, List[str]]]] = None,
+                 replay_speed: float = 1.0,
+                 link_latency: float = 0.0):
+        """
+        Args:
+            address: unix socket path or host:port, default a unix socket in a temp dir (127.0.0.1:0 on windows)
+            root: directory served by com.apple.afc, default a temp dir
+            apps: installed apps (installation_proxy format), default two demo apps
+            process_count: number of daemons in the process list, apps not included
+            sysmontap_interval, opengl_interval, network_interval: seconds between samples
+            use_ssl: enable session and service SSL (require pyOpenSSL)
+            seed: seed of the random sample values
+            dtx_captures: service name -> capture file(s) replayed instead of the scripted service,
+                when a list is given, each connection takes the next one and the last one is reused
+            replay_speed: speed of the capture replay, 0 for as fast as possible
+            link_latency: seconds added to every AFC response, like the round trip over USB
+        """
+        self._workdir = tempfile.mkdtemp(prefix="tidevice-sim-")
+        if address is None:
+            if hasattr(socket, "AF_UNIX") and os.name != "nt":
+                address = os.path.join(self._workdir, "usbmuxd")
+            else:
+                address = "127.0.0.1:0"
+        self._address = address
+        self.root = root or os.path.join(self._workdir, "Media")
+        os.makedirs(self.root, exist_ok=True)
+        self.containers_root = os.path.join(self._workdir, "Containers")
+        self.crash_root = os.path.join(self._workdir, "CrashReports")
+        os.makedirs(self.crash_root, exist_ok=True)
+
+        self.udid = udid
+        self.device_id = device_id
+        self.buid = str(uuid.uuid5(uuid.NAMESPACE_DNS, "buid." + udid)).upper()
+        self.sysmontap_interval = sysmontap_interval
+        self.opengl_interval = opengl_interval
+        self.network_interval = network_interval
+        self.network_bytes = {"rx": 0, "tx": 0}  # sent by all connections, cumulative counts are sent
+        self.random = random.Random(seed)
+        self._dtx_captures = {}
+        for service_name, captures in (dtx_captures or {}).items():
+            if isinstance(captures, str):
+                captures = [captures]
+            self._dtx_captures[service_name] = [load_capture(c) for c in captures]
+        self.replay_speed = replay_speed
+        self.link_latency = link_latency
+
+        self.values = {
+            'ActivationState': 'Activated',
+            'BuildVersion': '20E247',
+            'CPUArchitecture': 'arm64e',
+            'DeviceClass': 'iPhone',
+            'DeviceName': 'Simulated iPhone',
+            'HardwareModel': 'D79AP',
+            'ProductName': 'iPhone OS',
+            'ProductType': 'iPhone14,6',
+            'ProductVersion': product_version,
+            'SerialNumber': 'F17XSIMULATED',
+            'UniqueDeviceID': udid,
+            'WiFiAddress': '00:00:00:00:00:00',
+        }
+        self.domain_values = {
+            'com.apple.disk_usage': {
+                'TotalDiskCapacity': 64000000000,
+                'TotalDataCapacity': 50000000000,
+                'TotalDataAvailable': 20000000000,
+                'AmountDataAvailable': 20000000000,
+            },
+            'com.apple.mobile.battery': {
+                'BatteryCurrentCapacity': 87,
+                'BatteryIsCharging': False,
+                'ExternalConnected': True,
+                'FullyCharged': False,
+            },
+            'com.apple.mobile.iTunes': {
+                'ScreenWidth': 1170,
+                'ScreenHeight': 2532,
+                'ScreenScaleFactor': 3.0,
+            },
+        }
+
+        self.pair_record = _make_pair_record(udid, self.buid)
+        self._ssl_context = None
+        if use_ssl and self.pair_record['HostCertificate']:
+            self._ssl_context = self._create_ssl_context()
+
+        self.apps = {}
+        for info in (apps if apps is not None else self._default_apps()):
+            self.apps[info['CFBundleIdentifier']] = info
+
+        self._lock = threading.RLock()
+        self._boot_time = time.monotonic()
+        self._next_pid = itertools.count(100)
+        self._processes: Dict[int, dict] = {}
+        self._app_pids: Dict[str, int] = {}
+        self._app_state_listeners: List[Callable[[dict], None]] = []
+        self._add_process("launchd", "/sbin/launchd", pid=1)
+        for i in range(process_count):
+            self._add_process(f"daemon{i}", f"/usr/libexec/daemon{i}")
+
+        self._ports: Dict[int, str] = {}
+        self._port_counter = itertools.cycle(range(49152, 65535))
+        self._listener: Optional[socket.socket] = None
+        self._clients = set()
+        self._stopped = threading.Event()
+
+    def _default_apps(self) -> List[dict]:
+        apps = []
+        for (bundle_id, name, app_type) in [
+                ("com.apple.Preferences", "Preferences", "System"),
+                ("com.example.demo", "Demo", "User")]:
+            bundle_uuid = str(uuid.uuid5(uuid.NAMESPACE_DNS, bundle_id)).upper()
+            container_uuid = str(uuid.uuid5(uuid.NAMESPACE_URL, bundle_id)).upper()
+            apps.append({
+                'ApplicationType': app_type,
+                'CFBundleDisplayName': name,
+                'CFBundleExecutable': name,
+                'CFBundleIdentifier': bundle_id,
+                'CFBundleName': name,
+                'CFBundleShortVersionString': '1.0',
+                'CFBundleVersion': '1',
+                'Container': f'/private/var/mobile/Containers/Data/Application/{container_uuid}',
+                'Path': f'/private/var/containers/Bundle/Application/{bundle_uuid}/{name}.app',
+                'SequenceNumber': len(apps) + 1,
+            })
+        return apps
+
+    def _create_ssl_context(self) -> ssl.SSLContext:
+        pemfile = os.path.join(self._workdir, "device.pem")
+        with open(pemfile, "wb") as f:
+            f.write(self.pair_record['HostPrivateKey'])
+            f.write(b"\n")
+            f.write(self.pair_record['HostCertificate'])
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        # TLS 1.3 sends session tickets after the handshake, which breaks
+        # services that drop back to plain text right after the handshake
+        context.maximum_version = ssl.TLSVersion.TLSv1_2
+        try:
+            context.set_ciphers("ALL:@SECLEVEL=0")
+        except ssl.SSLError:
+            pass
+        context.load_cert_chain(pemfile)
+        return context
+
+    @property
+    def address(self) -> str:
+        """ address for Usbmux(address) """
+        if isinstance(self._address, str):
+            return self._address
+        host, port = self._address
+        return f"{host}:{port}"
+
+    def start(self):
+        if isinstance(self._address, str) and ':' not in self._address:
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(self._address)
+        else:
+            host, port = self._address.rsplit(":", 1)
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((host, int(port)))
+            self._address = listener.getsockname()
+        listener.listen(64)
+        self._listener = listener
+        self._stopped.clear()
+        threading.Thread(name="simulator-usbmuxd", target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._listener:
+            self._listener.close()
+            self._listener = None
+        with self._lock:
+            clients = list(self._clients)
+        for sock in clients:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        shutil.rmtree(self._workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def mach_absolute_time(self) -> int:
+        ns = int((time.monotonic() - self._boot_time) * 1e9)
+        numer, denom = _MACH_TIMEBASE
+        return ns * denom // numer
+
+    # ---- process table ----
+
+    def _add_process(self, name: str, exe_path: str, pid: Optional[int] = None, is_application: bool = False) -> dict:
+        with self._lock:
+            if pid is None:
+                pid = next(self._next_pid)
+            proc = {
+                'isApplication': is_application,
+                'name': name,
+                'pid': pid,
+                'realAppName': exe_path,
+                'startDate': datetime.datetime.now(),
+            }
+            self._processes[pid] = proc
+            return proc
+
+    def running_processes(self) -> List[dict]:
+        with self._lock:
+            return [p.copy() for p in self._processes.values()]
+
+    def get_process(self, pid: int) -> Optional[dict]:
+        with self._lock:
+            return self._processes.get(pid)
+
+    def launch_app(self, bundle_id: str) -> int:
+        """ returns pid, raise KeyError when app not installed """
+        info = self.apps[bundle_id]
+        self.kill_app(bundle_id)
+        exe_path = info['Path'][len("/private"):] + "/" + info['CFBundleExecutable']
+        proc = self._add_process(info['CFBundleExecutable'], exe_path, is_application=True)
+        with self._lock:
+            self._app_pids[bundle_id] = proc['pid']
+        self._notify_app_state(bundle_id, proc, 8, "Foreground Running")
+        return proc['pid']
+
+    def kill_pid(self, pid: int):
+        with self._lock:
+            proc = self._processes.pop(pid, None)
+            bundle_id = None
+            for bid, apid in list(self._app_pids.items()):
+                if apid == pid:
+                    bundle_id = bid
+                    del self._app_pids[bid]
+        if proc and bundle_id:
+            self._notify_app_state(bundle_id, proc, 1, "Terminated")
+
+    def kill_app(self, bundle_id: str):
+        pid = self._app_pids.get(bundle_id)
+        if pid:
+            self.kill_pid(pid)
+
+    def app_pid(self, bundle_id: str) -> Optional[int]:
+        return self._app_pids.get(bundle_id)
+
+    def add_app_state_listener(self, func: Callable[[dict], None]):
+        with self._lock:
+            self._app_state_listeners.append(func)
+
+    def remove_app_state_listener(self, func: Callable[[dict], None]):
+        with self._lock:
+            if func in self._app_state_listeners:
+                self._app_state_listeners.remove(func)
+
+    def _notify_app_state(self, bundle_id: str, proc: dict, state: int, description: str):
+        info = {
+            'appName': bundle_id,
+            'displayID': bundle_id,
+            'elevated_state': state,
+            'elevated_state_description': description,
+            'execName': proc['name'],
+            'mach_absolute_time': self.mach_absolute_time(),
+            'pid': proc['pid'],
+            'state': state,
+            'state_description': description,
+            'timestamp': datetime.datetime.now(),
+        }
+        with self._lock:
+            listeners = list(self._app_state_listeners)
+        for func in listeners:
+            func(info)
+
+    # ---- usbmuxd ----
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                break
+            threading.Thread(name="simulator-client", target=self._handle_client, args=(sock,), daemon=True).start()
+
+    def _handle_client(self, sock: socket.socket):
+        with self._lock:
+            self._clients.add(sock)
+        try:
+            self._serve_usbmux(sock)
+        except (_ConnectionClosed, OSError):
+            pass
+        except Exception:
+            if not self._stopped.is_set():
+                logger.exception("simulator connection error")
+        finally:
+            with self._lock:
+                self._clients.discard(sock)
+            sock.close()
+
+    def _device_properties(self) -> dict:
+        return {
+            'ConnectionSpeed': 480000000,
+            'ConnectionType': 'USB',
+            'DeviceID': self.device_id,
+            'LocationID': 0,
+            'ProductID': 4776,
+            'SerialNumber': self.udid,
+            'UDID': self.udid,
+            'USBSerialNumber': self.udid,
+        }
+
+    def _attached_message(self) -> dict:
+        return {
+            'DeviceID': self.device_id,
+            'MessageType': 'Attached',
+            'Properties': self._device_properties(),
+        }
+
+    def _send_usbmux(self, sock: socket.socket, payload: dict, tag: int = 0):
+        data = plistlib.dumps(payload)
+        sock.sendall(_USBMUX_HEADER.pack(16 + len(data), 1, UsbmuxMessageType.PLIST, tag) + data)
+
+    def _send_result(self, sock: socket.socket, number: int, tag: int = 0):
+        self._send_usbmux(sock, {'MessageType': 'Result', 'Number': int(number)}, tag)
+
+    def _serve_usbmux(self, sock: socket.socket):
+        while True:
+            (length, _version, _mtype, tag) = _USBMUX_HEADER.unpack(_recvall(sock, 16))
+            request = plistlib.loads(_recvall(sock, length - 16))
+            message_type = request.get('MessageType')
+            if message_type == 'ListDevices':
+                self._send_usbmux(sock, {'DeviceList': [self._attached_message()]}, tag)
+            elif message_type == 'Listen':
+                self._send_result(sock, UsbmuxReplyCode.OK, tag)
+                self._send_usbmux(sock, self._attached_message())
+                while sock.recv(1024):  # wait until client disconnect
+                    pass
+                return
+            elif message_type == 'ReadBUID':
+                self._send_usbmux(sock, {'BUID': self.buid}, tag)
+            elif message_type == 'ReadPairRecord':
+                if request.get('PairRecordID') != self.udid:
+                    self._send_result(sock, UsbmuxReplyCode.BadDevice, tag)
+                else:
+                    data = plistlib.dumps(self.pair_record, fmt=plistlib.FMT_BINARY)
+                    self._send_usbmux(sock, {'PairRecordData': data}, tag)
+            elif message_type in ('SavePairRecord', 'DeletePairRecord'):
+                self._send_result(sock, UsbmuxReplyCode.OK, tag)
+            elif message_type == 'Connect':
+                if request.get('DeviceID') != self.device_id:
+                    self._send_result(sock, UsbmuxReplyCode.BadDevice, tag)
+                    continue
+                port = socket.ntohs(request['PortNumber'])
+                if port == LOCKDOWN_PORT:
+                    self._send_result(sock, UsbmuxReplyCode.OK, tag)
+                    self._serve_lockdown(sock)
+                    return
+                with self._lock:
+                    service_name = self._ports.pop(port, None)
+                if service_name is None:
+                    self._send_result(sock, UsbmuxReplyCode.ConnectionRefused, tag)
+                    continue
+                self._send_result(sock, UsbmuxReplyCode.OK, tag)
+                self._serve_service(sock, service_name)
+                return
+            else:
+                self._send_result(sock, UsbmuxReplyCode.BadCommand, tag)
+
+    # ---- lockdownd ----
+
+    def get_value(self, key: Optional[str], domain: Optional[str]) -> Any:
+        values = self.domain_values.get(domain, {}) if domain else self.values
+        if key:
+            return values.get(key)
+        return values
+
+    def _serve_lockdown(self, sock: socket.socket):
+        conn = sock
+        while True:
+            request = _recv_plist(conn)
+            name = request.get('Request')
+            reply = {'Request': name}
+            if name == 'QueryType':
+                reply['Type'] = LockdownService.MobileLockdown.value
+            elif name == 'GetValue':
+                value = self.get_value(request.get('Key'), request.get('Domain'))
+                if value is None:
+                    reply['Error'] = 'MissingValue'
+                else:
+                    if request.get('Key'):
+                        reply['Key'] = request['Key']
+                    reply['Value'] = value
+            elif name == 'SetValue':
+                domain = request.get('Domain')
+                values = self.domain_values.setdefault(domain, {}) if domain else self.values
+                values[request['Key']] = request['Value']
+            elif name == 'StartSession':
+                if request.get('HostID') != self.pair_record['HostID']:
+                    reply['Error'] = 'InvalidHostID'
+                    _send_plist(conn, reply)
+                    continue
+                reply['SessionID'] = str(uuid.uuid4()).upper()
+                reply['EnableSessionSSL'] = self._ssl_context is not None
+                _send_plist(conn, reply)
+                if self._ssl_context:
+                    conn = self._ssl_context.wrap_socket(conn, server_side=True)
+                continue
+            elif name == 'StopSession':
+                pass
+            elif name == 'StartService':
+                service_name = request.get('Service')
+                if not self._has_service(service_name):
+                    reply['Error'] = 'InvalidService'
+                else:
+                    reply['Service'] = service_name
+                    reply['Port'] = self._allocate_port(service_name)
+                    reply['EnableServiceSSL'] = self._ssl_context is not None
+            else:
+                reply['Error'] = 'UnknownRequest'
+            _send_plist(conn, reply)
+
+    def _allocate_port(self, service_name: str) -> int:
+        with self._lock:
+            port = next(self._port_counter)
+            while port in self._ports:
+                port = next(self._port_counter)
+            self._ports[port] = service_name
+            return port
+
+    # ---- services ----
+
+    def _has_service(self, name: str) -> bool:
+        return name in (LockdownService.AFC,
+                        LockdownService.MobileHouseArrest,
+                        LockdownService.InstallationProxy,
+                        LockdownService.CRASH_REPORT_MOVER_SERVICE,
+                        LockdownService.CRASH_REPORT_COPY_MOBILE_SERVICE) \
+            or name in _SSL_DIAL_ONLY_SERVICES
+
+    def _serve_service(self, sock: socket.socket, name: str):
+        conn = sock
+        if self._ssl_context:
+            if name in _SSL_DIAL_ONLY_SERVICES:
+                raw = sock.dup()
+                self._ssl_context.wrap_socket(sock, server_side=True).close()
+                with self._lock:
+                    self._clients.add(raw)
+                conn = raw
+            else:
+                conn = self._ssl_context.wrap_socket(sock, server_side=True)
+
+        try:
+            if name in self._dtx_captures:
+                DTXReplayServer(self._next_capture(name), speed=self.replay_speed).serve(conn)
+            elif name == LockdownService.AFC:
+                AFCServer(conn, self.root, self.link_latency).serve()
+            elif name == LockdownService.MobileHouseArrest:
+                self._serve_house_arrest(conn)
+            elif name == LockdownService.CRASH_REPORT_MOVER_SERVICE:
+                conn.sendall(b'ping\x00')
+            elif name == LockdownService.CRASH_REPORT_COPY_MOBILE_SERVICE:
+                AFCServer(conn, self.crash_root, self.link_latency).serve()
+            elif name == LockdownService.InstallationProxy:
+                self._serve_installation_proxy(conn)
+            elif name in (LockdownService.InstrumentsRemoteServer,
+                          LockdownService.InstrumentsRemoteServerSecure):
+                InstrumentsServer(conn, self).serve()
+        finally:
+            if conn is not sock:
+                with self._lock:
+                    self._clients.discard(conn)
+                conn.close()
+
+    def _next_capture(self, name: str) -> list:
+        with self._lock:
+            captures = self._dtx_captures[name]
+            return captures.pop(0) if len(captures) > 1 else captures[0]
+
+    def app_container(self, bundle_id: str) -> str:
+        """ local directory of the app data container """
+        path = os.path.join(self.containers_root, bundle_id)
+        os.makedirs(os.path.join(path, "Documents"), exist_ok=True)
+        return path
+
+    def _serve_house_arrest(self, conn: socket.socket):
+        request = _recv_plist(conn)
+        bundle_id = request.get('Identifier')
+        if bundle_id not in self.apps:
+            _send_plist(conn, {'Error': 'ApplicationLookupFailed'})
+            return
+        _send_plist(conn, {'Status': 'Complete'})
+        AFCServer(conn, self.app_container(bundle_id), self.link_latency).serve()
+
+    def _select_attrs(self, info: dict, attrs: Optional[list]) -> dict:
+        if not attrs:
+            return info.copy()
+        return {k: info[k] for k in attrs if k in info}
+
+    def _serve_installation_proxy(self, conn: socket.socket):
+        page_size = 20
+        while True:
+            request = _recv_plist(conn)
+            command = request.get('Command')
+            options = request.get('ClientOptions') or {}
+            attrs = options.get('ReturnAttributes')
+            if command == 'Browse':
+                app_type = options.get('ApplicationType')
+                infos = [
+                    self._select_attrs(info, attrs) for info in self.apps.values()
+                    if app_type in (None, 'Any') or info.get('ApplicationType') == app_type
+                ]
+                for index in range(0, len(infos), page_size):
+                    page = infos[index:index + page_size]
+                    _send_plist(conn, {
+                        'Status': 'BrowsingApplications',
+                        'CurrentAmount': len(page),
+                        'CurrentIndex': index,
+                        'CurrentList': page,
+                        'Total': len(infos),
+                    })
+                _send_plist(conn, {'Status': 'Complete'})
+            elif command == 'Lookup':
+                result = {}
+                for bundle_id in options.get('BundleIDs') or list(self.apps):
+                    if bundle_id in self.apps:
+                        result[bundle_id] = self._select_attrs(self.apps[bundle_id], attrs)
+                _send_plist(conn, {'Status': 'Complete', 'LookupResult': result})
+            else:
+                _send_plist(conn, {'Error': 'UnknownCommand'})
+
+
+class AFCServer:
+    """ AFC protocol served from a local directory """
+
+    _OPEN_MODES = {
+        AFCMode.O_RDONLY: "rb",
+        AFCMode.O_RW: "r+b",
+        AFCMode.O_WRONLY: "wb",
+        AFCMode.O_WR: "w+b",
+        AFCMode.O_APPEND: "ab",
+        AFCMode.O_RDAPPEND: "a+b",
+    }
+
+    def __init__(self, conn: socket.socket, root: str, latency: float = 0.0):
+        self._conn = conn
+        self._root = root
+        self._latency = latency
+        self._delayed = queue.Queue()
+        self._fds: Dict[int, typing.BinaryIO] = {}
+        self._next_fd = itertools.count(1)
+
+    def serve(self):
+        if self._latency > 0:
+            threading.Thread(name="simulator-afc-link", target=self._delayed_sender, daemon=True).start()
+        try:
+            while True:
+                header = FHeader.parse(_recvall(self._conn, FHeader.size))
+                body = _recvall(self._conn, header.length - FHeader.size)
+                data = body[:header.this_len - FHeader.size]
+                payload = body[header.this_len - FHeader.size:]
+                self._handle(header.tag, header.operation, data, payload)
+        finally:
+            self._delayed.put(None)
+            for f in self._fds.values():
+                f.close()
+
+    def _delayed_sender(self):
+        """ responses are delayed but not serialized, requests in flight overlap """
+        for due, data in iter(self._delayed.get, None):
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self._conn.sendall(data)
+            except OSError:
+                break
+
+    def _local_path(self, path: typing.Union[str, bytes]) -> str:
+        if isinstance(path, bytes):
+            path = path.rstrip(b"\x00").decode("utf-8")
+        path = posixpath.normpath("/" + path)
+        return os.path.join(self._root, *[p for p in path.split("/") if p])
+
+    def _send(self, tag: int, op: AFC, data: bytes = b'', payload: bytes = b''):
+        header = FHeader.build(length=FHeader.size + len(data) + len(payload),
+                               this_len=FHeader.size + len(data),
+                               tag=tag,
+                               operation=op)
+        if self._latency > 0:
+            self._delayed.put((time.monotonic() + self._latency, bytes(header) + data + payload))
+        else:
+            self._conn.sendall(bytes(header) + data + payload)
+
+    def _send_status(self, tag: int, status: AFCStatus):
+        self._send(tag, AFC.OP_STATUS, struct.pack("<Q", status))
+
+    def _error_status(self, e: OSError) -> AFCStatus:
+        if isinstance(e, FileNotFoundError):
+            return AFCStatus.ST_OBJECT_NOT_FOUND
+        if isinstance(e, IsADirectoryError):
+            return AFCStatus.ST_OBJECT_IS_DIR
+        if isinstance(e, PermissionError):
+            return AFCStatus.ST_PERM_DENIED
+        if isinstance(e, FileExistsError):
+            return AFCStatus.ST_OBJECT_EXISTS
+        if e.errno == errno.ENOTEMPTY:
+            return AFCStatus.ST_DIR_NOT_EMPTY
+        return AFCStatus.ST_IO_ERROR
+
+    def _pack_dict(self, values: dict) -> bytes:
+        buf = bytearray()
+        for k, v in values.items():
+            buf.extend(str(k).encode('utf-8') + b"\x00")
+            buf.extend(str(v).encode('utf-8') + b"\x00")
+        return bytes(buf)
+
+    def _file_info(self, lpath: str) -> dict:
+        st = os.lstat(lpath)
+        if stat.S_ISDIR(st.st_mode):
+            ifmt = "S_IFDIR"
+        elif stat.S_ISLNK(st.st_mode):
+            ifmt = "S_IFLNK"
+        else:
+            ifmt = "S_IFREG"
+        birthtime = getattr(st, "st_birthtime", st.st_ctime)
+        info = {
+            'st_size': st.st_size,
+            'st_blocks': getattr(st, "st_blocks", (st.st_size + 511) // 512),
+            'st_nlink': st.st_nlink,
+            'st_ifmt': ifmt,
+            'st_mtime': st.st_mtime_ns,
+            'st_birthtime': int(birthtime * 1e9),
+        }
+        if ifmt == "S_IFLNK":
+            info['LinkTarget'] = os.readlink(lpath)
+        return info
+
+    def _handle(self, tag: int, op: int, data: bytes, payload: bytes):
+        try:
+            self._dispatch(tag, op, data, payload)
+        except OSError as e:
+            self._send_status(tag, self._error_status(e))
+
+    def _dispatch(self, tag: int, op: int, data: bytes, payload: bytes):
+        if op == AFC.OP_GET_FILE_INFO:
+            info = self._file_info(self._local_path(data))
+            self._send(tag, AFC.OP_DATA, payload=self._pack_dict(info))
+        elif op == AFC.OP_READ_DIR:
+            names = ['.', '..'] + sorted(os.listdir(self._local_path(data)))
+            self._send(tag, AFC.OP_DATA, payload=b"".join(n.encode('utf-8') + b"\x00" for n in names))
+        elif op == AFC.OP_MAKE_DIR:
+            os.makedirs(self._local_path(data), exist_ok=True)
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+        elif op == AFC.OP_REMOVE_PATH:
+            lpath = self._local_path(data)
+            if os.path.isdir(lpath) and not os.path.islink(lpath):
+                if os.listdir(lpath):
+                    self._send_status(tag, AFCStatus.ST_DIR_NOT_EMPTY)
+                    return
+                os.rmdir(lpath)
+            else:
+                os.remove(lpath)
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+        elif op == AFC.OP_RENAME_PATH:
+            src, dst = data.split(b"\x00")[:2]
+            os.rename(self._local_path(src), self._local_path(dst))
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+        elif op == AFC.OP_MAKE_LINK:
+            (link_type, ) = struct.unpack("<Q", data[:8])
+            target, name = data[8:].split(b"\x00")[:2]
+            if link_type == AFC.SYMLINK:
+                os.symlink(target.decode('utf-8'), self._local_path(name))
+            else:
+                os.link(self._local_path(target), self._local_path(name))
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+        elif op == AFC.OP_SET_FILE_TIME:
+            (mtime_ns, ) = struct.unpack("<Q", data[:8])
+            os.utime(self._local_path(data[8:]), ns=(mtime_ns, mtime_ns))
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+        elif op == AFC.OP_GET_FILE_HASH_RANGE:
+            (start, end) = struct.unpack("<QQ", data[:16])
+            with open(self._local_path(data[16:]), "rb") as f:
+                f.seek(start)
+                digest = hashlib.sha1(f.read(max(0, end - start))).digest()
+            self._send(tag, AFC.OP_DATA, payload=digest)
+        elif op == AFC.OP_FILE_OPEN:
+            (mode, ) = struct.unpack("<Q", data[:8])
+            lpath = self._local_path(data[8:])
+            if mode == AFCMode.O_RW and not os.path.exists(lpath):
+                open(lpath, "wb").close()
+            f = open(lpath, self._OPEN_MODES.get(mode, "rb"))
+            fd = next(self._next_fd)
+            self._fds[fd] = f
+            self._send(tag, AFC.OP_FILE_OPEN_RES, struct.pack("<Q", fd))
+        elif op in (AFC.OP_READ, AFC.OP_WRITE, AFC.OP_FILE_SEEK, AFC.OP_FILE_TELL,
+                    AFC.OP_FILE_SET_SIZE, AFC.OP_FILE_CLOSE):
+            (fd, ) = struct.unpack("<Q", data[:8])
+            f = self._fds.get(fd)
+            if f is None:
+                self._send_status(tag, AFCStatus.ST_INVALID_ARG)
+            else:
+                self._dispatch_fd(tag, op, fd, f, data, payload)
+        elif op == AFC.OP_GET_DEVINFO:
+            usage = shutil.disk_usage(self._root)
+            self._send(tag, AFC.OP_DATA, payload=self._pack_dict({
+                'Model': 'iPhone14,6',
+                'FSTotalBytes': usage.total,
+                'FSFreeBytes': usage.free,
+                'FSBlockSize': 4096,
+            }))
+        else:
+            self._send_status(tag, AFCStatus.ST_OP_NOT_SUPPORTED)
+
+    def _dispatch_fd(self, tag: int, op: int, fd: int, f: typing.BinaryIO, data: bytes, payload: bytes):
+        if op == AFC.OP_READ:
+            (size, ) = struct.unpack("<Q", data[8:16])
+            self._send(tag, AFC.OP_DATA, payload=f.read(size))
+        elif op == AFC.OP_WRITE:
+            f.write(payload)
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+        elif op == AFC.OP_FILE_SEEK:
+            (whence, offset) = struct.unpack("<Qq", data[8:24])
+            f.seek(offset, whence)
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+        elif op == AFC.OP_FILE_TELL:
+            self._send(tag, AFC.OP_FILE_TELL_RES, struct.pack("<Q", f.tell()))
+        elif op == AFC.OP_FILE_SET_SIZE:
+            (size, ) = struct.unpack("<Q", data[8:16])
+            f.truncate(size)
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+        elif op == AFC.OP_FILE_CLOSE:
+            self._fds.pop(fd).close()
+            self._send_status(tag, AFCStatus.ST_SUCCESS)
+
+
+class _Channel:
+    """ instruments service, method do_<selector> is called for each message """
+
+    def __init__(self, server: "InstrumentsServer", code: int):
+        self._server = server
+        self._sim = server.sim
+        self.code = code
+        self._stop_event = threading.Event()
+
+    @property
+    def notification_channel(self) -> int:
+        return (1 << 32) - self.code
+
+    def call(self, selector: str, args: list) -> Any:
+        func = getattr(self, "do_" + selector.split(":", 1)[0], None)
+        if func is None:
+            logger.debug("simulator: unhandled selector %s", selector)
+            return None
+        return func(*args)
+
+    def start_sampling(self, interval: float, func: Callable[[], None]):
+        self._stop_event.clear()
+
+        def _loop():
+            while not self._stop_event.wait(interval):
+                try:
+                    func()
+                except OSError:
+                    break
+        threading.Thread(name="simulator-sampler", target=_loop, daemon=True).start()
+
+    def cancel(self):
+        self._stop_event.set()
+
+
+class _DeviceInfoChannel(_Channel):
+    def do_runningProcesses(self):
+        return self._sim.running_processes()
+
+    def do_isRunningPid(self, pid: int):
+        return self._sim.get_process(pid) is not None
+
+    def do_execnameForPid(self, pid: int):
+        proc = self._sim.get_process(pid)
+        return proc['realAppName'] if proc else None
+
+    def do_machTimeInfo(self):
+        numer, denom = _MACH_TIMEBASE
+        return [self._sim.mach_absolute_time(), numer, denom]
+
+    def do_systemInformation(self):
+        values = self._sim.values
+        return {
+            '_deviceDescription': 'Build Version {}, iPhone ID {}'.format(values['BuildVersion'], self._sim.udid),
+            '_deviceDisplayName': '{} (v{})'.format(values['DeviceName'], values['ProductVersion']),
+            '_deviceIdentifier': self._sim.udid,
+            '_deviceVersion': values['BuildVersion'],
+            '_productType': values['ProductType'],
+            '_productVersion': values['ProductVersion'],
+            '_xrdeviceClassName': 'XRMobileDevice',
+        }
+
+    def do_hardwareInformation(self):
+        return {
+            'numberOfPhysicalCpus': 6,
+            'hwCPUsubtype': 2,
+            'numberOfCpus': 6,
+            'speedOfCpus': 0,
+            'hwCPUtype': 16777228,
+            'hwCPU64BitCapable': 1,
+        }
+
+    def do_networkInformation(self):
+        return {'en0': 'Wi-Fi', 'lo0': 'Loopback', 'pdp_ip0': 'Cellular (pdp_ip0)'}
+
+
+class _ProcessControlChannel(_Channel):
+    def do_launchSuspendedProcessWithDevicePath(self, path, bundle_id, env=None, args=None, options=None):
+        if bundle_id not in self._sim.apps:
+            return 'The operation couldn\'t be completed. Application info provider returned nil for "{}"'.format(bundle_id)
+        return self._sim.launch_app(bundle_id)
+
+    def do_killPid(self, pid: int):
+        self._sim.kill_pid(pid)
+
+    def do_processIdentifierForBundleIdentifier(self, bundle_id: str):
+        return self._sim.app_pid(bundle_id) or 0
+
+    def do_startObservingPid(self, pid: int):
+        return None
+
+
+class _AppListingChannel(_Channel):
+    def do_installedApplicationsMatching(self, matching=None, token=None):
+        return [{
+            'BundlePath': info.get('Path', ''),
+            'CFBundleIdentifier': info['CFBundleIdentifier'],
+            'DisplayName': info.get('CFBundleDisplayName', ''),
+            'ExecutableName': info.get('CFBundleExecutable', ''),
+            'Restricted': 0,
+            'Type': info.get('ApplicationType', 'User'),
+            'Version': info.get('CFBundleShortVersionString', ''),
+        } for info in self._sim.apps.values()]
+
+
+class _SysmontapChannel(_Channel):
+    def __init__(self, server, code):
+        super().__init__(server, code)
+        self._config = {"procAttrs": SYSMON_PROC_ATTRS, "cpuUsage": True}
+        self._last_mach_time = self._sim.mach_absolute_time()
+        self._counters: Dict[int, List[int]] = {}  # pid: [ctxSwitch, intWakeups], cumulative
+
+    def do_setConfig(self, config: dict):
+        self._config.update(config)
+
+    def do_start(self):
+        self.start_sampling(self._sim.sysmontap_interval, self.emit)
+
+    def do_stop(self):
+        self.cancel()
+
+    def _proc_attrs(self, proc: dict, rng: random.Random) -> list:
+        base = proc['pid'] << 10
+        heavy = proc['isApplication']
+        counters = self._counters.setdefault(proc['pid'], [0, 0])
+        counters[0] += rng.randint(0, 5000)
+        counters[1] += rng.randint(0, 500)
+        values = {
+            'memVirtualSize': 400000000000 + base,
+            'cpuUsage': rng.uniform(5.0, 40.0) if heavy else rng.uniform(0.0, 0.5),
+            'ctxSwitch': counters[0],
+            'intWakeups': counters[1],
+            'physFootprint': (120 << 20 if heavy else 4 << 20) + rng.randint(0, 1 << 20),
+            'memResidentSize': (150 << 20 if heavy else 6 << 20) + base,
+            'memAnon': (60 << 20 if heavy else 2 << 20) + base,
+            'pid': proc['pid'],
+        }
+        return [values.get(name, 0) for name in self._config['procAttrs']]
+
+    def emit(self):
+        rng = self._sim.random
+        start, end = self._last_mach_time, self._sim.mach_absolute_time()
+        self._last_mach_time = end
+        total_load = rng.uniform(10.0, 60.0)
+        system = {
+            'CPUCount': 6,
+            'EnabledCPUs': 6,
+            'EndMachAbsTime': end,
+            'PerCPUUsage': [{
+                'CPU_NiceLoad': 0.0,
+                'CPU_SystemLoad': -1.0,
+                'CPU_TotalLoad': total_load,
+                'CPU_UserLoad': -1.0
+            } for _ in range(6)],
+            'StartMachAbsTime': start,
+            'SystemCPUUsage': {
+                'CPU_NiceLoad': 0.0,
+                'CPU_SystemLoad': -1.0,
+                'CPU_TotalLoad': total_load,
+                'CPU_UserLoad': -1.0
+            },
+            'Type': 33,
+        }
+        processes = {
+            'EndMachAbsTime': end,
+            'Processes': {p['pid']: self._proc_attrs(p, rng) for p in self._sim.running_processes()},
+            'StartMachAbsTime': start,
+            'Type': 7,
+        }
+        for pid in set(self._counters) - set(processes['Processes']):
+            del self._counters[pid]
+        self._server.send_object(self.notification_channel, [system, processes])
+
+
+class _OpenGLChannel(_Channel):
+    def do_startSamplingAtTimeInterval(self, interval=0):
+        self._begin = time.monotonic()
+        self.start_sampling(self._sim.opengl_interval, self.emit)
+
+    def do_stopSampling(self):
+        self.cancel()
+
+    def emit(self):
+        rng = self._sim.random
+        utilization = rng.randint(0, 60)
+        data = {
+            'CommandBufferRenderCount': rng.randint(0, 100),
+            'CoreAnimationFramesPerSecond': rng.choice([58, 59, 60, 60, 60]),
+            'Device Utilization %': utilization,
+            'IOGLBundleName': 'Built-In',
+            'Renderer Utilization %': utilization,
+            'SplitSceneCount': 0,
+            'TiledSceneBytes': 0,
+            'Tiler Utilization %': max(0, utilization - 5),
+            'XRVideoCardRunTimeStamp': int((time.monotonic() - self._begin) * 1e6),
+            'gartUsedBytes': 30965760,
+            'recoveryCount': 0,
+            'textureCount': 1382,
+        }
+        # opengl samples are sent as requests which expect a reply
+        self._server.send_object(self.notification_channel, data, expects_reply=True)
+
+
+class _NetworkingChannel(_Channel):
+    def do_replayLastRecordedSession(self):
+        return None
+
+    def do_startMonitoring(self):
+        self._server.send_message(self.notification_channel, 0, [14, 'en0'])
+        self._serial = 0
+        self._counts = None
+        self._updates = 0
+        self.start_sampling(self._sim.network_interval, self.emit)
+
+    def do_stopMonitoring(self):
+        self.cancel()
+
+    def emit(self):
+        # every connection is updated 3 times with its cumulative counts, then the next one opens
+        rng = self._sim.random
+        if self._counts is None or self._updates == 3:
+            self._serial += 1
+            self._counts = [0, 0, 0, 0]
+            self._updates = 0
+        self._updates += 1
+        deltas = [rng.randint(0, 100), rng.randint(0, 100000), rng.randint(0, 100), rng.randint(0, 50000)]
+        self._counts = [c + d for c, d in zip(self._counts, deltas)]
+        self._sim.network_bytes["rx"] += deltas[1]
+        self._sim.network_bytes["tx"] += deltas[3]
+        values = self._counts + [  # RxPackets, RxBytes, TxPackets, TxBytes
+            0, 0, 0,  # RxDups, RxOOO, TxRetx
+            rng.randint(10, 20), rng.randint(20, 40),  # MinRTT, AvgRTT
+            self._serial, self._sim.mach_absolute_time(),
+        ]
+        self._server.send_message(self.notification_channel, 2, values)
+
+
+class _MobileNotificationsChannel(_Channel):
+    def do_setApplicationStateNotificationsEnabled(self, enabled: bool):
+        self._sim.remove_app_state_listener(self._on_app_state)
+        if enabled:
+            self._sim.add_app_state_listener(self._on_app_state)
+
+    def _on_app_state(self, info: dict):
+        try:
+            self._server.send_message(self.notification_channel, 'applicationStateNotification:', [info])
+        except OSError:
+            self.cancel()
+
+    def cancel(self):
+        super().cancel()
+        self._sim.remove_app_state_listener(self._on_app_state)
+
+
+class InstrumentsServer:
+    """ DTX server side of com.apple.instruments.remoteserver """
+
+    CHANNELS = {
+        InstrumentsService.DeviceInfo: _DeviceInfoChannel,
+        InstrumentsService.ProcessControl: _ProcessControlChannel,
+        InstrumentsService.DeviceApplictionListing: _AppListingChannel,
+        InstrumentsService.Sysmontap: _SysmontapChannel,
+        InstrumentsService.GraphicsOpengl: _OpenGLChannel,
+        InstrumentsService.Networking: _NetworkingChannel,
+        InstrumentsService.MobileNotifications: _MobileNotificationsChannel,
+    }
+
+    def __init__(self, conn: socket.socket, sim: DeviceSimulator):
+        self._conn = conn
+        self.sim = sim
+        self._lock = threading.Lock()
+        self._last_message_id = 0
+        self._channels: Dict[int, _Channel] = {}
+
+    def serve(self):
+        try:
+            capabilities = {
+                "com.apple.private.DTXBlockCompression": 0,
+                "com.apple.private.DTXConnection": 1,
+            }
+            self.send_message(0, '_notifyOfPublishedCapabilities:', [capabilities])
+            while True:
+                self._handle(*self._recv_message())
+        finally:
+            for channel in self._channels.values():
+                channel.cancel()
+
+    def _recv_message(self) -> typing.Tuple[Any, bytes]:
+        payload = bytearray()
+        while True:
+            h = DTXMessageHeader.parse(_recvall(self._conn, DTXMessageHeader.size))
+            if h.fragment_count > 1 and h.fragment_id == 0:
+                continue  # first fragment only contains header
+            payload.extend(_recvall(self._conn, h.payload_length))
+            if h.fragment_id == h.fragment_count - 1:
+                return h, bytes(payload)
+
+    def _handle(self, h, payload: bytes):
+        if h.conversation_index != 0:  # reply from host
+            return
+        flags, result = DTXPayload.parse(payload)
+        value, error = None, False
+        if flags == 0x02:
+            selector, args = result
+            args = args or []
+            if h.channel == 0:
+                value, error = self._handle_control(selector, args)
+            elif h.channel in self._channels:
+                value = self._channels[h.channel].call(selector, args)
+            else:
+                value, error = "Unknown channel {}".format(h.channel), True
+        if h.expects_reply:
+            if value is None:
+                reply = DTXPayload.build_empty()
+            else:
+                reply = DTXPayload.build_other(0x04 if error else 0x03, value)
+            self.send(h.channel, reply, message_id=h.message_id)
+
+    def _handle_control(self, selector: str, args: list) -> typing.Tuple[Any, bool]:
+        if selector == '_requestChannelWithCode:identifier:':
+            code, identifier = args
+            channel_class = self.CHANNELS.get(identifier)
+            if channel_class is None:
+                return "Unable to find service: {}".format(identifier), True
+            self._channels[code] = channel_class(self, code)
+        elif selector == '_channelCanceled:':
+            channel = self._channels.pop(args[0], None)
+            if channel:
+                channel.cancel()
+        return None, False
+
+    def send(self, channel: int, payload: bytes, message_id: Optional[int] = None, expects_reply: bool = False):
+        with self._lock:
+            if message_id is None:
+                self._last_message_id += 1
+                _message_id, conversation_index = self._last_message_id, 0
+            else:
+                _message_id, conversation_index = message_id, 1
+            header = DTXMessageHeader.build(message_id=_message_id,
+                                            payload_length=len(payload),
+                                            channel=channel,
+                                            expects_reply=1 if expects_reply else 0,
+                                            conversation_index=conversation_index)
+            self._conn.sendall(bytes(header) + bytes(payload))
+
+    def send_message(self, channel: int, selector: Any, args: list, expects_reply: bool = False):
+        """ flags 0x02: selector with auxiliary arguments """
+        self.send(channel, DTXPayload.build(selector, args), expects_reply=expects_reply)
+
+    def send_object(self, channel: int, value: Any, expects_reply: bool = False):
+        """ flags 0x01: a single archived object """
+        body = bplist.objc_encode(value)
+        header = DTXPayloadHeader.build(flags=0x01, aux_length=0, total_length=len(body))
+        self.send(channel, bytes(header) + body, expects_reply=expects_reply)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simulated iPhone served by a fake usbmuxd")
+    parser.add_argument("--address", help="unix socket path or host:port")
+    parser.add_argument("--root", help="directory served by com.apple.afc")
+    parser.add_argument("--udid", default="00008030-0000000000000001")
+    parser.add_argument("--process-count", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between sysmontap/opengl/network samples")
+    parser.add_argument("--no-ssl", action="store_true")
+    args = parser.parse_args()
+
+    sim = DeviceSimulator(address=args.address,
+                          root=args.root,
+                          udid=args.udid,
+                          process_count=args.process_count,
+                          sysmontap_interval=args.interval,
+                          opengl_interval=args.interval,
+                          network_interval=args.interval,
+                          use_ssl=not args.no_ssl)
+    with sim:
+        print("usbmuxd listening on", sim.address, flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
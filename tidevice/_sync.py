@@ -1,23 +1,28 @@
 # codeskyblue 2020/06/03
 #
 
+import collections
 import contextlib
 import datetime
+import fnmatch
 import io
 import logging
 import os
 import pathlib
+import posixpath
 import re
 import struct
+import threading
+import time
 import typing
-from typing import Iterator, List, Union
+from typing import Iterable, Iterator, List, Tuple, Union
 
 from . import bplist
 from . import struct2 as ct
 from ._proto import *
 from ._safe_socket import PlistSocketProxy
 from ._utils import pathjoin
-from .exceptions import MuxError, MuxServiceError
+from .exceptions import MuxError, MuxServiceError, SocketError
 
 # 00000000: 43 46 41 36 4C 50 41 41  84 00 00 00 00 00 00 00  magic(CFA6LPAA), length(0x84)
 # 00000010: 28 00 00 00 00 00 00 00  00 00 00 00 00 00 00 00  unknown(0x28), tag(0x0)
@@ -36,10 +41,115 @@ FHeader = ct.Struct("FHeader",
 
 logger = logging.getLogger(PROGRAM_NAME)
 
+# operations which change files, they invalidate the stat and listdir cache
+_PATH_OPS = (AFC.OP_REMOVE_PATH, AFC.OP_MAKE_DIR, AFC.OP_RENAME_PATH)
+_FD_OPS = (AFC.OP_WRITE, AFC.OP_FILE_SET_SIZE, AFC.OP_FILE_CLOSE)
+
+
+class CacheInfo(typing.NamedTuple):
+    hits: int
+    misses: int
+    size: int
+
+
+def _cache_key(path: str) -> str:
+    return posixpath.normpath("/" + path.lstrip("/"))
+
 
 class Sync(PlistSocketProxy):
+    # max requests in flight used by stat_many, listdir_info, walk and rmtree
+    pipeline_depth = 32
+    # size of a single OP_WRITE, and max OP_WRITE in flight used by push
+    chunk_size = 1 << 20
+    write_window = 4
+
     def prepare(self):
         self.__tag = -1
+        self._shared = False  # set by AFCPool, close() is ignored
+        # Sync can be shared by threads: requests are sent under _send_lock, the
+        # thread which reads the socket keeps responses of other tags in _received
+        self._send_lock = threading.Lock()
+        self._recv_cond = threading.Condition()
+        self._receiving = False
+        self._received: typing.Dict[int, AFCPacket] = {}
+        self._cache_lock = threading.RLock()
+        self._cache_enabled = False
+        self._stat_cache: typing.Dict[str, AFCPacket] = {}
+        self._listdir_cache: typing.Dict[str, List[str]] = {}
+        self._fd_paths: typing.Dict[int, str] = {}  # fd opened for write -> path
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def close(self):
+        """ does nothing for a connection shared by AFCPool (BaseDevice.sync), it is closed by the pool """
+        if not self._shared:
+            self._release()
+
+    def _release(self):
+        super().close()
+
+    def enable_cache(self, enabled: bool = True):
+        """ cache results of stat and listdir on this connection
+
+        The cache is invalidated by remove, rename, mkdir, set_mtime and file writes
+        sent through this connection, changes made by others are not noticed.
+        """
+        self._cache_enabled = enabled
+        if not enabled:
+            self.cache_clear()
+
+    def cache_info(self) -> CacheInfo:
+        with self._cache_lock:
+            return CacheInfo(self._cache_hits, self._cache_misses,
+                             len(self._stat_cache) + len(self._listdir_cache))
+
+    def cache_clear(self):
+        with self._cache_lock:
+            self._stat_cache.clear()
+            self._listdir_cache.clear()
+            self._cache_hits = self._cache_misses = 0
+
+    def _invalidate(self, path: str):
+        with self._cache_lock:
+            self._invalidate_locked(_cache_key(path))
+
+    def _invalidate_locked(self, key: str):
+        info = self._stat_cache.pop(key, None)
+        self._listdir_cache.pop(key, None)
+        # parent directories: listdir changed, negative stat of missing parents created by mkdir
+        parent = key
+        while parent != "/":
+            parent = posixpath.dirname(parent)
+            self._listdir_cache.pop(parent, None)
+            pinfo = self._stat_cache.get(parent)
+            if pinfo is not None and pinfo.status != AFCStatus.ST_SUCCESS:
+                del self._stat_cache[parent]
+        if info is not None and info.status == AFCStatus.ST_SUCCESS and b"S_IFDIR" not in info.payload:
+            return
+        prefix = key.rstrip("/") + "/"
+        for cache in (self._stat_cache, self._listdir_cache):
+            for k in [k for k in cache if k.startswith(prefix)]:
+                del cache[k]
+
+    def _invalidate_by_request(self, op: AFC, data: bytes):
+        if op in _PATH_OPS:
+            for path in data.split(b"\x00"):
+                if path:
+                    self._invalidate(path.decode('utf-8'))
+        elif op == AFC.OP_SET_FILE_TIME:
+            self._invalidate(data[8:].rstrip(b"\x00").decode('utf-8'))
+        elif op == AFC.OP_MAKE_LINK:
+            self._invalidate(data[8:].split(b"\x00")[1].decode('utf-8'))
+        elif op == AFC.OP_FILE_OPEN:
+            (mode, ) = struct.unpack("<Q", data[:8])
+            if mode != AFCMode.O_RDONLY:
+                self._invalidate(data[8:].rstrip(b"\x00").decode('utf-8'))
+        elif op in _FD_OPS:
+            (fd, ) = struct.unpack("<Q", data[:8])
+            with self._cache_lock:
+                path = self._fd_paths.pop(fd, None) if op == AFC.OP_FILE_CLOSE else self._fd_paths.get(fd)
+            if path is not None:
+                self._invalidate(path)
 
     def _next_tag(self):
         self.__tag += 1
@@ -51,16 +161,48 @@ class Sync(PlistSocketProxy):
     def sendall(self, data: typing.Union[bytes, bytearray]) -> int:
         return self.psock.sendall(data)
 
-    def _send(self, op: AFC, data: bytes, payload: bytes = b''):
+    def _send(self, op: AFC, data: bytes, payload: bytes = b'') -> int:
+        """ returns tag """
+        if self._cache_enabled:
+            self._invalidate_by_request(op, data)
         total_len = FHeader.size + len(data) + len(payload)
         this_len = FHeader.size + len(data)
-        fheader = FHeader.build(
-            length=total_len,
-            tag=self._next_tag(),
-            this_len=this_len,
-            operation=op.value,
-        )
-        self.sendall(fheader + data + payload)
+        with self._send_lock:
+            tag = self._next_tag()
+            fheader = FHeader.build(
+                length=total_len,
+                tag=tag,
+                this_len=this_len,
+                operation=op.value,
+            )
+            self.sendall(fheader + data + payload)
+        return tag
+
+    def _recv_tag(self, tag: int) -> AFCPacket:
+        """ wait for the response of tag, one thread reads the socket at a time """
+        with self._recv_cond:
+            while tag not in self._received:
+                if not self._receiving:
+                    self._receiving = True
+                    break
+                self._recv_cond.wait()
+            else:
+                return self._received.pop(tag)
+        try:
+            while True:
+                pkg = self._recv()
+                if pkg.tag == tag:
+                    return pkg
+                with self._recv_cond:
+                    self._received[pkg.tag] = pkg
+                    self._recv_cond.notify_all()
+        except SocketError:
+            self._release()  # the stream can not be resynchronized
+            raise
+        finally:
+            with self._recv_cond:
+                self._receiving = False
+                self._recv_cond.notify_all()
 
     def _recv(self):
         # The received data might be in the following format (For example: on iOS 9.3 and iOS 9.2.1)
@@ -102,24 +244,61 @@ class Sync(PlistSocketProxy):
         ]:
             logger.info("Unknown FHeader operation: %s",
                         AFC(fheader.operation))
-        return AFCPacket(AFCStatus(status), data, payload)
+        return AFCPacket(AFCStatus(status), data, payload, fheader.tag)
 
     def _request(self, op: AFC, data: bytes, payload: bytes = b'') -> AFCPacket:
-        self._send(op, data, payload)
-        return self._recv()
+        return self._recv_tag(self._send(op, data, payload))
+
+    def _pipeline(self, requests: Iterable[Tuple[AFC, bytes, bytes]], depth: int = None) -> Iterator[AFCPacket]:
+        """ send requests without waiting for the previous response
+
+        Args:
+            requests: iterable of (op, data, payload)
+            depth: max requests in flight, default self.pipeline_depth
+
+        Returns:
+            iterator of AFCPacket in the same order of requests
+        """
+        depth = depth or self.pipeline_depth
+        requests = iter(requests)
+        pending = collections.deque()  # tags in request order
+        try:
+            while True:
+                while len(pending) < depth:
+                    request = next(requests, None)
+                    if request is None:
+                        break
+                    pending.append(self._send(*request))
+                if not pending:
+                    return
+                yield self._recv_tag(pending.popleft())
+        finally:
+            # drain responses in flight, keep the connection usable
+            if not self.psock.closed:
+                for tag in pending:
+                    self._recv_tag(tag)
 
     def listdir(self, dpath: typing.Union[str, pathlib.Path]) -> typing.List[str]:
         """ same as os.listdir """
         if isinstance(dpath, pathlib.Path):
             dpath = dpath.as_posix()
-        self._send(AFC.OP_READ_DIR, dpath.encode('utf-8'))
-        pkg = self._recv()
+        if self._cache_enabled:
+            with self._cache_lock:
+                fnames = self._listdir_cache.get(_cache_key(dpath))
+                if fnames is not None:
+                    self._cache_hits += 1
+                    return list(fnames)
+                self._cache_misses += 1
+        pkg = self._request(AFC.OP_READ_DIR, dpath.encode('utf-8'))
         fnames = []
         for v in pkg.payload.rstrip(b'\x00').split(b'\x00'):
             fname = v.decode('utf-8')
             if fname in ('', '.', '..'):
                 continue
             fnames.append(fname)
+        if self._cache_enabled and pkg.status == AFCStatus.ST_SUCCESS:
+            with self._cache_lock:
+                self._listdir_cache[_cache_key(dpath)] = list(fnames)
         return fnames
     
     def listdir_info(self, dpath: typing.Union[str, pathlib.Path]) -> typing.List[StatResult]:
@@ -127,10 +306,7 @@ class Sync(PlistSocketProxy):
         dinfo = self.stat(dpath)
         if not dinfo.is_dir():
             return [dinfo]
-        infos = []
-        for filename in self.listdir(dpath):
-            finfo = self.stat(pathlib.Path(dpath) / filename)
-            infos.append(finfo)
+        infos = self.stat_many([pathlib.Path(dpath) / filename for filename in self.listdir(dpath)])
         infos.sort(key=lambda x: (x.is_dir(), x.st_mtime), reverse=True)
         return infos
 
@@ -158,7 +334,7 @@ class Sync(PlistSocketProxy):
 
     def exists(self, path: str):
         try:
-            self.stat(path)
+            self.stat_raw(path)
             return True
         except MuxError:
             return False
@@ -169,13 +345,35 @@ class Sync(PlistSocketProxy):
         return pkg.status
 
     def touch(self, dst: str):
-        """ can only create file, unable to update file modify time
-
-        TODO: update mtime with AFC.OP_SET_FILE_TIME
-        """
+        """ create file if not exists, and update file modify time """
         with self._context_open(dst, AFCMode.O_APPEND) as fd:
             self._file_write(fd, b'')
-    
+        try:
+            self.set_mtime(dst, time.time())
+        except MuxError as e:
+            logger.debug("touch %s: %s", dst, e)
+
+    def set_mtime(self, fpath: str, mtime: float):
+        """ set file modify time, mtime is seconds since epoch """
+        pkg = self._request(AFC.OP_SET_FILE_TIME,
+                            struct.pack("<Q", int(mtime * 1e9)) + self._pad00(fpath))
+        if pkg.status != AFCStatus.ST_SUCCESS:
+            raise MuxError("set mtime {} - {!s}".format(fpath, AFCStatus(pkg.status)))
+
+    def file_hash(self, fpath: str, start: int = 0, end: int = None) -> bytes:
+        """ SHA1 digest of file content [start, end) computed on device
+
+        Raises:
+            MuxError, eg: ST_OP_NOT_SUPPORTED when device do not support OP_GET_FILE_HASH_RANGE
+        """
+        if end is None:
+            end = self.stat_raw(fpath).st_size
+        pkg = self._request(AFC.OP_GET_FILE_HASH_RANGE,
+                            struct.pack("<QQ", start, end) + self._pad00(fpath))
+        if pkg.status != AFCStatus.ST_SUCCESS:
+            raise MuxError("hash {} - {!s}".format(fpath, AFCStatus(pkg.status)))
+        return bytes(pkg.payload)
+
     def stat(self, fpath: typing.Union[str, pathlib.Path], with_error: bool = False) -> StatResult:
         """
         Returns:
@@ -197,33 +395,84 @@ class Sync(PlistSocketProxy):
         """
         if isinstance(fpath, pathlib.Path):
             fpath = fpath.as_posix()
-        pkg = self._request(AFC.OP_GET_FILE_INFO, fpath.encode('utf-8'))
+        return self.stat_many([fpath], with_error)[0]
+
+    def stat_many(self, fpaths: Iterable[typing.Union[str, pathlib.Path]], with_error: bool = False) -> List[StatResult]:
+        """ same as [self.stat(p) for p in fpaths], but requests are pipelined
+
+        Returns:
+            if with_error False:
+                list of StatResult
+            else:
+                list of (StatResult or None, error(None or AFCStatus))
+
+        Raises:
+            MuxError
+        """
+        fpaths = [p.as_posix() if isinstance(p, pathlib.Path) else p for p in fpaths]
+        return [self._parse_stat(fpath, pkg, with_error) for fpath, pkg in zip(fpaths, self._stat_packets(fpaths))]
+
+    def stat_raw(self, fpath: typing.Union[str, pathlib.Path], with_error: bool = False) -> RawStatResult:
+        """ same as stat, returns RawStatResult which is cheaper to create """
+        if isinstance(fpath, pathlib.Path):
+            fpath = fpath.as_posix()
+        return self._stat_many_raw([fpath], with_error)[0]
+
+    def _stat_many_raw(self, fpaths: List[str], with_error: bool = False) -> List[RawStatResult]:
+        return [self._parse_stat_raw(fpath, pkg, with_error) for fpath, pkg in zip(fpaths, self._stat_packets(fpaths))]
+
+    def _stat_packets(self, fpaths: List[str]) -> List[AFCPacket]:
+        """ OP_GET_FILE_INFO responses, from cache when enabled """
+        pkgs = {}
+        if self._cache_enabled:
+            with self._cache_lock:
+                for fpath in fpaths:
+                    pkg = self._stat_cache.get(_cache_key(fpath))
+                    if pkg is not None:
+                        pkgs[fpath] = pkg
+                self._cache_hits += len(pkgs)
+                self._cache_misses += len(fpaths) - len(pkgs)
+        missing = [p for p in fpaths if p not in pkgs]
+        if len(missing) == 1:
+            pkgs[missing[0]] = self._request(AFC.OP_GET_FILE_INFO, missing[0].encode('utf-8'))
+        elif missing:
+            requests = ((AFC.OP_GET_FILE_INFO, p.encode('utf-8'), b'') for p in missing)
+            with contextlib.closing(self._pipeline(requests)) as it:
+                pkgs.update(zip(missing, it))
+        if self._cache_enabled:
+            with self._cache_lock:
+                for fpath in missing:
+                    if pkgs[fpath].status in (AFCStatus.ST_SUCCESS, AFCStatus.ST_OBJECT_NOT_FOUND):
+                        self._stat_cache[_cache_key(fpath)] = pkgs[fpath]
+        return [pkgs[fpath] for fpath in fpaths]
+
+    def _parse_stat(self, fpath: str, pkg: AFCPacket, with_error: bool = False) -> StatResult:
+        result = self._parse_stat_raw(fpath, pkg, with_error)
+        if with_error:
+            info, err = result
+            return (info.to_stat_result() if info is not None else None), err
+        return result.to_stat_result()
+
+    def _parse_stat_raw(self, fpath: str, pkg: AFCPacket, with_error: bool = False) -> RawStatResult:
         if pkg.status != AFCStatus.ST_SUCCESS:
             if with_error:
                 return None, AFCStatus(pkg.status)
             raise MuxError("stat {} - {!s}".format(fpath,
                                                    AFCStatus(pkg.status)))
-        items = pkg.payload.rstrip(b"\x00").split(b'\x00')
+        items = bytes(pkg.payload).rstrip(b"\x00").split(b"\x00")
         assert len(items) % 2 == 0
-
-        result = {}
-        for i in range(len(items) // 2):
-            key = items[i * 2].decode('utf-8')
-            val = items[i * 2 + 1].decode('utf-8')
-            result[key] = val
-
-        kwargs = {}
-        kwargs['st_name'] = pathlib.Path(fpath).name
-        kwargs['st_ifmt'] = result['st_ifmt']
-        kwargs["st_linktarget"] = result.get("LinkTarget")
-        for key in ('st_size', 'st_blocks', 'st_nlink'):
-            if key in result:
-                kwargs[key] = int(result[key])
-        kwargs['st_mtime'] = datetime.datetime.fromtimestamp(
-            int(result['st_mtime']) / 1e9)
-        kwargs['st_ctime'] = datetime.datetime.fromtimestamp(
-            int(result.pop('st_birthtime')) / 1e9)
-        stat_result = StatResult(**kwargs)
+        result = dict(zip(items[::2], items[1::2]))
+
+        linktarget = result.get(b"LinkTarget")
+        stat_result = RawStatResult(
+            fpath.rstrip("/").rsplit("/", 1)[-1],
+            result[b'st_ifmt'].decode('utf-8'),
+            int(result.get(b'st_size', 0)),
+            int(result.get(b'st_blocks', 0)),
+            int(result.get(b'st_nlink', 0)),
+            int(result[b'st_mtime']),
+            int(result[b'st_birthtime']),
+            linktarget.decode('utf-8') if linktarget is not None else None)
         if with_error:
             return stat_result, None
         return stat_result
@@ -232,21 +481,29 @@ class Sync(PlistSocketProxy):
         """ remove recursive """
         if isinstance(dpath, pathlib.Path):
             dpath = dpath.as_posix()
-        info = self.stat(dpath)
+        info = self.stat_raw(dpath)
         if info.is_dir():
-            rmfiles = []
-            for fname in self.listdir(dpath):
-                if fname != "":
-                    fpath = dpath.rstrip("/") + "/" + fname
-                    files = self.rmtree(fpath)
-                    rmfiles.extend(files)
-            rmfiles.append(dpath + "/")
-            self.rmdir(dpath)
-            return rmfiles
+            return self._rmtree_dir(dpath)
         else:
             self.remove(dpath)
             return [dpath]
 
+    def _rmtree_dir(self, dpath: str) -> typing.List[str]:
+        fpaths = [dpath.rstrip("/") + "/" + fname for fname in self.listdir(dpath) if fname != ""]
+        rmfiles = []
+        files = []
+        for fpath, info in zip(fpaths, self._stat_many_raw(fpaths)):
+            if info.is_dir():
+                rmfiles.extend(self._rmtree_dir(fpath))
+            else:
+                rmfiles.append(fpath)
+                files.append(fpath)
+        requests = ((AFC.OP_REMOVE_PATH, self._pad00(fpath), b'') for fpath in files)
+        collections.deque(self._pipeline(requests), maxlen=0)
+        rmfiles.append(dpath + "/")
+        self.rmdir(dpath)
+        return rmfiles
+
     def treeview(self, dpath: str, depth: int = 100):
         self._treeview(dpath, depth=depth)
 
@@ -265,7 +522,7 @@ class Sync(PlistSocketProxy):
         if depth != -1 and _depth > depth:
             return
         try:
-            info = self.stat(dpath)
+            info = self.stat_raw(dpath)
             name_prefix = "`--" if _last else "|--"
             prefix = _prefix + name_prefix
             if info.is_dir():
@@ -294,16 +551,13 @@ class Sync(PlistSocketProxy):
         """
         Same as os.walk but implemented for AFC
         """
-        if not self.stat(top).is_dir():
+        if not self.stat_raw(top).is_dir():
             return
-        allfiles = self.listdir(top)
+        # ignore invalid empty name
+        allfiles = [fname for fname in self.listdir(top) if fname != ""]
         dirs, files = [], []
-        for fname in allfiles:
-            if fname == "":  # ignore invalid empty name
-                continue
-
-            path = pathjoin(top, fname)
-            info = self.stat(path)
+        infos = self._stat_many_raw([pathjoin(top, fname) for fname in allfiles])
+        for fname, info in zip(allfiles, infos):
             if info.is_dir():
                 if info.is_link():
                     if followlinks:
@@ -318,6 +572,68 @@ class Sync(PlistSocketProxy):
             root = pathjoin(top, dname)
             yield from self.walk(root, followlinks=followlinks)
 
+    def scan(self, top: str) -> Tuple[List[str], List[Tuple[str, RawStatResult]]]:
+        """ list everything under top, links are not followed
+
+        Returns:
+            dirs, [(fpath, RawStatResult), ...]  parents before children
+        """
+        dirs, files = [], []
+        pending = collections.deque([top])
+        while pending:
+            dpath = pending.popleft()
+            fpaths = [pathjoin(dpath, fname) for fname in self.listdir(dpath) if fname]
+            for fpath, info in zip(fpaths, self._stat_many_raw(fpaths)):
+                if info.is_dir():
+                    dirs.append(fpath)
+                    pending.append(fpath)
+                else:
+                    files.append((fpath, info))
+        return dirs, files
+
+    def find(self,
+             root: str,
+             pattern: str = "*",
+             min_size: int = 0,
+             connect: typing.Callable[[], "Sync"] = None,
+             jobs: int = 4) -> Iterator[Tuple[str, RawStatResult]]:
+        """ yields (path, RawStatResult) as soon as found, breadth first
+
+        Args:
+            pattern: shell pattern matched against file name, eg: *.log
+            min_size: only files not smaller than min_size
+            connect: returns a new Sync, used to walk with jobs connections
+        """
+        from ._walk import TreeWalker
+        for _, entries in TreeWalker(self, connect, jobs).walk(root):
+            for fpath, info in entries:
+                if min_size and (info.is_dir() or info.st_size < min_size):
+                    continue
+                if fnmatch.fnmatchcase(info.st_name, pattern):
+                    yield fpath, info
+
+    def du(self,
+           root: str,
+           depth: int = 1,
+           connect: typing.Callable[[], "Sync"] = None,
+           jobs: int = 4) -> List[Tuple[str, int]]:
+        """ disk usage, sum of file sizes under every directory not deeper than depth
+
+        Returns:
+            [(dirpath, size), ...] sorted by dirpath
+        """
+        from ._walk import TreeWalker
+        root = root.rstrip("/") or "/"
+        totals = collections.defaultdict(int)
+        totals[root] = 0
+        for dpath, entries in TreeWalker(self, connect, jobs).walk(root):
+            size = sum(info.st_size for _, info in entries if not info.is_dir())
+            rel = posixpath.relpath(dpath, root)
+            parts = [] if rel == "." else rel.split("/")
+            for level in range(min(len(parts), depth) + 1):
+                totals[posixpath.join(root, *parts[:level])] += size
+        return sorted(totals.items())
+
     def _file_open(self, path: str, open_mode: AFCMode = AFCMode.O_RDONLY) -> int:
         """
         Return file handle fd
@@ -327,6 +643,9 @@ class Sync(PlistSocketProxy):
         pkg = self._request(AFC.OP_FILE_OPEN, payload)
         fd = struct.unpack("<Q", pkg.data)[0]
         assert fd, "file descriptor should not be zero"
+        if self._cache_enabled and open_mode != AFCMode.O_RDONLY:
+            with self._cache_lock:
+                self._fd_paths[fd] = path
         return fd
 
     def _file_close(self, fd: int):
@@ -339,6 +658,34 @@ class Sync(PlistSocketProxy):
         if pkg.status != 0:
             raise MuxError("write error: {!s}".format(pkg.status))
     
+    def _file_write_many(self, fd: int, chunks: Iterable[bytes], window: int = None) -> int:
+        """ keep at most window OP_WRITE in flight before reading their status
+
+        Returns:
+            bytes written
+        """
+        sizes = collections.deque()
+
+        def requests():
+            for chunk in chunks:
+                if chunk:
+                    sizes.append(len(chunk))
+                    yield AFC.OP_WRITE, struct.pack("<Q", fd), chunk
+
+        written = 0
+        with contextlib.closing(self._pipeline(requests(), window or self.write_window)) as pkgs:
+            for pkg in pkgs:
+                if pkg.status != 0:
+                    raise MuxError("write error: {!s}".format(pkg.status))
+                written += sizes.popleft()
+        return written
+
+    def _file_set_size(self, fd: int, size: int):
+        pkg = self._request(AFC.OP_FILE_SET_SIZE,
+                            struct.pack("<QQ", fd, size))
+        if pkg.status != 0:
+            raise MuxError("set size error: {!s}".format(pkg.status))
+
     def _file_read(self, fd: int, size: int):
         """
         size: max size to read
@@ -349,6 +696,12 @@ class Sync(PlistSocketProxy):
             raise MuxError("read error: {!s}".format(pkg.status))
         return pkg.payload
 
+    def _file_seek(self, fd: int, offset: int, whence: int = os.SEEK_SET):
+        pkg = self._request(AFC.OP_FILE_SEEK,
+                            struct.pack("<QQq", fd, whence, offset))
+        if pkg.status != 0:
+            raise MuxError("seek error: {!s}".format(pkg.status))
+
     @contextlib.contextmanager
     def _context_open(self, path, open_mode):
         h = self._file_open(path, open_mode)
@@ -357,31 +710,69 @@ class Sync(PlistSocketProxy):
         finally:
             self._file_close(h)
 
-    def iter_content(self, path: typing.Union[str, pathlib.Path]) -> Iterator[bytes]:
+    def iter_content(self,
+                     path: typing.Union[str, pathlib.Path],
+                     offset: int = 0,
+                     length: int = None) -> Iterator[bytes]:
+        """
+        Args:
+            offset: position to start read, seek with OP_FILE_SEEK
+            length: max bytes to read, default read to the end of file
+        """
         if isinstance(path, pathlib.Path):
             path = path.as_posix()
-        info = self.stat(path)
+        info = self.stat_raw(path)
         if info.is_dir():
             raise MuxError("{} is a directory", path)
         if info.is_link():
             path = info.st_linktarget
+            info = self.stat_raw(path)
 
+        left_size = max(0, info.st_size - offset)
+        if length is not None:
+            left_size = min(left_size, length)
         with self._context_open(path, AFCMode.O_RDONLY) as fd:
-            left_size = info.st_size
+            if offset:
+                self._file_seek(fd, offset)
             max_read_size = 1 << 20
             while left_size > 0:
-                chunk = self._file_read(fd, max_read_size)
+                chunk = self._file_read(fd, min(left_size, max_read_size))
+                if not chunk:
+                    break
                 left_size -= len(chunk)
                 yield chunk
 
+    def read_range(self, path: typing.Union[str, pathlib.Path], offset: int, length: int) -> bytes:
+        """ read at most length bytes start from offset """
+        return b"".join(self.iter_content(path, offset, length))
+
+    def _resume_offset(self, src: str, size: int, dst: pathlib.Path) -> int:
+        """ size of the local partial file dst, 0 when it is not the head of device file src """
+        if not dst.is_file():
+            return 0
+        local_size = dst.stat().st_size
+        if local_size == 0 or local_size > size:
+            return 0
+        # compare the tail of local file, device file may be replaced since last pull
+        n = min(local_size, 64 << 10)
+        with dst.open("rb") as f:
+            f.seek(local_size - n)
+            tail = f.read(n)
+        if self.read_range(src, local_size - n, n) != tail:
+            logger.info("%s changed since last pull, pull again", src)
+            return 0
+        return local_size
+
     def pull(self,
              src: typing.Union[str, pathlib.Path],
              dst: typing.Union[str, pathlib.Path] = "./",
-             remove: bool = False):
+             remove: bool = False,
+             resume: bool = False):
         """ pull recursive dir and files
         Args:
             src, dst: source and destination file
             remove (bool): should remove after pulled
+            resume (bool): continue from the end of existing local files
         """
         if isinstance(src, str):
             src = pathlib.Path(src)
@@ -389,7 +780,7 @@ class Sync(PlistSocketProxy):
             dst = pathlib.Path(dst)
 
         try:
-            finfo = self.stat(src)    
+            finfo = self.stat_raw(src)    
         except MuxError as e:
             logger.warning("Stat %s error: %s", src, e)
             return
@@ -397,7 +788,7 @@ class Sync(PlistSocketProxy):
         if src.as_posix() == "/" or finfo.is_dir():
             dst.mkdir(exist_ok=True)
             for fname in self.listdir(src):
-                self.pull(src.joinpath(fname), dst.joinpath(fname), remove=remove)
+                self.pull(src.joinpath(fname), dst.joinpath(fname), remove=remove, resume=resume)
             try:
                 self.rmdir(src)
             except:
@@ -405,31 +796,148 @@ class Sync(PlistSocketProxy):
         else:
             if dst.is_dir():
                 dst = dst.joinpath(src.name)
+            offset = 0
+            if resume and not finfo.is_link():
+                offset = self._resume_offset(src.as_posix(), finfo.st_size, dst)
             logger.info("copying %s -> %s", src, dst)
-            with dst.open("wb") as f:
-                for chunk in self.iter_content(src):
+            with dst.open("ab" if offset else "wb") as f:
+                for chunk in self.iter_content(src, offset=offset):
                     f.write(chunk)
             if remove:
                 self.remove(src)
 
+    def mirror(self,
+               src: str,
+               dst: str,
+               push: bool = False,
+               delete: bool = False,
+               checksum: bool = False,
+               manifest: str = None):
+        """ copy only new or changed files, see _mirror.py
+
+        Args:
+            src, dst: device and local directory, local and device directory when push is True
+            push (bool): mirror from host to device
+            delete (bool): delete files in dst which not exist in src
+            checksum (bool): compare SHA1 for files with the same size
+            manifest (str): local manifest path, default .tidevice-mirror.json in the local directory
+
+        Returns:
+            MirrorResult(copied, deleted, unchanged)
+        """
+        from ._mirror import Mirror
+        m = Mirror(self, delete=delete, checksum=checksum, manifest=manifest)
+        return m.push(src, dst) if push else m.pull(src, dst)
+
+    def export_archive(self,
+                       src: str,
+                       fileobj: typing.BinaryIO,
+                       format: str = "tar",
+                       compress: bool = False) -> int:
+        """ stream directory src into a tar or zip archive, see _archive.py
+
+        Args:
+            fileobj: writable file object, seek is not required
+            format (str): tar or zip
+            compress (bool): gzip for tar, deflate for zip, run in a worker thread
+
+        Returns:
+            number of files archived
+        """
+        from ._archive import export_archive
+        return export_archive(self, src, fileobj, format=format, compress=compress)
+
     def pull_content(self, path: str) -> bytearray:
         buf = bytearray()
         for chunk in self.iter_content(path):
             buf.extend(chunk)
         return buf
 
-    def push_content(self, path: str, data: Union[typing.IO, bytes,
-                                                  bytearray]):
+    def push_content(self,
+                     path: str,
+                     data: Union[typing.IO, bytes, bytearray],
+                     chunk_size: int = None,
+                     window: int = None):
+        """ write data to device file, file objects are read chunk by chunk
+
+        Args:
+            chunk_size: size of a single OP_WRITE, default self.chunk_size
+            window: max OP_WRITE in flight, default self.write_window
+        """
+        chunk_size = chunk_size or self.chunk_size
+        if isinstance(data, (bytes, bytearray)):
+            buf = io.BytesIO(data)
+        else:
+            buf = data
+
+        size = None
+        try:
+            size = os.fstat(buf.fileno()).st_size - buf.tell()
+        except (AttributeError, OSError, ValueError):
+            if isinstance(buf, io.BytesIO):
+                size = len(buf.getbuffer()) - buf.tell()
+
         with self._context_open(path, AFCMode.O_WR) as fd:
-            chunk_size = 1 << 20
+            # preallocate, so that the device does not grow the file every write
+            preallocated = size is not None and size > chunk_size
+            if preallocated:
+                self._file_set_size(fd, size)
+            chunks = iter(lambda: buf.read(chunk_size), b'')
+            written = self._file_write_many(fd, chunks, window)
+            if preallocated and written != size:
+                self._file_set_size(fd, written)
+
+    def push(self,
+             src: typing.Union[str, pathlib.Path],
+             dst: str,
+             chunk_size: int = None,
+             window: int = None,
+             preserve_mtime: bool = True):
+        """ push local file without loading it into memory
 
-            if isinstance(data, io.IOBase):
-                buf = data
-            else:
-                buf = io.BytesIO(data)
+        Args:
+            src: local file
+            dst: device file
+            preserve_mtime (bool): set modify time of dst same as src
+        """
+        with open(src, "rb") as f:
+            self.push_content(dst, f, chunk_size=chunk_size, window=window)
+        if preserve_mtime:
+            try:
+                self.set_mtime(dst, os.stat(src).st_mtime)
+            except MuxError as e:
+                logger.debug("push %s: %s", dst, e)
 
-            while True:
-                chunk = buf.read(chunk_size)
-                if chunk == b'':
-                    break
-                self._file_write(fd, chunk)
+
+class AFCPool:
+    """ shared Sync connections, one per (bundle_id, command), created when first used
+
+    Sync is thread safe, so the same connection is returned to all callers.
+    close() of a pooled connection is ignored, so that callers which close what
+    they got (or use it with "with") do not cut off the others. It is recreated
+    when the connection is broken.
+    """
+
+    def __init__(self, connect: typing.Callable[[typing.Optional[str], str], Sync]):
+        """
+        Args:
+            connect: (bundle_id, command) -> new Sync, bundle_id is None for the AFC service
+        """
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._conns: typing.Dict[tuple, Sync] = {}
+
+    def get(self, bundle_id: typing.Optional[str] = None, command: str = "VendDocuments") -> Sync:
+        key = (bundle_id, command if bundle_id else None)
+        with self._lock:
+            sync = self._conns.get(key)
+            if sync is None or sync.closed:
+                sync = self._conns[key] = self._connect(bundle_id, command)
+                sync._shared = True
+            return sync
+
+    def close(self):
+        with self._lock:
+            conns, self._conns = list(self._conns.values()), {}
+        for sync in conns:
+            sync._release()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Mon Oct 19 2026 13:05:48
+
+System wide top of all processes, refreshed by every sysmontap sample
+
+ProcessTable keeps the state of every pid across samples in preallocated
+columns (array.array), rows of exited pids are reused, so a refresh does not
+allocate per process. Rates of the cumulative ctxSwitch and intWakeups are
+divided by the device time between samples (EndMachAbsTime). Top N of a column
+is selected with heapq, O(n log N).
+
+Process names are cached, runningProcesses is only called when new pids show up.
+
+Usage:
+    for snapshot in iter_top(d, limit=10, sort_by="cpu"):
+        for p in snapshot["processes"]:
+            print(p["pid"], p["name"], p["cpu"], p["memory"])
+"""
+
+import array
+import heapq
+import math
+import time
+from typing import Dict, Iterator, List, Mapping, Optional
+
+from ._clocksync import MachClock
+from ._device import BaseDevice
+from ._instruments import ServiceInstruments
+from ._perf import _probe_clock
+from ._proto import SYSMON_PROC_ATTRS
+
+SORT_FIELDS = ("cpu", "memory", "wakeups", "ctx_switches")
+
+_I_PID = SYSMON_PROC_ATTRS.index("pid")
+_I_CPU = SYSMON_PROC_ATTRS.index("cpuUsage")
+_I_MEMORY = SYSMON_PROC_ATTRS.index("physFootprint")
+_I_CTX_SWITCH = SYSMON_PROC_ATTRS.index("ctxSwitch")
+_I_WAKEUPS = SYSMON_PROC_ATTRS.index("intWakeups")
+
+
+def _number(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else math.nan  # maybe NSNull
+
+
+def _sort_key(value: float) -> float:
+    return -math.inf if math.isnan(value) else value
+
+
+class ProcessTable:
+    """ columns: cpu (%), memory (bytes), ctx_switches and wakeups (per second), nan when unknown """
+
+    def __init__(self, capacity: int = 512):
+        self._rows: Dict[int, int] = {}  # pid: row
+        self._free: List[int] = []
+        self._tick = 0
+        self._last_seconds: Optional[float] = None
+        self.capacity = 0
+        self.pids = array.array("q")
+        self._seen = array.array("q")
+        self._ctx_total = array.array("d")
+        self._wakeups_total = array.array("d")
+        self.columns: Dict[str, array.array] = {name: array.array("d") for name in SORT_FIELDS}
+        self._grow(capacity)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _grow(self, size: int):
+        self._free.extend(range(self.capacity + size - 1, self.capacity - 1, -1))
+        self.capacity += size
+        self.pids.extend([-1] * size)
+        self._seen.extend([0] * size)
+        for col in [self._ctx_total, self._wakeups_total] + list(self.columns.values()):
+            col.extend([math.nan] * size)
+
+    def update(self, processes: Mapping[int, list], seconds: float) -> List[int]:
+        """
+        Args:
+            processes: {pid: attrs} of sysmontap, attrs in order of SYSMON_PROC_ATTRS
+            seconds: device time of the sample
+
+        Returns:
+            new pids
+        """
+        self._tick += 1
+        interval = seconds - self._last_seconds if self._last_seconds is not None else 0.0
+        self._last_seconds = seconds
+        cpu, memory = self.columns["cpu"], self.columns["memory"]
+        ctx_switches, wakeups = self.columns["ctx_switches"], self.columns["wakeups"]
+        new_pids = []
+        for pid, attrs in processes.items():
+            row = self._rows.get(pid)
+            if row is None:
+                if not self._free:
+                    self._grow(self.capacity)
+                row = self._rows[pid] = self._free.pop()
+                self.pids[row] = pid
+                self._ctx_total[row] = self._wakeups_total[row] = math.nan
+                new_pids.append(pid)
+            ctx_total, wakeups_total = _number(attrs[_I_CTX_SWITCH]), _number(attrs[_I_WAKEUPS])
+            if interval > 0:
+                # nan when the last value is unknown or the counter is reset
+                delta = ctx_total - self._ctx_total[row]
+                ctx_switches[row] = delta / interval if delta >= 0 else math.nan
+                delta = wakeups_total - self._wakeups_total[row]
+                wakeups[row] = delta / interval if delta >= 0 else math.nan
+            else:
+                ctx_switches[row] = wakeups[row] = math.nan
+            self._ctx_total[row], self._wakeups_total[row] = ctx_total, wakeups_total
+            cpu[row] = _number(attrs[_I_CPU])
+            memory[row] = _number(attrs[_I_MEMORY])
+            self._seen[row] = self._tick
+
+        if len(self._rows) > len(processes):  # some processes exited
+            for pid, row in list(self._rows.items()):
+                if self._seen[row] != self._tick:
+                    del self._rows[pid]
+                    self.pids[row] = -1
+                    self._free.append(row)
+        return new_pids
+
+    def top(self, sort_by: str = "cpu", limit: int = 10) -> List[int]:
+        """ rows of the largest values, nan is the smallest """
+        col = self.columns[sort_by]
+        return heapq.nlargest(limit, self._rows.values(), key=lambda row: _sort_key(col[row]))
+
+    def row(self, row: int) -> dict:
+        result = {"pid": self.pids[row]}
+        for name, col in self.columns.items():
+            value = col[row]
+            result[name] = None if math.isnan(value) else value
+        return result
+
+
+class Top:
+    def __init__(self, ins: ServiceInstruments, exe_index: Optional[Mapping[str, dict]] = None):
+        """
+        Args:
+            ins: called for process names, not from its receiving thread
+            exe_index: d.app_index.exe_index(), to show bundle_id of apps
+        """
+        self._ins = ins
+        self._exe_index = exe_index or {}
+        self.table = ProcessTable()
+        self.clock = MachClock()
+        self.names: Dict[int, dict] = {}  # pid: {"name", "bundle_id"}
+        self.system: dict = {}
+
+    def _refresh_names(self, new_pids: List[int]):
+        names = {}
+        for p in self._ins.app_process_list(self._exe_index):
+            names[p['pid']] = {"name": p['name'], "bundle_id": p['bundle_id']}
+        for pid in new_pids:  # exited before listed
+            names.setdefault(pid, {"name": "?", "bundle_id": ""})
+        self.names = names
+
+    def update(self, result: list) -> bool:
+        """
+        Args:
+            result: sysmontap sample, same as iter_cpu_memory
+
+        Returns:
+            False when result is not a process sample
+        """
+        if self.clock.due:
+            _probe_clock(self.clock, self._ins)
+        sinfo = pinfolist = None
+        for info in result or []:
+            if 'CPUCount' in info:
+                sinfo = info
+            elif 'Processes' in info:
+                pinfolist = info
+        if sinfo is not None:
+            self.system = {
+                "cpu_count": sinfo['CPUCount'],
+                "cpu": sinfo['SystemCPUUsage']['CPU_TotalLoad'],
+            }
+        if pinfolist is None:
+            return False
+        ticks = pinfolist.get('EndMachAbsTime')
+        if self.clock.synced and isinstance(ticks, int):
+            self.system["time"] = self.clock.to_host(ticks)
+            seconds = ticks * self.clock.scale
+        else:
+            self.system["time"] = seconds = time.time()
+        new_pids = self.table.update(pinfolist['Processes'], seconds)
+        if new_pids:
+            self._refresh_names(new_pids)
+        return True
+
+    def top(self, sort_by: str = "cpu", limit: int = 10) -> List[dict]:
+        processes = []
+        for row in self.table.top(sort_by, limit):
+            p = self.table.row(row)
+            p.update(self.names.get(p["pid"], {"name": "?", "bundle_id": ""}))
+            processes.append(p)
+        return processes
+
+
+def iter_top(d: BaseDevice, limit: int = 10, sort_by: str = "cpu") -> Iterator[dict]:
+    """
+    yield of {
+        "time": 1760000000.0,  # device time of sample, seconds since epoch
+        "cpu_count": 6,
+        "cpu": 35.0,  # total cpu load
+        "processes": [{"pid", "name", "bundle_id", "cpu", "memory", "wakeups", "ctx_switches"}, ...],
+    }
+    """
+    if sort_by not in SORT_FIELDS:
+        raise ValueError("sort_by should be one of " + ", ".join(SORT_FIELDS))
+    with d.connect_instruments() as ins:
+        top = Top(ins, d.app_index.exe_index())
+        for result in ins.iter_cpu_memory():
+            if top.update(result):
+                yield dict(top.system, processes=top.top(sort_by, limit))
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 15:10:24
+
+Copy directory trees between host and device over several AFC connections
+
+A single AFC connection waits for every READ/WRITE to come back, so most of
+the time the usb link is idle. TransferEngine opens one connection per worker,
+and every worker takes jobs from a shared queue. Files larger than range_size
+are split into ranges, workers seek (AFC.OP_FILE_SEEK) to the offset of the range.
+
+Usage:
+    engine = TransferEngine(d.connect_sync, jobs=4)
+    stats = engine.pull("/DCIM", "./DCIM")
+    print(stats)  # 120 files, 1.2 GB in 30.1s (40.8 MB/s)
+
+    # app container, house_arrest
+    TransferEngine(lambda: d.connect_sync("com.example.demo")).push("./data", "/Documents/data")
+"""
+
+import logging
+import os
+import pathlib
+import posixpath
+import queue
+import threading
+import time
+import typing
+from typing import Callable, List, Optional, Union
+
+from ._proto import PROGRAM_NAME, AFCMode
+from ._sync import Sync
+from ._utils import pathjoin
+from .exceptions import MuxError
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+PathType = Union[str, pathlib.Path]
+PART_SUFFIX = ".part"
+
+
+def format_size(nbytes: float) -> str:
+    for unit_name, min_size in (("GB", 1 << 30), ("MB", 1 << 20), ("KB", 1 << 10)):
+        if nbytes >= min_size:
+            return "{:.1f} {}".format(nbytes / min_size, unit_name)
+    return "{:.0f} Bytes".format(nbytes)
+
+
+class TransferStats:
+    """ aggregated over all connections, thread safe """
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.begin = time.time()
+        self.end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, nbytes: int = 0, files: int = 0):
+        with self._lock:
+            self.bytes += nbytes
+            self.files += files
+
+    def finish(self):
+        self.end = time.time()
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or time.time()) - self.begin
+
+    @property
+    def throughput(self) -> float:
+        """ bytes per second """
+        return self.bytes / max(self.seconds, 1e-6)
+
+    def __str__(self):
+        return "{} files, {} in {:.1f}s ({}/s)".format(
+            self.files, format_size(self.bytes), self.seconds, format_size(self.throughput))
+
+
+class _Job(typing.NamedTuple):
+    src: str
+    dst: str
+    offset: int = 0
+    length: Optional[int] = None  # None: whole file, read until EOF
+    file: Optional["_File"] = None
+
+
+class _File:
+    """ counts finished ranges of a split file """
+
+    def __init__(self, size: int, parts: int):
+        self.size = size
+        self.parts = parts
+        self._lock = threading.Lock()
+
+    def done(self) -> bool:
+        """ returns True when the last range finished """
+        with self._lock:
+            self.parts -= 1
+            return self.parts == 0
+
+
+class TransferEngine:
+    def __init__(self,
+                 connect: Callable[[], Sync],
+                 jobs: int = 4,
+                 range_size: int = 8 << 20,
+                 chunk_size: int = 1 << 20,
+                 window: int = 4):
+        """
+        Args:
+            connect: returns a new Sync, eg: d.connect_sync, called once per worker
+            jobs: number of AFC connections used to transfer files
+            range_size: files larger than this are split into ranges of this size
+            chunk_size: max size of a single AFC read or write
+            window: max OP_WRITE in flight on each connection when push
+        """
+        assert jobs > 0, "jobs should be greater than 0"
+        self._connect = connect
+        self.jobs = jobs
+        self.range_size = range_size
+        self.chunk_size = chunk_size
+        self.window = window
+        self.stats = TransferStats()
+
+    def _split(self, src: str, dst: str, size: int) -> List[_Job]:
+        if size <= self.range_size:
+            return [_Job(src, dst)]
+        offsets = range(0, size, self.range_size)
+        f = _File(size, len(offsets))
+        return [_Job(src, dst, offset, min(self.range_size, size - offset), f) for offset in offsets]
+
+    def _run(self, jobs: List[_Job], handle: Callable[[Sync, _Job], None]):
+        """ run jobs on at most self.jobs connections, raise the first error """
+        # large ranges first, so that the tail of the transfer is small files
+        jobs = sorted(jobs, key=lambda job: job.length or 0, reverse=True)
+        que = queue.Queue()
+        for job in jobs:
+            que.put(job)
+        errors = []
+        abort = threading.Event()
+
+        def worker():
+            sync = None
+            try:
+                while not abort.is_set():
+                    try:
+                        job = que.get_nowait()
+                    except queue.Empty:
+                        return
+                    if sync is None:
+                        sync = self._connect()
+                    handle(sync, job)
+            except Exception as e:
+                errors.append(e)
+                abort.set()
+            finally:
+                if sync is not None:
+                    sync.close()
+
+        threads = [
+            threading.Thread(name="afc-transfer-{}".format(i), target=worker, daemon=True)
+            for i in range(min(self.jobs, len(jobs)))
+        ]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        if errors:
+            raise errors[0]
+
+    def _finish_job(self, job: _Job) -> bool:
+        """ returns True when the whole file is transferred """
+        if job.file is not None and not job.file.done():
+            return False
+        self.stats.add(files=1)
+        return True
+
+    def _pull_jobs(self, sync: Sync, src: str, dst: str, size: int, resume: bool, remove: bool) -> List[_Job]:
+        offset = sync._resume_offset(src, size, pathlib.Path(dst)) if resume else 0
+        if offset and offset == size:
+            logger.debug("skip %s, already pulled", src)
+            if remove:
+                sync.remove(src)
+            return []
+        if offset:
+            return [_Job(src, dst, offset)]  # append to the partial file
+        return self._split(src, dst, size)
+
+    def pull(self, src: PathType, dst: PathType = "./", remove: bool = False, resume: bool = False) -> TransferStats:
+        """ same as Sync.pull
+
+        Split files are written to <dst>.part and renamed when all ranges finished,
+        so that a local file with the same size as device file is always complete.
+        An interrupted split file is pulled again from the start, resume does not
+        reuse the ranges already in <dst>.part.
+
+        Args:
+            src: device file or directory
+            dst: local path, when src is a directory dst is the directory to create
+            remove: remove files and directories from device after pulled
+            resume: continue from the end of existing local files, skip complete files,
+                ranges of an interrupted split file are pulled again
+
+        Raises:
+            MuxError
+        """
+        src = pathlib.Path(src).as_posix()
+        dst = pathlib.Path(dst)
+        self.stats = TransferStats()
+        sync = self._connect()
+        try:
+            info = sync.stat(src)
+            jobs = []
+            if src == "/" or info.is_dir():
+                dirs, files = sync.scan(src)
+                dst.mkdir(parents=True, exist_ok=True)
+                for dpath in dirs:
+                    dst.joinpath(posixpath.relpath(dpath, src)).mkdir(exist_ok=True)
+                for fpath, finfo in files:
+                    lpath = dst.joinpath(posixpath.relpath(fpath, src))
+                    jobs.extend(self._pull_jobs(sync, fpath, str(lpath), finfo.st_size, resume, remove))
+            else:
+                dirs = []
+                if dst.is_dir():
+                    dst = dst.joinpath(pathlib.Path(src).name)
+                jobs.extend(self._pull_jobs(sync, src, str(dst), info.st_size, resume, remove))
+
+            self._pull_jobs_run(jobs, remove)
+
+            if remove:
+                for dpath in reversed(dirs):
+                    sync.rmdir(dpath)
+                if src != "/" and info.is_dir():
+                    sync.rmdir(src)
+        finally:
+            sync.close()
+        self.stats.finish()
+        logger.info("pulled %s -> %s, %s", src, dst, self.stats)
+        return self.stats
+
+    def pull_files(self, files: typing.Iterable[typing.Tuple[str, str, int]], remove: bool = False) -> TransferStats:
+        """ pull a list of device files in parallel
+
+        Args:
+            files: [(device path, local path, size), ...], parent of local path is created
+            remove: remove files from device after pulled
+        """
+        self.stats = TransferStats()
+        jobs = []
+        for src, dst, size in files:
+            os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+            jobs.extend(self._split(src, str(dst), size))
+        self._pull_jobs_run(jobs, remove)
+        self.stats.finish()
+        return self.stats
+
+    def _pull_jobs_run(self, jobs: List[_Job], remove: bool):
+        for job in jobs:
+            if job.offset == 0 and job.file is not None:
+                with open(job.dst + PART_SUFFIX, "wb") as f:
+                    f.truncate(job.file.size)
+        self._run(jobs, lambda s, job: self._pull_job(s, job, remove))
+
+    def _pull_job(self, sync: Sync, job: _Job, remove: bool):
+        with sync._context_open(job.src, AFCMode.O_RDONLY) as fd:
+            if job.offset:
+                sync._file_seek(fd, job.offset)
+            if job.file:
+                f = open(job.dst + PART_SUFFIX, "r+b")
+                f.seek(job.offset)
+            else:
+                f = open(job.dst, "ab" if job.offset else "wb")
+            with f:
+                left = job.length
+                while left is None or left > 0:
+                    size = self.chunk_size if left is None else min(left, self.chunk_size)
+                    chunk = sync._file_read(fd, size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    self.stats.add(len(chunk))
+                    if left is not None:
+                        left -= len(chunk)
+        if left:
+            raise MuxError("pull {}: file changed while copying".format(job.src))
+        if self._finish_job(job):
+            logger.debug("copied %s -> %s", job.src, job.dst)
+            if job.file:
+                os.replace(job.dst + PART_SUFFIX, job.dst)
+            if remove:
+                sync.remove(job.src)
+
+    def push(self, src: PathType, dst: PathType) -> TransferStats:
+        """ push local file or directory to device
+
+        Args:
+            src: local file or directory
+            dst: device path, when src is a directory dst is the directory to create
+
+        Raises:
+            MuxError, split files not finished are removed from device
+        """
+        src = pathlib.Path(src)
+        dst = pathlib.Path(dst).as_posix()
+        self.stats = TransferStats()
+        sync = self._connect()
+        try:
+            jobs = []
+            if src.is_dir():
+                sync.mkdir(dst)
+                for root, dirnames, filenames in os.walk(src):
+                    rel = pathlib.Path(root).relative_to(src).as_posix()
+                    droot = dst if rel == "." else pathjoin(dst, rel)
+                    for dname in dirnames:
+                        sync.mkdir(pathjoin(droot, dname))
+                    for fname in filenames:
+                        lpath = os.path.join(root, fname)
+                        jobs.extend(self._split(lpath, pathjoin(droot, fname), os.path.getsize(lpath)))
+            else:
+                if sync.exists(dst) and sync.stat(dst).is_dir():
+                    dst = pathjoin(dst, src.name)
+                jobs.extend(self._split(str(src), dst, src.stat().st_size))
+
+            try:
+                for job in jobs:
+                    if job.offset == 0 and job.file is not None:
+                        with sync._context_open(job.dst, AFCMode.O_WR) as fd:
+                            sync._file_set_size(fd, job.file.size)
+                self._run(jobs, self._push_job)
+            except Exception:
+                self._remove_unfinished(sync, jobs)
+                raise
+        finally:
+            sync.close()
+        self.stats.finish()
+        logger.info("pushed %s -> %s, %s", src, dst, self.stats)
+        return self.stats
+
+    def _remove_unfinished(self, sync: Sync, jobs: List[_Job]):
+        """ split files are preallocated, a full size file on device is not complete when a range failed """
+        for dst in {job.dst for job in jobs if job.file is not None and job.file.parts > 0}:
+            try:
+                sync.remove(dst)
+            except MuxError as e:
+                logger.warning("push failed, remove unfinished %s: %s", dst, e)
+
+    def _push_job(self, sync: Sync, job: _Job):
+        with open(job.src, "rb") as f, \
+                sync._context_open(job.dst, AFCMode.O_RW if job.file else AFCMode.O_WR) as fd:
+            if job.offset:
+                f.seek(job.offset)
+                sync._file_seek(fd, job.offset)
+            sync._file_write_many(fd, self._iter_chunks(f, job.length), self.window)
+        if self._finish_job(job):
+            try:
+                sync.set_mtime(job.dst, os.stat(job.src).st_mtime)
+            except MuxError as e:
+                logger.debug("push %s: %s", job.dst, e)
+
+    def _iter_chunks(self, f: typing.BinaryIO, length: Optional[int]) -> typing.Iterator[bytes]:
+        """ read at most length bytes, until EOF when length is None """
+        while length is None or length > 0:
+            size = self.chunk_size if length is None else min(length, self.chunk_size)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            self.stats.add(len(chunk))
+            yield chunk
+            if length is not None:
+                length -= len(chunk)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Created on Sun Oct 18 2026 17:52:06
+
+Breadth first walk of a device directory over several AFC connections
+
+Every worker owns a connection, takes a directory from the queue, lists it
+and stats all entries (pipelined), queues the sub directories and hands the
+entries to the caller, which gets them as soon as they are found.
+
+Usage:
+    for path, info in d.sync.find("/", "*.mov", min_size=100 << 20, connect=d.connect_sync):
+        print(path, info.st_size)
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from ._proto import PROGRAM_NAME, RawStatResult
+from ._sync import Sync
+from ._utils import pathjoin
+from .exceptions import MuxError
+
+logger = logging.getLogger(PROGRAM_NAME)
+
+_DONE = object()
+
+
+class TreeWalker:
+    def __init__(self, sync: Sync, connect: Optional[Callable[[], Sync]] = None, jobs: int = 4):
+        """
+        Args:
+            sync: used by the first worker
+            connect: returns a new Sync for the other workers, only sync is used when None
+            jobs: max number of connections
+        """
+        self._sync = sync
+        self._connect = connect
+        self.jobs = jobs if connect else 1
+
+    def walk(self, top: str) -> Iterator[Tuple[str, List[Tuple[str, RawStatResult]]]]:
+        """ yields (dirpath, [(path, RawStatResult), ...]), links are not followed
+
+        Directories which can not be listed are logged and skipped
+        """
+        dirs = queue.Queue()
+        results = queue.Queue()
+        lock = threading.Lock()
+        abort = threading.Event()
+        outstanding = [1]  # directories queued or being listed
+        dirs.put(top)
+
+        def list_dir(sync: Sync, dpath: str) -> List[Tuple[str, RawStatResult]]:
+            fpaths = [pathjoin(dpath, fname) for fname in sync.listdir(dpath) if fname]
+            entries = []
+            for fpath, (info, err) in zip(fpaths, sync._stat_many_raw(fpaths, with_error=True)):
+                if info is not None:  # removed after listdir
+                    entries.append((fpath, info))
+            return entries
+
+        def worker(index: int):
+            sync = self._sync if index == 0 else None
+            try:
+                while True:
+                    dpath = dirs.get()
+                    if dpath is _DONE or abort.is_set():
+                        return
+                    if sync is None:
+                        sync = self._connect()
+                    try:
+                        entries = list_dir(sync, dpath)
+                    except MuxError as e:
+                        logger.warning("list %s: %s", dpath, e)
+                        entries = []
+                    subdirs = [fpath for fpath, info in entries if info.is_dir()]
+                    with lock:
+                        outstanding[0] += len(subdirs) - 1
+                        finished = outstanding[0] == 0
+                    for fpath in subdirs:
+                        dirs.put(fpath)
+                    results.put((dpath, entries))
+                    if finished:
+                        results.put(_DONE)
+            except Exception as e:
+                results.put(e)
+            finally:
+                if sync is not None and sync is not self._sync:
+                    sync.close()
+
+        threads = [
+            threading.Thread(name="afc-walk-{}".format(i), target=worker, args=(i, ), daemon=True)
+            for i in range(self.jobs)
+        ]
+        for th in threads:
+            th.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            abort.set()
+            for _ in threads:
+                dirs.put(_DONE)
+            for th in threads:
+                th.join()
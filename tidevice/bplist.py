@@ -87,8 +87,8 @@ class NSNull(NSBaseObject):
 
 class NSObject(NSBaseObject):
     @staticmethod
-    def encode(objects: list, value: Union[int, str]):
-        if not isinstance(value, (int, str)):
+    def encode(objects: list, value: Union[int, float, str]):
+        if not isinstance(value, (int, float, str)):
             raise ValueError("NSObject not supported encode value", value,
                              type(value))
         objects.append(value)
@@ -266,6 +266,23 @@ class NSString(NSBaseObject, str):
         return NSString(ns_info['NS.string'])
 
 
+class NSDate(NSBaseObject):
+    """ NSDate is stored as seconds since 2001-01-01 """
+
+    @staticmethod
+    def encode(objects: list, value: datetime.datetime):
+        time_since = datetime.datetime(2001, 1, 1)
+        ns_info = {
+            "NS.time": (value - time_since).total_seconds(),
+        }
+        objects.append(ns_info)
+        ns_info['$class'] = UID(len(objects))
+        objects.append({
+            '$classes': ['NSDate', 'NSObject'],
+            '$classname': 'NSDate'
+        })
+
+
 class NSUUID(NSBaseObject, uuid.UUID):
     @staticmethod
     def encode(objects: list, value: uuid.UUID):
@@ -440,7 +457,9 @@ _ENCODE_MAP = {
     set: NSSet,
     str: NSObject,
     int: NSObject,
+    float: NSObject,
     bool: NSObject,
+    datetime.datetime: NSDate,
     uuid.UUID: NSUUID,
     NoneType: NoneType,
     NSNull: NSNull,  # NSNull is a class, not null
@@ -592,6 +611,7 @@ def test_objc_encode_decode():
         NSNull(),
         NSURL(None, "file://abce"),
         {"none-type": None},
+        {"float": 0.5, "date": datetime.datetime(2020, 5, 25, 2, 22, 29, 603427)},
         {"hello": {"level2": "hello"}},
         {"hello": {
             "level2": "hello",
@@ -616,8 +636,6 @@ def test_objc_encode_decode():
         # pdata = objc_decode(data)
         # assert pdata == value
     # yapf: enable
-    # TODO
-    # NSDate decode
 
 
 if __name__ == "__main__":